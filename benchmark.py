@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+StreamSeed benchmark suite
+
+Runs the real record_stream -> verify_recording -> upload_to_s3 pipeline
+against a local HTTP server streaming generated MP3/AAC audio and a local
+S3 stand-in. The stream is served faster than real time (--speed), so a
+ten-minute show records in about fifteen seconds. Each scenario runs in a fresh worker
+process so its CPU time and peak RSS are its own.
+
+Results are saved as JSON so regressions can be compared across runs:
+
+    python benchmark.py
+    python benchmark.py --scenario mp3:320k:transcode:4 --duration 300
+    python benchmark.py --compare benchmark-results/20261017-221500.json
+
+Scenarios are codec:bitrate[:mode[:streams]], e.g. aac:64k:copy:2 records
+two 64k AAC streams at once and stores them as-is. Startup is measured
+too: importing main, and running `main.py verify` on a recording.
+"""
+
+import argparse
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_SCENARIOS = ["mp3:128k:transcode:1", "mp3:128k:copy:1", "aac:64k:transcode:1", "mp3:128k:transcode:4"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-results")
+BUCKET = "streamseed-bench"
+CLIP_SECONDS = 30  # generated audio looped by the stream server
+STREAM_TICK = 0.05  # seconds between paced writes to a listener
+STARTUP_REPEATS = 5  # runs per startup measurement, the median is reported
+
+# codec -> (encoder args, muxer, content type)
+STREAM_CODECS = {
+    "mp3": (["-c:a", "libmp3lame", "-write_xing", "0", "-id3v2_version", "0"], "mp3", "audio/mpeg"),
+    "aac": (["-c:a", "aac"], "adts", "audio/aac"),
+}
+
+# Metrics compared across runs: name -> True when higher is better
+COMPARED_METRICS = {
+    "wall_seconds": False,
+    "realtime_factor": True,
+    "ffmpeg_cpu_seconds_per_stream": False,
+    "python_cpu_seconds": False,
+    "peak_rss_mb": False,
+    "upload_mb_per_s": True,
+    "time_to_publish_seconds": False,
+}
+STARTUP_METRICS = ("import_seconds", "verify_command_seconds")
+
+@dataclasses.dataclass
+class Scenario:
+    codec: str
+    bitrate: str
+    mode: str = "transcode"
+    streams: int = 1
+
+    @classmethod
+    def parse(cls, spec: str) -> "Scenario":
+        parts = spec.split(":")
+        if len(parts) < 2 or parts[0] not in STREAM_CODECS:
+            raise argparse.ArgumentTypeError(f"Invalid scenario '{spec}', expected codec:bitrate[:mode[:streams]]")
+        return cls(parts[0], parts[1], *(parts[2:3] or []), *(int(part) for part in parts[3:4]))
+
+    @property
+    def name(self) -> str:
+        return f"{self.codec}:{self.bitrate}:{self.mode}:{self.streams}"
+
+    @property
+    def stream_path(self) -> str:
+        return f"/{self.codec}/{self.bitrate}"
+
+    @property
+    def bytes_per_second(self) -> float:
+        return int(self.bitrate.rstrip("kK")) * 1000 / 8
+
+def generate_clip(codec: str, bitrate: str, seconds: int = CLIP_SECONDS) -> bytes:
+    """
+    Encode a tone whose level swells and fades, so the recording passes
+    dead-air detection, into `seconds` of audio that loops cleanly.
+    """
+    encoder_args, muxer, _ = STREAM_CODECS[codec]
+    source = f"aevalsrc=0.3*sin(2*PI*440*t)*(0.6+0.4*sin(2*PI*0.25*t)):s=44100:d={seconds}"
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", source, "-ac", "2",
+         *encoder_args, "-b:a", bitrate, "-f", muxer, "pipe:1"],
+        capture_output=True, check=True
+    )
+    return result.stdout
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """Serves each clip as an endless live stream, paced at `speed` times its bitrate."""
+
+    def do_GET(self):
+        clip = self.server.clips.get(self.path)
+        if clip is None:
+            self.send_error(404)
+            return
+        data, content_type, bytes_per_second = clip
+        rate = bytes_per_second * self.server.speed
+        chunk = max(int(rate * STREAM_TICK), 4096) if rate else 65536
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        started = time.monotonic()
+        sent = position = 0
+        try:
+            while True:
+                piece = data[position:position + chunk]
+                if len(piece) < chunk:
+                    piece += data[:chunk - len(piece)]
+                self.wfile.write(piece)
+                sent += len(piece)
+                position = (position + len(piece)) % len(data)
+                if rate:
+                    delay = started + sent / rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def decode_aws_chunked(raw: bytes) -> bytes:
+    """Strip the aws-chunked framing botocore uses for streamed uploads with trailing checksums."""
+    body = bytearray()
+    position = 0
+    while True:
+        line_end = raw.index(b"\r\n", position)
+        size = int(raw[position:line_end].split(b";")[0], 16)
+        position = line_end + 2
+        if size == 0:
+            return bytes(body)
+        body += raw[position:position + size]
+        position += size + 2
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """
+    The subset of the S3 API the upload path uses: PUT, multipart uploads,
+    server-side copy and HEAD, with real ETags. Bodies are hashed and
+    discarded so the stand-in's memory stays flat.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def parse(self) -> tuple:
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def read_body(self) -> bytes:
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "aws-chunked" in self.headers.get("Content-Encoding", "") or self.headers.get("x-amz-decoded-content-length"):
+            raw = decode_aws_chunked(raw)
+        return raw
+
+    def reply(self, status: int, body: str = "", headers: dict = None) -> None:
+        payload = body.encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload:
+            self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload and self.command != "HEAD":
+            self.wfile.write(payload)
+
+    def error(self, status: int, code: str) -> None:
+        self.reply(status, f"<Error><Code>{code}</Code><Message>{code}</Message></Error>")
+
+    def metadata(self) -> dict:
+        return {name[11:].lower(): value for name, value in self.headers.items() if name.lower().startswith("x-amz-meta-")}
+
+    def do_PUT(self):
+        bucket, key, query = self.parse()
+        body = self.read_body()
+        objects, uploads = self.server.objects, self.server.uploads
+        with self.server.lock:
+            if "uploadId" in query:
+                upload = uploads.get(query["uploadId"][0])
+                if upload is None:
+                    return self.error(404, "NoSuchUpload")
+                digest = hashlib.md5(body)
+                upload["parts"][int(query["partNumber"][0])] = (digest.digest(), len(body))
+                return self.reply(200, headers={"ETag": f'"{digest.hexdigest()}"'})
+            source = self.headers.get("x-amz-copy-source")
+            if source:
+                source_key = unquote(source).lstrip("/").partition("/")[2]
+                if source_key not in objects:
+                    return self.error(404, "NoSuchKey")
+                copied = dict(objects[source_key])
+                if self.headers.get("x-amz-metadata-directive") == "REPLACE":
+                    copied["metadata"] = self.metadata()
+                objects[key] = copied
+                return self.reply(200, f"<CopyObjectResult><ETag>{copied['etag']}</ETag>"
+                                       f"<LastModified>{copied['modified']}</LastModified></CopyObjectResult>")
+            objects[key] = self.new_object(f'"{hashlib.md5(body).hexdigest()}"', len(body))
+            self.reply(200, headers={"ETag": objects[key]["etag"]})
+
+    def do_POST(self):
+        bucket, key, query = self.parse()
+        self.read_body()
+        with self.server.lock:
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                self.server.uploads[upload_id] = {"key": key, "parts": {}, "object": self.new_object(None, 0)}
+                return self.reply(200, f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                                       f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+            upload = self.server.uploads.pop(query.get("uploadId", [""])[0], None)
+            if upload is None:
+                return self.error(404, "NoSuchUpload")
+            parts = [upload["parts"][number] for number in sorted(upload["parts"])]
+            etag = f'"{hashlib.md5(b"".join(digest for digest, _ in parts)).hexdigest()}-{len(parts)}"'
+            self.server.objects[key] = dict(upload["object"], etag=etag, size=sum(size for _, size in parts))
+            self.reply(200, f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                            f"<ETag>{etag}</ETag></CompleteMultipartUploadResult>")
+
+    def do_DELETE(self):
+        bucket, key, query = self.parse()
+        with self.server.lock:
+            if "uploadId" in query:
+                self.server.uploads.pop(query["uploadId"][0], None)
+            else:
+                self.server.objects.pop(key, None)
+        self.reply(204)
+
+    def do_HEAD(self):
+        bucket, key, query = self.parse()
+        with self.server.lock:
+            stored = self.server.objects.get(key)
+        if stored is None:
+            return self.reply(404)
+        headers = {
+            "ETag": stored["etag"],
+            "Content-Type": stored["content_type"],
+            "Last-Modified": stored["modified"],
+            **{f"x-amz-meta-{name}": value for name, value in stored["metadata"].items()},
+        }
+        # HEAD advertises the object's length without sending it
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(stored["size"]))
+        self.end_headers()
+
+    def do_GET(self):
+        self.error(404, "NoSuchKey")  # Bodies aren't kept
+
+    def new_object(self, etag: str, size: int) -> dict:
+        return {
+            "etag": etag,
+            "size": size,
+            "content_type": self.headers.get("Content-Type", "binary/octet-stream"),
+            "metadata": self.metadata(),
+            "modified": self.date_time_string(),
+        }
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(handler, **state) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    for name, value in state.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_stream(main, scenario: Scenario, index: int, settings: dict) -> dict:
+    """Record, verify and publish one stream, timing each stage."""
+    show = dataclasses.replace(
+        main.default_show(),
+        station="bench",
+        name=f"{scenario.codec}-{index}",
+        url=settings["stream_url"],
+        duration=settings["duration"],
+        mode=scenario.mode,
+        output_dir=os.path.join(settings["work_dir"], str(index)),
+        latest_key=f"bench/{index}/latest.mp3",
+        warm_start=0,
+        renditions=(),
+        hls=False,
+    )
+    started = time.perf_counter()
+    recording_file = main.record_stream(show)
+    recorded = time.perf_counter()
+    if not recording_file:
+        return {"ok": False}
+    verified = main.verify_recording(recording_file, show.duration) and main.check_dead_air(recording_file)
+    uploading = time.perf_counter()
+    size = os.path.getsize(recording_file)
+    recording_key = f"archive/bench/{index}/{os.path.basename(recording_file)}"
+    uploaded = main.upload_to_s3(recording_file, recording_key)
+    upload_done = time.perf_counter()
+    published = uploaded and main.upload_latest(recording_key, main.latest_key_for(show, recording_key))
+    published_at = time.perf_counter()
+    main.cleanup_local_file(recording_file)
+    return {
+        "ok": bool(verified and published),
+        "record_seconds": recorded - started,
+        "recording_bytes": size,
+        "upload_mb_per_s": size / 1024 ** 2 / max(upload_done - uploading, 1e-6),
+        "time_to_publish_seconds": published_at - recorded,
+    }
+
+def run_worker(settings: dict) -> dict:
+    """Run one scenario in this process and measure it."""
+    import boto3
+    from botocore.config import Config
+    import main
+
+    main.s3_client = boto3.session.Session().client(
+        "s3",
+        region_name="us-east-1",
+        endpoint_url=settings["s3_endpoint"],
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        config=Config(s3={"addressing_style": "path"}),
+    )
+    main.BUCKET_NAME = BUCKET
+    scenario = Scenario(**settings["scenario"])
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    results = [None] * scenario.streams
+
+    def record(index):
+        results[index] = run_stream(main, scenario, index, settings)
+
+    threads = [threading.Thread(target=record, args=(index,)) for index in range(scenario.streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    main.notification_dispatcher.flush()
+
+    finished = [result for result in results if result["ok"]]
+
+    def mean(name):
+        return statistics.fmean(result[name] for result in finished) if finished else None
+
+    children_cpu = (children_after.ru_utime + children_after.ru_stime) - (children_before.ru_utime + children_before.ru_stime)
+    record_seconds = mean("record_seconds")
+    return {
+        "scenario": scenario.name,
+        **dataclasses.asdict(scenario),
+        "duration": settings["duration"],
+        "failures": scenario.streams - len(finished),
+        "wall_seconds": wall,
+        "record_seconds": record_seconds,
+        "realtime_factor": settings["duration"] / record_seconds if record_seconds else None,
+        # ffmpeg children: capture and the analysis decode
+        "ffmpeg_cpu_seconds_per_stream": children_cpu / scenario.streams,
+        "python_cpu_seconds": (self_after.ru_utime + self_after.ru_stime) - (self_before.ru_utime + self_before.ru_stime),
+        "peak_rss_mb": self_after.ru_maxrss / 1024,  # KiB on Linux
+        "ffmpeg_peak_rss_mb": children_after.ru_maxrss / 1024,
+        "recording_bytes": mean("recording_bytes"),
+        "upload_mb_per_s": mean("upload_mb_per_s"),
+        "time_to_publish_seconds": mean("time_to_publish_seconds"),
+    }
+
+def run_scenario(scenario: Scenario, args, stream_server, s3_server, work_dir: str) -> dict:
+    settings = {
+        "scenario": dataclasses.asdict(scenario),
+        "duration": args.duration,
+        "stream_url": f"http://127.0.0.1:{stream_server.server_port}{scenario.stream_path}",
+        "s3_endpoint": f"http://127.0.0.1:{s3_server.server_port}",
+        "work_dir": os.path.join(work_dir, scenario.name.replace(":", "_")),
+    }
+    env = worker_env(settings["work_dir"])
+    stream_seconds = args.duration / args.speed if args.speed else args.duration
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(settings)],
+        capture_output=True, text=True, env=env, timeout=stream_seconds * scenario.streams + 300
+    )
+    if process.returncode != 0 or not process.stdout.strip():
+        raise RuntimeError(f"Scenario {scenario.name} failed:\n{process.stderr[-4000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def measure_startup(env: dict, recording_file: str) -> dict:
+    """Median wall time of a bare `import main` and of the verify subcommand, each in a new interpreter."""
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    commands = {
+        "import_seconds": [sys.executable, "-c", "import main"],
+        "verify_command_seconds": [sys.executable, main_script, "verify", recording_file],
+    }
+    startup = {}
+    for metric, command in commands.items():
+        timings = []
+        for _ in range(STARTUP_REPEATS):
+            started = time.perf_counter()
+            subprocess.run(command, capture_output=True, env=env, cwd=os.path.dirname(main_script))
+            timings.append(time.perf_counter() - started)
+        startup[metric] = statistics.median(timings)
+    return startup
+
+def worker_env(work_dir: str) -> dict:
+    env = dict(
+        os.environ,
+        BUCKET_NAME=BUCKET,
+        AWS_ACCESS_KEY="bench",
+        AWS_SECRET_KEY="bench",
+        DISCORD_WEBHOOK_URL="",
+        NOTIFICATION_LEVEL="none",
+        METRICS_PORT="0",
+        SPOOL_JOURNAL=os.path.join(work_dir, "spool.journal"),
+    )
+    env.pop("VULTR_HOSTNAME", None)
+    return env
+
+def format_value(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+def print_results(results: list) -> None:
+    columns = ["scenario", "failures", *COMPARED_METRICS, "ffmpeg_peak_rss_mb"]
+    rows = [[format_value(result.get(column)) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    for row in [columns, *rows]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+def compare_results(previous: dict, current: dict, threshold: float) -> int:
+    """Print each metric's change against a saved run. Returns the number of regressions."""
+    baseline = {result["scenario"]: result for result in previous["scenarios"]}
+    regressions = 0
+    if previous["settings"] != current["settings"]:
+        print(f"\nNote: settings differ from the saved run ({previous['settings']}), so totals aren't comparable")
+    if "startup" in previous:
+        print(f"\nstartup vs {previous['timestamp']}")
+    for metric in STARTUP_METRICS:
+        old, new = previous.get("startup", {}).get(metric), current["startup"][metric]
+        if old:
+            change = (new - old) / old * 100
+            flag = "  REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"  {metric:32} {format_value(old):>10} -> {format_value(new):>10}  {change:+6.1f}%{flag}")
+    for result in current["scenarios"]:
+        before = baseline.get(result["scenario"])
+        if before is None:
+            continue
+        print(f"\n{result['scenario']} vs {previous['timestamp']}")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            regressions += bool(flag)
+            print(f"  {metric:32} {format_value(old):>10} -> {format_value(new):>10}  {change:+6.1f}%{flag}")
+    return regressions
+
+def ffmpeg_version() -> str:
+    result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else "unknown"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark StreamSeed's record, verify and upload pipeline.")
+    parser.add_argument("--scenario", action="append", type=Scenario.parse,
+                        help="codec:bitrate[:mode[:streams]], repeatable (default: a standard set)")
+    parser.add_argument("--duration", type=int, default=600, help="seconds of audio per recording")
+    parser.add_argument("--speed", type=float, default=40, help="stream speed as a multiple of real time, 0 for unthrottled")
+    parser.add_argument("--output", default=RESULTS_DIR, help="directory the results are saved to")
+    parser.add_argument("--compare", help="saved results to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change reported as a regression")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    scenarios = args.scenario or [Scenario.parse(spec) for spec in DEFAULT_SCENARIOS]
+    clips = {}
+    for scenario in scenarios:
+        if scenario.stream_path not in clips:
+            clips[scenario.stream_path] = (
+                generate_clip(scenario.codec, scenario.bitrate),
+                STREAM_CODECS[scenario.codec][2],
+                scenario.bytes_per_second,
+            )
+    stream_server = start_server(StreamHandler, clips=clips, speed=args.speed)
+    s3_server = start_server(FakeS3Handler, objects={}, uploads={}, lock=threading.Lock())
+
+    run = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "ffmpeg": ffmpeg_version(),
+        "settings": {"duration": args.duration, "speed": args.speed},
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        # A few loops of the first clip make a recording big enough to pass verification
+        data = next(iter(clips.values()))[0]
+        recording_file = os.path.join(work_dir, f"startup.{scenarios[0].codec}")
+        with open(recording_file, "wb") as f:
+            f.write(data * (2 * 1024 ** 2 // len(data) + 1))
+        print("Measuring startup ...", file=sys.stderr)
+        run["startup"] = measure_startup(worker_env(work_dir), recording_file)
+        for scenario in scenarios:
+            print(f"Running {scenario.name} ...", file=sys.stderr)
+            run["scenarios"].append(run_scenario(scenario, args, stream_server, s3_server, work_dir))
+    stream_server.shutdown()
+    s3_server.shutdown()
+
+    print_results(run["scenarios"])
+    print("\n" + "  ".join(f"{metric} {run['startup'][metric]:.3f}" for metric in STARTUP_METRICS))
+    os.makedirs(args.output, exist_ok=True)
+    output_file = os.path.join(args.output, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output_file, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved results to {output_file}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), run, args.threshold)
+        if regressions:
+            print(f"\n{regressions} metric(s) regressed by more than {args.threshold:g}%")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,17 +23,56 @@ def print_banner():
 import subprocess
 import datetime
 import os
-import boto3
 import logging
-from typing import Optional, Literal
+from typing import Optional, Literal, List, Dict
+import dataclasses
+from dataclasses import dataclass, field, asdict
 from dotenv import load_dotenv
-import schedule
 import time
-import pytz
 import signal
+import atexit
 from functools import wraps
 import sys
-import requests
+import json
+import argparse
+import random
+import hashlib
+import base64
+import queue
+import re
+import socket
+import statistics
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+from collections import deque
+import shutil
+import mmap
+import struct
+import math
+import bisect
+from functools import lru_cache
+from contextlib import contextmanager, nullcontext
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# boto3, requests, numpy and pytz are imported on first use, so commands that
+# don't need them (and test runs) start without paying for them
+np = None  # Set by load_numpy()
+
+def load_numpy() -> bool:
+    """Import numpy for audio analysis. False if it isn't installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+# Load environment variables before any setting below reads them
+load_dotenv()
 
 # Setup logging
 logging.basicConfig(
@@ -42,20 +81,130 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Metrics exposed in Prometheus text format: name -> (type, help)
+METRIC_DEFINITIONS = {
+    "streamseed_recordings_in_progress": ("gauge", "Recordings currently running"),
+    "streamseed_recording_bytes": ("gauge", "Bytes written so far by a running recording"),
+    "streamseed_recording_elapsed_seconds": ("gauge", "Audio captured so far by a running recording"),
+    "streamseed_recording_speed": ("gauge", "ffmpeg processing speed of a running recording"),
+    "streamseed_captured_bytes_total": ("counter", "Bytes written by finished ffmpeg runs"),
+    "streamseed_recordings_total": ("counter", "Finished ffmpeg runs by result"),
+    "streamseed_upload_duration_seconds": ("summary", "Time taken by upload_to_s3"),
+    "streamseed_upload_bytes_total": ("counter", "Bytes uploaded by upload_to_s3"),
+    "streamseed_upload_throughput_bytes_per_second": ("gauge", "Throughput of the last upload_to_s3"),
+    "streamseed_upload_failures_total": ("counter", "Failed upload_to_s3 calls"),
+    "streamseed_retries_total": ("counter", "Retries made by retry_decorator"),
+    "streamseed_discord_send_seconds": ("summary", "Discord webhook request latency"),
+    "streamseed_discord_failures_total": ("counter", "Discord notifications that could not be sent"),
+    "streamseed_discord_dropped_total": ("counter", "Discord notifications dropped from a full queue"),
+    "streamseed_schedule_lag_seconds": ("summary", "Delay between a job's scheduled and actual start"),
+    "streamseed_schedule_last_lag_seconds": ("gauge", "Start delay of each show's most recent job"),
+    "streamseed_recording_start_offset_seconds": ("gauge", "Air time of a recording's first sample relative to its schedule"),
+    "streamseed_mirror_first_byte_seconds": ("gauge", "Time to the first audio byte when a mirror was last ranked"),
+    "streamseed_mirror_failovers_total": ("counter", "Switches to another mirror after a stream stalled"),
+    "streamseed_rendition_encode_cpu_seconds": ("gauge", "Encoder CPU time of each rendition in the last recording"),
+    "streamseed_spool_pending": ("gauge", "Recordings waiting in the local spool for upload"),
+    "streamseed_spool_bytes": ("gauge", "Disk used by recordings waiting in the local spool"),
+    "streamseed_spool_evicted_total": ("counter", "Spooled recordings deleted to keep the spool under SPOOL_MAX_BYTES"),
+    "streamseed_upload_throttle_seconds_total": ("counter", "Time uploads waited on the bandwidth governor"),
+    "streamseed_upload_throttle_seconds": ("gauge", "Time the last upload_to_s3 waited on the bandwidth governor"),
+    "streamseed_upload_bandwidth_limit_bytes_per_second": ("gauge", "Current upload rate limit (0 = unlimited)"),
+}
+
+def escape_label_value(value) -> str:
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and summaries rendered in Prometheus text format."""
+
+    def __init__(self, definitions: Dict[str, tuple] = None):
+        self.definitions = definitions or METRIC_DEFINITIONS
+        self.values: Dict[str, Dict[tuple, float]] = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def _update(self, name: str, labels: dict, update) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            series[key] = update(series.get(key, 0.0))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        self._update(name, labels, lambda current: current + value)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        self._update(name, labels, lambda current: value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        self.inc(f"{name}_sum", value, **labels)
+        self.inc(f"{name}_count", 1, **labels)
+
+    def add_collector(self, collector) -> None:
+        """Register a callable returning (name, labels, value) samples computed at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        with self.lock:
+            samples = {name: dict(series) for name, series in self.values.items()}
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                samples.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+        lines = []
+        for name, (metric_type, help_text) in self.definitions.items():
+            series_names = [f"{name}_sum", f"{name}_count"] if metric_type == "summary" else [name]
+            if not any(series_name in samples for series_name in series_names):
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for series_name in series_names:
+                for key, value in sorted(samples.get(series_name, {}).items()):
+                    label_text = ",".join(f'{label}="{escape_label_value(v)}"' for label, v in key)
+                    lines.append(f"{series_name}{{{label_text}}} {value:g}" if label_text else f"{series_name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+def start_metrics_server(port: int, address: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Serve /metrics from a background thread; port 0 picks a free port."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would flood the log
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
 # Update Discord configuration with better defaults and validation
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
 NOTIFICATION_LEVEL = os.getenv("NOTIFICATION_LEVEL", "error").lower()  # 'all', 'error', or 'none'
 DISCORD_TIMEOUT = 5  # seconds
 
-def send_discord_notification(
-    message: str,
-    level: Literal["info", "error", "success"] = "info",
-    retry_count: int = 2
-) -> bool:
-    """
-    Send notification to Discord webhook with improved error handling and retries.
-    Returns True if notification was sent successfully, False otherwise.
-    """
+DISCORD_QUEUE_SIZE = int(os.getenv("DISCORD_QUEUE_SIZE", 100))  # Pending notifications kept
+DISCORD_BATCH_WINDOW = float(os.getenv("DISCORD_BATCH_WINDOW", 2))  # seconds to coalesce bursts
+DISCORD_FLUSH_TIMEOUT = 10  # seconds to wait for pending notifications on shutdown
+DISCORD_MAX_EMBEDS = 10  # Discord limits per message
+DISCORD_MAX_DESCRIPTION = 4096
+DISCORD_MAX_MESSAGE_CHARS = 6000
+NOTIFICATION_PRIORITY = {"info": 0, "success": 1, "error": 2}
+NOTIFICATION_RETRIES = {"info": 2, "success": 2, "error": 3}  # More retries for errors
+
+def should_notify(level: str) -> bool:
+    """Whether a message of this level is sent to Discord at all."""
     # Early return if Discord notifications are disabled or webhook URL is not set
     if not DISCORD_WEBHOOK_URL or NOTIFICATION_LEVEL == "none":
         return False
@@ -63,32 +212,49 @@ def send_discord_notification(
     # Check notification level filtering
     if NOTIFICATION_LEVEL == "error" and level not in ["error", "success"]:
         return False
+    return True
 
+def build_discord_embed(message: str, level: str, count: int = 1) -> dict:
+    """Build a Discord embed for one notification."""
     colors = {
         "info": 3447003,     # Blue
         "error": 15158332,   # Red
         "success": 3066993   # Green
     }
+    title = f"StreamSeed {level.title()} Notification"
+    if count > 1:
+        title += f" (x{count})"
+    if len(message) > DISCORD_MAX_DESCRIPTION:
+        message = message[:DISCORD_MAX_DESCRIPTION - 1] + "…"
 
-    payload = {
-        "embeds": [{
-            "title": f"StreamSeed {level.title()} Notification",
-            "description": message,
-            "color": colors.get(level, colors["info"]),
-            "timestamp": datetime.datetime.utcnow().isoformat(),
-            "footer": {
-                "text": f"StreamSeed Bot • {level.title()}"
-            }
-        }]
+    return {
+        "title": title,
+        "description": message,
+        "color": colors.get(level, colors["info"]),
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "footer": {
+            "text": f"StreamSeed Bot • {level.title()}"
+        }
     }
 
+def post_discord_payload(payload: dict, retry_count: int = 2, post=None) -> bool:
+    """
+    POST a payload to the Discord webhook, retrying with backoff and
+    honouring Retry-After when rate limited. `post` defaults to requests.post.
+    """
+    import requests
+    post = post or requests.post
     for attempt in range(retry_count + 1):
         try:
-            response = requests.post(
-                DISCORD_WEBHOOK_URL,
-                json=payload,
-                timeout=DISCORD_TIMEOUT
-            )
+            start_time = time.monotonic()
+            try:
+                response = post(
+                    DISCORD_WEBHOOK_URL,
+                    json=payload,
+                    timeout=DISCORD_TIMEOUT
+                )
+            finally:
+                metrics.observe("streamseed_discord_send_seconds", time.monotonic() - start_time)
             
             if response.status_code == 429:  # Rate limited
                 retry_after = int(response.headers.get('Retry-After', 5))
@@ -114,8 +280,162 @@ def send_discord_notification(
         if attempt < retry_count:
             time.sleep(2 ** attempt)  # Exponential backoff
     
+    metrics.inc("streamseed_discord_failures_total")
     return False
 
+def send_discord_notification(
+    message: str,
+    level: Literal["info", "error", "success"] = "info",
+    retry_count: int = 2
+) -> bool:
+    """
+    Send notification to Discord webhook with improved error handling and retries.
+    Blocks until sent; log_* functions go through notification_dispatcher instead.
+    Returns True if notification was sent successfully, False otherwise.
+    """
+    if not should_notify(level):
+        return False
+    return post_discord_payload({"embeds": [build_discord_embed(message, level)]}, retry_count)
+
+@dataclass
+class Notification:
+    """A notification waiting in the dispatcher queue."""
+    message: str
+    level: str
+    count: int = 1
+
+    @property
+    def priority(self) -> int:
+        return NOTIFICATION_PRIORITY.get(self.level, 0)
+
+class NotificationDispatcher:
+    """
+    Sends Discord notifications from a background thread so logging never
+    blocks on the webhook. Bursts are coalesced into multi-embed messages,
+    repeats are counted instead of resent, and when the queue is full the
+    lowest-priority notifications are merged or dropped first.
+    """
+
+    def __init__(self, max_queue: int = DISCORD_QUEUE_SIZE, batch_window: float = DISCORD_BATCH_WINDOW):
+        self.max_queue = max_queue
+        self.batch_window = batch_window
+        self.pending: List[Notification] = []
+        self.dropped = 0
+        self.sending = False
+        self.flushing = False
+        self.condition = threading.Condition()
+        self.thread = None
+        self.session = None
+
+    def submit(self, message: str, level: str = "info") -> None:
+        """Queue a notification without blocking."""
+        if not should_notify(level):
+            return
+        incoming = Notification(message, level)
+        with self.condition:
+            for pending in self.pending:
+                if pending.level == level and pending.message == message:
+                    pending.count += 1
+                    return
+
+            if len(self.pending) >= self.max_queue:
+                victim = min(self.pending, key=lambda n: n.priority)
+                if victim.priority < incoming.priority:
+                    self.pending.remove(victim)
+                    self.dropped += victim.count
+                    metrics.inc("streamseed_discord_dropped_total", victim.count)
+                else:
+                    if not self._merge(incoming):
+                        self.dropped += 1
+                        metrics.inc("streamseed_discord_dropped_total")
+                    return
+
+            self.pending.append(incoming)
+            self._ensure_started()
+            self.condition.notify()
+
+    def _merge(self, incoming: Notification) -> bool:
+        """Fold a notification into the newest pending one of the same level, if it fits."""
+        for pending in reversed(self.pending):
+            if pending.level == incoming.level:
+                merged = f"{pending.message}\n{incoming.message}"
+                if len(merged) <= DISCORD_MAX_DESCRIPTION:
+                    pending.message = merged
+                    return True
+                return False
+        return False
+
+    def _ensure_started(self) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="discord-dispatcher", daemon=True)
+            self.thread.start()
+
+    def _take_batch(self) -> List[Notification]:
+        """Remove the oldest notifications that fit into one Discord message."""
+        batch, chars = [], 0
+        while self.pending and len(batch) < DISCORD_MAX_EMBEDS:
+            size = min(len(self.pending[0].message), DISCORD_MAX_DESCRIPTION) + 100  # title and footer
+            if batch and chars + size > DISCORD_MAX_MESSAGE_CHARS:
+                break
+            batch.append(self.pending.pop(0))
+            chars += size
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                # Let a burst accumulate for batch_window after its first message,
+                # unless a flush is waiting or the batch is already full; each
+                # submit wakes this wait, so it loops until the deadline
+                deadline = time.monotonic() + self.batch_window
+                while not self.flushing and len(self.pending) < DISCORD_MAX_EMBEDS:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self._take_batch()
+                dropped, self.dropped = self.dropped, 0
+                self.sending = True
+
+            embeds = [build_discord_embed(n.message, n.level, n.count) for n in batch]
+            if dropped and len(embeds) < DISCORD_MAX_EMBEDS:
+                embeds.append(build_discord_embed(
+                    f"{dropped} lower-priority notification(s) dropped while the queue was full", "info"
+                ))
+            retry_count = max(NOTIFICATION_RETRIES.get(n.level, 2) for n in batch)
+            try:
+                if self.session is None:
+                    import requests
+                    self.session = requests.Session()
+                post_discord_payload({"embeds": embeds}, retry_count, post=self.session.post)
+            except Exception as e:
+                logger.error(f"Discord dispatcher error: {e}")
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout: float = DISCORD_FLUSH_TIMEOUT) -> bool:
+        """Send everything queued now; returns False if the timeout expired first."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            try:
+                while self.pending or self.sending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                return True
+            finally:
+                self.flushing = False
+
+notification_dispatcher = NotificationDispatcher()
+atexit.register(notification_dispatcher.flush)
+
 # Update the logging functions with better formatting
 def format_log_message(message: str, level: str) -> str:
     """Format log message with timestamp and level."""
@@ -126,19 +446,19 @@ def log_info(message: str):
     """Log info message with optional Discord notification."""
     formatted_msg = format_log_message(message, "info")
     logger.info(Fore.CYAN + formatted_msg)
-    send_discord_notification(message, "info")
+    notification_dispatcher.submit(message, "info")
 
 def log_error(message: str):
     """Log error message with Discord notification."""
     formatted_msg = format_log_message(message, "error")
     logger.error(Fore.RED + formatted_msg)
-    send_discord_notification(message, "error", retry_count=3)  # More retries for errors
+    notification_dispatcher.submit(message, "error")
 
 def log_success(message: str):
     """Log success message with Discord notification."""
     formatted_msg = format_log_message(message, "success")
     logger.info(Fore.GREEN + formatted_msg)
-    send_discord_notification(message, "success")
+    notification_dispatcher.submit(message, "success")
 
 # Add a function to test Discord notifications
 def test_discord_notification() -> bool:
@@ -155,9 +475,6 @@ def test_discord_notification() -> bool:
         logger.error("Discord notification test failed")
         return False
 
-# Load environment variables
-load_dotenv()
-
 # Configuration
 STREAM_URL = "https://14533.live.streamtheworld.com/7LTNAAC_SC"
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
@@ -168,21 +485,319 @@ AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 
 # Updated S3 client configuration for Vultr
-session = boto3.session.Session()
-s3_client = session.client('s3',
-    region_name=VULTR_HOSTNAME.split('.')[0] if VULTR_HOSTNAME else None,
-    endpoint_url=f"https://{VULTR_HOSTNAME}" if VULTR_HOSTNAME else None,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
-)
+def create_s3_client():
+    import boto3
+    session = boto3.session.Session()
+    return session.client('s3',
+        region_name=VULTR_HOSTNAME.split('.')[0] if VULTR_HOSTNAME else None,
+        endpoint_url=f"https://{VULTR_HOSTNAME}" if VULTR_HOSTNAME else None,
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY
+    )
+
+class LazyS3Client:
+    """
+    Stands in for the boto3 client, creating it on first use so commands
+    that never touch the bucket don't import boto3 or load its models.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return getattr(self._client, name)
 
-# Update scheduling configuration - remove SCHEDULE_DAY since we only run on Wednesday
-SYDNEY_TZ = pytz.timezone('Australia/Sydney')
-SCHEDULE_TIME = '22:00'  # 10:00 PM Sydney time
+s3_client = LazyS3Client(create_s3_client)
+
+def s3_error_code(error: Exception) -> Optional[str]:
+    """The S3 error code of a failed client call, e.g. 'NoSuchKey'."""
+    response = getattr(error, "response", None)
+    return response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+
+# Scheduling configuration, in Sydney local time
+@lru_cache(maxsize=None)
+def sydney_tz():
+    """Australia/Sydney, loaded from the tz database on first use."""
+    import pytz
+    return pytz.timezone('Australia/Sydney')
+
+SCHEDULE_DAYS = os.getenv("SCHEDULE_DAYS", "wednesday")  # Comma-separated days, or 'daily'
+SCHEDULE_TIME = os.getenv("SCHEDULE_TIME", "22:00")  # 10:00 PM Sydney time
+START_EARLY_SECONDS = int(os.getenv("START_EARLY_SECONDS", 0))  # Start ffmpeg this long before air
+# Warm start: check the stream this long before air, connect shortly before
+# it, and trim the pre-roll so the file begins exactly on time (0 disables)
+WARM_START_SECONDS = int(os.getenv("WARM_START_SECONDS", 0))
+WARM_START_CONNECT_LEAD = int(os.getenv("WARM_START_CONNECT_LEAD", 10))  # seconds
+WARM_START_PROBE_SECONDS = 5  # seconds of audio read when checking the endpoint
+STEADY_STATE_AFTER = 10  # seconds of audio before ffmpeg's clock is trusted for start offsets
+SCHEDULER_MAX_SLEEP = 300  # seconds; the next start is recomputed at least this often
+MISSED_START_GRACE = 600  # seconds late a show may still be started
+
+# Multi-station configuration: a JSON file listing stations and their shows.
+# Without it, the single show defined by the constants above is recorded.
+STATIONS_CONFIG = os.getenv(
+    "STATIONS_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "stations.json")
+)
+MAX_CONCURRENT_RECORDINGS = int(os.getenv("MAX_CONCURRENT_RECORDINGS", 4))
+# 'transcode' always re-encodes to 128k MP3; 'copy' stores the source codec
+# as-is unless RECORDING_FORMAT requires a specific one (e.g. 'mp3')
+RECORDING_MODE = os.getenv("RECORDING_MODE", "transcode").lower()
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "any").lower()
+RENDITIONS = os.getenv("RENDITIONS", "")  # Extra encodings, e.g. 'opus:48k,aac:64k'
+HLS_ENABLED = os.getenv("HLS_ENABLED", "false").lower() in ("1", "true", "yes")
+HLS_SEGMENT_DURATION = int(os.getenv("HLS_SEGMENT_DURATION", 10))  # seconds
+HLS_UPLOAD_CONCURRENCY = int(os.getenv("HLS_UPLOAD_CONCURRENCY", 4))
+FFPROBE_TIMEOUT = 30  # seconds
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))  # 0 disables the metrics endpoint
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
 
 # Add minimum file size threshold (e.g., 1MB)
 MIN_FILE_SIZE = 1024 * 1024  # 1MB in bytes
 MAX_UPLOAD_RETRIES = 3
+ARCHIVE_INDEX_KEY = os.getenv("ARCHIVE_INDEX_KEY", "archive/index.json")  # Catalogue of recordings in the bucket
+ARCHIVE_INDEX_RETRIES = 5  # attempts when another writer updated the index first
+DURATION_TOLERANCE = int(os.getenv("DURATION_TOLERANCE", 60))  # seconds a recording may fall short of its show
+SILENCE_THRESHOLD_DB = float(os.getenv("SILENCE_THRESHOLD_DB", -50))  # dBFS RMS below which a window is silent
+DEAD_AIR_FLATNESS_DB = 0.5  # dB a steady noise floor (dropped-carrier hiss) varies between windows
+DEAD_AIR_QUIET_DB = -40.0  # dBFS RMS below which a steady level is dead air whatever it sounds like
+DEAD_AIR_NOISE_SPECTRAL_FLATNESS = 0.25  # above it a louder steady level is hiss (~0.56), not compressed music (<0.1)
+DEAD_AIR_MIN_SECONDS = int(os.getenv("DEAD_AIR_MIN_SECONDS", 30))  # shortest silence or steady noise reported
+DEAD_AIR_MAX_SECONDS = int(os.getenv("DEAD_AIR_MAX_SECONDS", 300))  # total dead air before DEAD_AIR_ACTION applies
+DEAD_AIR_ACTION = os.getenv("DEAD_AIR_ACTION", "tag").lower()  # 'tag', 'fail' or 'off'
+ANALYSIS_SAMPLE_RATE = 22050  # Hz, mono; ample for levels
+ANALYSIS_WINDOW = 0.5  # seconds per RMS/peak window
+ANALYSIS_CHUNK_WINDOWS = 120  # windows decoded per read, which bounds memory
+LOUDNESS_REFERENCE_LUFS = -18.0  # ReplayGain 2.0 reference level track gains are relative to
+REPLAYGAIN_TAGS = os.getenv("REPLAYGAIN_TAGS", "true").lower() in ("1", "true", "yes")  # APEv2 tag on MP3 archives
+# Loudness target (LUFS) renditions are normalised to in the recording ffmpeg, '' leaves them as recorded
+RENDITION_LOUDNORM = float(os.getenv("RENDITION_LOUDNORM")) if os.getenv("RENDITION_LOUDNORM") else None
+LOUDNORM_TRUE_PEAK = -1.5  # dBTP ceiling of normalised renditions
+LOUDNORM_RANGE = 11  # LU of loudness range normalised renditions keep
+WAVEFORM_LEVELS = (256, 1024, 4096)  # points per waveform resolution
+
+# Capture mode: 'file' records to disk then uploads, 'stream' pipes ffmpeg
+# output straight into an S3 multipart upload while the show is recording,
+# 'segmented' records fixed-length segments and survives upstream drops
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "file").lower()
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final parts below 5MB
+RECONNECT_DELAY_MAX = int(os.getenv("RECONNECT_DELAY_MAX", 10))  # seconds ffmpeg waits between reconnects
+
+# Segmented capture: fixed-length segments uploaded while the next records
+SEGMENT_DURATION = int(os.getenv("SEGMENT_DURATION", 600))  # seconds
+SEGMENT_UPLOAD_CONCURRENCY = int(os.getenv("SEGMENT_UPLOAD_CONCURRENCY", 2))
+RESTART_BACKOFF_MAX = 30  # seconds between ffmpeg restarts after repeated failures
+STREAM_CACHE_TTL = int(os.getenv("STREAM_CACHE_TTL", 3600))  # seconds resolved mirror lists are reused
+MIRROR_STALL_TIMEOUT = int(os.getenv("MIRROR_STALL_TIMEOUT", 5))  # seconds without data before failing over
+MIRROR_PROBE_TIMEOUT = 3  # seconds allowed to connect to a mirror and read its first bytes
+MULTIPART_PART_SIZE = max(int(os.getenv("MULTIPART_PART_SIZE", 8 * 1024 * 1024)), S3_MIN_PART_SIZE)
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 4))  # Parallel part uploads per file
+
+# Local spool: recordings whose upload failed wait on disk, listed in a
+# journal, until a background drainer gets them into the bucket
+SPOOL_JOURNAL = os.getenv("SPOOL_JOURNAL", os.path.join(OUTPUT_DIR, "spool.journal"))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", 0))  # 0 leaves the spool unbounded
+SPOOL_POLICY = os.getenv("SPOOL_POLICY", "evict-oldest").lower()  # 'evict-oldest' or 'backpressure'
+SPOOL_BACKPRESSURE_TIMEOUT = int(os.getenv("SPOOL_BACKPRESSURE_TIMEOUT", 60))  # seconds a show waits for space
+SPOOL_DRAIN_INTERVAL = int(os.getenv("SPOOL_DRAIN_INTERVAL", 300))  # seconds between drain attempts
+SPOOL_DRAIN_CONCURRENCY = int(os.getenv("SPOOL_DRAIN_CONCURRENCY", 2))  # spooled uploads at once
+SPOOL_ESTIMATE_BYTES_PER_SECOND = 16000  # 128 kbit/s, to size a recording before it exists
+ORPHANED_UPLOAD_MAX_AGE = int(os.getenv("ORPHANED_UPLOAD_MAX_AGE", 86400))  # seconds before an unfinished multipart upload is aborted
+ORPHANED_UPLOAD_CHECK_INTERVAL = int(os.getenv("ORPHANED_UPLOAD_CHECK_INTERVAL", 21600))  # seconds between checks
+# Upload bandwidth in bytes/s, shared by every transfer in the process (0 = unlimited)
+UPLOAD_BANDWIDTH_LIMIT = int(os.getenv("UPLOAD_BANDWIDTH_LIMIT", 0))  # while nothing is recording
+UPLOAD_BANDWIDTH_WHILE_RECORDING = int(os.getenv("UPLOAD_BANDWIDTH_WHILE_RECORDING", 0))  # split across active recordings
+BANDWIDTH_BURST_SECONDS = 1.0  # seconds of the rate an idle governor lets through at once
+
+@lru_cache(maxsize=None)
+def transfer_config():
+    """Managed transfer settings used by upload_to_s3."""
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=MULTIPART_PART_SIZE,
+        multipart_chunksize=MULTIPART_PART_SIZE,
+        max_concurrency=UPLOAD_CONCURRENCY
+    )
+
+# Encoder, muxer, extension and content type of each rendition codec
+RENDITION_CODECS = {
+    "mp3": ("libmp3lame", "mp3", ".mp3", "audio/mpeg"),
+    "aac": ("aac", "adts", ".aac", "audio/aac"),
+    "opus": ("libopus", "opus", ".opus", "audio/ogg"),
+}
+
+@dataclass(frozen=True)
+class Rendition:
+    """An extra encoding of a recording, published next to the archive with `suffix` added to its name."""
+    codec: str  # 'mp3', 'aac' or 'opus'
+    bitrate: str  # e.g. '48k'
+    suffix: str
+    loudnorm: Optional[float] = None  # LUFS target of one-pass loudness normalisation, None to keep levels
+
+    @property
+    def filter_args(self) -> list:
+        """ffmpeg filter options for this output: loudnorm, back at 48 kHz from its 192 kHz output."""
+        if self.loudnorm is None:
+            return []
+        return ["-af", f"loudnorm=I={self.loudnorm:g}:TP={LOUDNORM_TRUE_PEAK:g}:LRA={LOUDNORM_RANGE:g},aresample=48000"]
+
+    @property
+    def name(self) -> str:
+        return f"{self.codec} {self.bitrate}"
+
+    @property
+    def encoder(self) -> str:
+        return RENDITION_CODECS[self.codec][0]
+
+    @property
+    def muxer(self) -> str:
+        return RENDITION_CODECS[self.codec][1]
+
+    @property
+    def extension(self) -> str:
+        return RENDITION_CODECS[self.codec][2]
+
+def parse_renditions(value) -> tuple:
+    """
+    Parse renditions from 'codec:bitrate' pairs, as a comma-separated string
+    or a list, or from config objects with codec, bitrate and an optional
+    suffix (default '_<bitrate>') and loudnorm target (default
+    RENDITION_LOUDNORM).
+    """
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",") if item.strip()]
+    renditions = []
+    for item in value:
+        if isinstance(item, str):
+            codec, _, bitrate = item.partition(":")
+            item = {"codec": codec, "bitrate": bitrate or "64k"}
+        codec = item["codec"].lower()
+        if codec not in RENDITION_CODECS:
+            raise ValueError(f"Unknown rendition codec '{codec}'")
+        bitrate = item.get("bitrate", "64k")
+        loudnorm = item.get("loudnorm", RENDITION_LOUDNORM)
+        renditions.append(Rendition(
+            codec, bitrate, item.get("suffix", f"_{bitrate}"), None if loudnorm is None else float(loudnorm)
+        ))
+    return tuple(renditions)
+
+@dataclass
+class Show:
+    """A scheduled recording of one station."""
+    station: str
+    name: str
+    url: str
+    days: tuple = ("wednesday",)
+    time: str = SCHEDULE_TIME
+    duration: int = RECORDING_DURATION
+    start_early: int = START_EARLY_SECONDS
+    warm_start: int = WARM_START_SECONDS
+    key_prefix: str = "archive/"
+    latest_key: str = "latest.mp3"
+    mode: str = RECORDING_MODE  # 'transcode' or 'copy'
+    format: str = RECORDING_FORMAT  # 'any' or a codec the archive must use, e.g. 'mp3'
+    output_dir: str = OUTPUT_DIR
+    renditions: tuple = ()  # Rendition encodings made alongside the recording
+    hls: bool = HLS_ENABLED  # Also publish the recording as HLS
+    # Set per run: when the file should begin, and the estimated delay from
+    # launching ffmpeg to the air time of its first sample
+    air_time: Optional[float] = None
+    ingest_latency: float = 0.0
+    # Set per run: every mirror of the stream, best first, for failover
+    mirrors: tuple = ()
+
+    @property
+    def job_name(self) -> str:
+        return f"{self.station}/{self.name}"
+
+def parse_format(value: str) -> str:
+    """Normalise an archive format: 'any' or a codec COPY_CONTAINERS can store."""
+    archive_format = value.strip().lower()
+    if archive_format != "any" and archive_format not in COPY_CONTAINERS:
+        raise ValueError(f"Unknown format '{archive_format}'")
+    return archive_format
+
+def parse_days(days) -> tuple:
+    """Normalise a day name, comma-separated names, a list, or 'daily' into weekday names."""
+    if isinstance(days, str):
+        days = WEEKDAYS if days.strip().lower() == "daily" else days.split(",")
+    parsed = tuple(day.strip().lower() for day in days)
+    for day in parsed:
+        if day not in WEEKDAYS:
+            raise ValueError(f"Invalid day '{day}'")
+    return parsed
+
+def default_show() -> Show:
+    """The single show configured by the module constants."""
+    return Show(
+        station="default",
+        name="show",
+        url=STREAM_URL,
+        days=parse_days(SCHEDULE_DAYS),
+        time=SCHEDULE_TIME,
+        duration=RECORDING_DURATION,
+        output_dir=OUTPUT_DIR,
+        renditions=parse_renditions(RENDITIONS),
+        hls=HLS_ENABLED
+    )
+
+def load_shows(config_path: str = None) -> List[Show]:
+    """
+    Load every show from the stations config file.
+    Falls back to the default show when no config file exists.
+    """
+    config_path = config_path or STATIONS_CONFIG
+    if not os.path.exists(config_path):
+        return [default_show()]
+
+    with open(config_path) as f:
+        config = json.load(f)
+
+    shows = []
+    for station in config.get("stations", []):
+        for show in station.get("shows", []):
+            key_prefix = show.get("key_prefix", f"archive/{station['name']}/")
+            if not key_prefix.endswith("/"):
+                key_prefix += "/"
+            try:
+                days = parse_days(show.get("days", show.get("day", "wednesday")))
+                renditions = parse_renditions(show.get("renditions", station.get("renditions", RENDITIONS)))
+                archive_format = parse_format(show.get("format", station.get("format", RECORDING_FORMAT)))
+            except ValueError as e:
+                raise ValueError(f"{e} for show {station['name']}/{show['name']}")
+            shows.append(Show(
+                station=station["name"],
+                name=show["name"],
+                url=show.get("url", station.get("url")),
+                days=days,
+                time=show.get("time", SCHEDULE_TIME),
+                duration=int(show.get("duration", RECORDING_DURATION)),
+                start_early=int(show.get("start_early", station.get("start_early", START_EARLY_SECONDS))),
+                warm_start=int(show.get("warm_start", station.get("warm_start", WARM_START_SECONDS))),
+                key_prefix=key_prefix,
+                latest_key=show.get("latest_key", f"latest/{station['name']}.mp3"),
+                mode=show.get("mode", station.get("mode", RECORDING_MODE)).lower(),
+                format=archive_format,
+                output_dir=os.path.join(OUTPUT_DIR, station["name"], show["name"]),
+                renditions=renditions,
+                hls=bool(show.get("hls", station.get("hls", HLS_ENABLED)))
+            ))
+    return shows
+
+def load_max_concurrent(config_path: str = None) -> int:
+    """Read the concurrent recording cap from the config file, if it sets one."""
+    config_path = config_path or STATIONS_CONFIG
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            return int(json.load(f).get("max_concurrent", MAX_CONCURRENT_RECORDINGS))
+    return MAX_CONCURRENT_RECORDINGS
 
 def retry_decorator(max_retries=3, delay=5):
     """Decorator to retry functions with exponential backoff."""
@@ -196,14 +811,170 @@ def retry_decorator(max_retries=3, delay=5):
                     if attempt == max_retries - 1:
                         raise e
                     wait_time = delay * (2 ** attempt)
+                    metrics.inc("streamseed_retries_total", function=func.__name__)
                     log_error(f"Attempt {attempt + 1} failed, retrying in {wait_time}s: {e}")
                     time.sleep(wait_time)
             return None
         return wrapper
     return decorator
 
-def verify_recording(file_path: str) -> bool:
-    """Verify the recording meets minimum requirements."""
+# Bitrates in kbps by (MPEG version 1, layer) and (MPEG 2/2.5, layer); index 0 and 15 are invalid
+MPEG_BITRATES = {
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+@lru_cache(maxsize=None)
+def mpeg_frame_table() -> tuple:
+    """
+    Frame (length, samples, sample rate, kbps) for every value of an MPEG
+    audio header's second and third bytes, or None where they are invalid.
+    Looking headers up here keeps the per-frame work to two byte reads.
+    """
+    table = [None] * 65536
+    for key in range(0xE000, 0x10000):
+        b1, b2 = key >> 8, key & 0xFF
+        version, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+        bitrate_index, rate_index, padding = b2 >> 4, (b2 >> 2) & 3, (b2 >> 1) & 1
+        if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        kbps = MPEG_BITRATES[(version == 3, layer)][bitrate_index - 1]
+        rate = MPEG_SAMPLE_RATES[version][rate_index]
+        if layer == 1:
+            table[key] = ((12 * kbps * 1000 // rate + padding) * 4, 384, rate, kbps)
+        else:
+            samples = 576 if layer == 3 and version != 3 else 1152
+            table[key] = (samples // 8 * kbps * 1000 // rate + padding, samples, rate, kbps)
+    return tuple(table)
+
+def parse_mpeg_header(mm, pos: int) -> Optional[tuple]:
+    if mm[pos] != 0xFF:
+        return None
+    return mpeg_frame_table()[(mm[pos + 1] << 8) | mm[pos + 2]]
+
+def parse_adts_header(mm, pos: int) -> Optional[tuple]:
+    if mm[pos] != 0xFF or mm[pos + 1] & 0xF6 != 0xF0:
+        return None
+    rate_index = (mm[pos + 2] >> 2) & 0xF
+    length = ((mm[pos + 3] & 3) << 11) | (mm[pos + 4] << 3) | (mm[pos + 5] >> 5)
+    if rate_index >= len(ADTS_SAMPLE_RATES) or length < 7:
+        return None
+    samples = 1024 * ((mm[pos + 6] & 3) + 1)
+    rate = ADTS_SAMPLE_RATES[rate_index]
+    return (length, samples, rate, round(length * 8 * rate / samples / 1000))
+
+# Frame header parser and header size by recording extension
+FRAME_SCANNERS = {".mp3": (parse_mpeg_header, 4), ".aac": (parse_adts_header, 7)}
+
+@dataclass
+class AudioScan:
+    """What a frame-header scan found in a recording."""
+    frames: int = 0
+    duration: float = 0.0
+    audio_bytes: int = 0
+    sync_losses: int = 0
+    skipped_bytes: int = 0
+    truncated_bytes: int = 0
+    bitrates: Dict[int, int] = field(default_factory=dict)  # kbps -> frames
+
+    def bitrate_profile(self) -> str:
+        if not self.bitrates:
+            return "no audio"
+        if len(self.bitrates) == 1:
+            return f"CBR {next(iter(self.bitrates))} kbps"
+        average = self.audio_bytes * 8 / max(self.duration, 1e-6) / 1000
+        return f"VBR {min(self.bitrates)}-{max(self.bitrates)} kbps, avg {average:.0f} kbps"
+
+    def summary(self) -> str:
+        return (
+            f"{self.duration:.1f}s in {self.frames} frames, {self.bitrate_profile()}, "
+            f"{self.sync_losses} sync losses ({self.skipped_bytes} bytes skipped), "
+            f"{self.truncated_bytes} bytes truncated at the end"
+        )
+
+def audio_data_bounds(mm) -> tuple:
+    """Start and end of the audio frames, excluding ID3v2, ID3v1 and APEv2 tags."""
+    start, end = 0, len(mm)
+    if mm[:3] == b"ID3" and len(mm) >= 10:
+        size = (mm[6] << 21) | (mm[7] << 14) | (mm[8] << 7) | mm[9]
+        start = 10 + size + (10 if mm[5] & 0x10 else 0)
+    if end - start >= 128 and mm[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end - start >= 32 and mm[end - 32:end - 24] == b"APETAGEX":
+        tag_size = int.from_bytes(mm[end - 20:end - 16], "little")
+        has_header = mm[end - 9] & 0x80
+        end -= tag_size + (32 if has_header else 0)
+    return min(start, end), max(end, 0)
+
+def find_frame(mm, pos: int, end: int, parse, header_size: int) -> Optional[int]:
+    """Next offset holding a frame header that is followed by another one (or the end)."""
+    pos = mm.find(b"\xff", pos, end)
+    while pos != -1 and pos + header_size <= end:
+        header = parse(mm, pos)
+        if header:
+            following = pos + header[0]
+            if following >= end or (following + header_size <= end and parse(mm, following)):
+                return pos
+        pos = mm.find(b"\xff", pos + 1, end)
+    return None
+
+def scan_audio_frames(file_path: str) -> Optional[AudioScan]:
+    """
+    Walk the MPEG audio (MP3) or ADTS (AAC) frame headers of a recording
+    in one memory-mapped pass, without decoding. Returns None for
+    containers without a frame scanner.
+    """
+    scanner = FRAME_SCANNERS.get(os.path.splitext(file_path)[1].lower())
+    if not scanner:
+        return None
+    parse, header_size = scanner
+    scan = AudioScan()
+    with open(file_path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return scan
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos, end = audio_data_bounds(mm)
+            bitrates = scan.bitrates
+            first = True
+            while pos + header_size <= end:
+                header = parse(mm, pos)
+                if header is None:
+                    found = find_frame(mm, pos + 1, end, parse, header_size)
+                    if found is None:
+                        scan.skipped_bytes += end - pos
+                        pos = end
+                        break
+                    scan.sync_losses += 1
+                    scan.skipped_bytes += found - pos
+                    pos = found
+                    continue
+                length, samples, rate, kbps = header
+                if pos + length > end:
+                    break
+                # The first MP3 frame may be a Xing/Info header without audio
+                if not (first and parse is parse_mpeg_header and
+                        (mm.find(b"Xing", pos, pos + 64) != -1 or mm.find(b"Info", pos, pos + 64) != -1)):
+                    scan.frames += 1
+                    scan.duration += samples / rate
+                    scan.audio_bytes += length
+                    bitrates[kbps] = bitrates.get(kbps, 0) + 1
+                first = False
+                pos += length
+            scan.truncated_bytes = end - pos
+    return scan
+
+def verify_recording(file_path: str, expected_duration: Optional[float] = None) -> bool:
+    """
+    Verify the recording meets minimum requirements: its size, that it
+    holds audio frames, and that it is no more than DURATION_TOLERANCE
+    seconds shorter than `expected_duration`.
+    """
     try:
         if not os.path.exists(file_path):
             log_error(f"Recording file not found: {file_path}")
@@ -213,152 +984,3263 @@ def verify_recording(file_path: str) -> bool:
         if file_size < MIN_FILE_SIZE:
             log_error(f"Recording file too small ({file_size} bytes): {file_path}")
             return False
+
+        scan = scan_audio_frames(file_path)
+        if scan is None:
+            return True
+        if not scan.frames:
+            log_error(f"Recording has no audio frames: {file_path}")
+            return False
+        log_info(f"Verified {file_path}: {scan.summary()}")
+        if expected_duration and scan.duration < expected_duration - DURATION_TOLERANCE:
+            log_error(
+                f"Recording too short ({scan.duration:.0f}s of {expected_duration:.0f}s expected): {file_path}"
+            )
+            return False
             
         return True
     except Exception as e:
         log_error(f"Error verifying recording: {e}")
         return False
 
-@retry_decorator(max_retries=MAX_UPLOAD_RETRIES)
-def upload_to_s3(local_file: str, s3_key: str) -> bool:
-    """Upload a file to Vultr Object Storage with retries."""
-    try:
-        with open(local_file, 'rb') as file:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key=s3_key,
-                Body=file,
-                ACL='public-read'
-            )
-        log_info(f"Uploaded {local_file} to Vultr Object Storage as {s3_key}")
-        return True
-    except Exception as e:
-        log_error(f"Error uploading {local_file}: {e}")
-        return False
+FRAME_INDEX_SIDECAR_SUFFIX = ".frames"
+FRAME_INDEX_MAGIC = b"SSFI"
+FRAME_INDEX_INTERVAL = 1.0  # seconds of audio between index points
+FRAME_INDEX_CODECS = {".mp3": 0, ".aac": 1}
 
-def upload_latest(local_file):
-    """Upload the latest recording as 'latest.mp3'."""
-    latest_key = "latest.mp3"
-    upload_to_s3(local_file, latest_key)
+@dataclass
+class FrameIndex:
+    """Byte offsets of frame starts at regular sample positions in a recording."""
+    extension: str
+    sample_rate: int = 0
+    total_samples: int = 0
+    audio_end: int = 0  # Byte offset just past the last frame
+    points: List[tuple] = field(default_factory=list)  # (sample, byte offset)
 
-def cleanup_local_file(file_path: str) -> None:
-    """Remove local file after successful upload."""
-    try:
-        os.remove(file_path)
-        log_info(f"Cleaned up local file: {file_path}")
-    except Exception as e:
-        log_error(f"Error cleaning up {file_path}: {e}")
+    @property
+    def duration(self) -> float:
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully."""
-    log_info("Shutdown signal received. Cleaning up...")
-    # Add any cleanup code here
-    sys.exit(0)
+    def byte_range(self, start: float, end: float) -> tuple:
+        """
+        (first byte, last byte, sample at the first byte) of the frames
+        holding `start` to `end` seconds, beginning and ending on frame
+        starts found in the index.
+        """
+        samples = [sample for sample, _ in self.points]
+        first = max(bisect.bisect_right(samples, start * self.sample_rate) - 1, 0)
+        last = bisect.bisect_left(samples, end * self.sample_rate)
+        end_byte = self.points[last][1] if last < len(self.points) else self.audio_end
+        return self.points[first][1], end_byte - 1, self.points[first][0]
+
+    def to_bytes(self) -> bytes:
+        """
+        The sidecar, little-endian: the magic "SSFI", version (u8), codec
+        (u8, 0 MPEG audio, 1 ADTS), two reserved bytes, the sample rate
+        (u32), total samples (u64), end of the audio (u64) and point count
+        (u32); then each point's sample (u64) and byte offset (u64).
+        """
+        header = FRAME_INDEX_MAGIC + struct.pack(
+            "<BBHIQQI", 1, FRAME_INDEX_CODECS[self.extension], 0,
+            self.sample_rate, self.total_samples, self.audio_end, len(self.points)
+        )
+        return header + struct.pack(f"<{len(self.points) * 2}Q", *(value for point in self.points for value in point))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FrameIndex":
+        if data[:4] != FRAME_INDEX_MAGIC:
+            raise ValueError("Not a frame index")
+        version, codec, _, sample_rate, total_samples, audio_end, count = struct.unpack_from("<BBHIQQI", data, 4)
+        values = struct.unpack_from(f"<{count * 2}Q", data, 32)
+        extension = next(ext for ext, value in FRAME_INDEX_CODECS.items() if value == codec)
+        return cls(extension, sample_rate, total_samples, audio_end, list(zip(values[0::2], values[1::2])))
+
+class FrameIndexer:
+    """
+    Builds a FrameIndex from a recording's bytes as they are written, so
+    no second pass over the file is needed. Frames are followed header to
+    header like scan_audio_frames, resyncing the same way after damaged
+    audio; only a partial frame at the end of each write is buffered.
+    """
+
+    def __init__(self, extension: str, interval: float = FRAME_INDEX_INTERVAL):
+        self.parse, self.header_size = FRAME_SCANNERS[extension]
+        self.index = FrameIndex(extension)
+        self.interval = interval
+        self.buffer = bytearray()
+        self.offset = 0  # File offset of buffer[0]
+        self.skip = None  # Bytes of ID3v2 tag still to skip; None until the start was seen
+        self.next_point = 0
+        self.first = True
+        self.synced = True  # After a sync loss, a header counts only once the next one is seen too
+
+    @classmethod
+    def for_file(cls, file_path: str) -> Optional["FrameIndexer"]:
+        """An indexer for the recording's container, or None if it has no frame scanner."""
+        extension = os.path.splitext(file_path)[1].lower()
+        return cls(extension) if extension in FRAME_SCANNERS else None
+
+    def update(self, data: bytes) -> None:
+        self.buffer += data
+        self._scan(final=False)
+
+    def result(self) -> FrameIndex:
+        self._scan(final=True)
+        return self.index
+
+    def _scan(self, final: bool) -> None:
+        buffer, parse, header_size = self.buffer, self.parse, self.header_size
+        if self.skip is None:
+            if len(buffer) < 10 and not final:
+                return
+            self.skip = 0
+            if buffer[:3] == b"ID3" and len(buffer) >= 10:  # Skip an ID3v2 tag
+                size = (buffer[6] << 21) | (buffer[7] << 14) | (buffer[8] << 7) | buffer[9]
+                self.skip = 10 + size + (10 if buffer[5] & 0x10 else 0)
+        pos = min(self.skip, len(buffer))
+        self.skip -= pos
+        while pos + header_size <= len(buffer):
+            header = parse(buffer, pos)
+            if header is not None:
+                following = pos + header[0]
+                if self.synced:
+                    if following > len(buffer):
+                        break  # Wait for the rest of the frame
+                    pos = self._add_frame(pos, header)
+                    continue
+                if following + header_size <= len(buffer):
+                    if parse(buffer, following):
+                        self.synced = True
+                        pos = self._add_frame(pos, header)
+                        continue
+                elif not final:
+                    break  # Wait for the next header
+                elif following <= len(buffer):
+                    pos = self._add_frame(pos, header)
+                    continue
+            self.synced = False
+            found = buffer.find(b"\xff", pos + 1)
+            pos = found if found != -1 else len(buffer)
+        del buffer[:pos]
+        self.offset += pos
+
+    def _add_frame(self, pos: int, header: tuple) -> int:
+        length, samples, rate, _ = header
+        index = self.index
+        first, self.first = self.first, False
+        # The first MP3 frame may be a Xing/Info header without audio
+        if first and self.parse is parse_mpeg_header and (
+                self.buffer.find(b"Xing", pos, pos + 64) != -1 or self.buffer.find(b"Info", pos, pos + 64) != -1):
+            return pos + length
+        if not index.sample_rate:
+            index.sample_rate = rate
+        if index.total_samples >= self.next_point:
+            index.points.append((index.total_samples, self.offset + pos))
+            self.next_point = index.total_samples + int(self.interval * index.sample_rate)
+        index.total_samples += samples
+        index.audio_end = self.offset + pos + length
+        return pos + length
+
+def build_frame_index(file_path: str) -> Optional[FrameIndex]:
+    """Index a recording already on disk, e.g. one joined from segments."""
+    indexer = FrameIndexer.for_file(file_path)
+    if indexer is None:
+        return None
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            indexer.update(chunk)
+    return indexer.result()
+
+def save_frame_index(file_path: str, index: Optional[FrameIndex]) -> None:
+    if index and index.points:
+        with open(file_path + FRAME_INDEX_SIDECAR_SUFFIX, 'wb') as f:
+            f.write(index.to_bytes())
+
+def frame_index_key_for(recording_key: str) -> str:
+    """Bucket key of a recording's frame index: archive/show_x.mp3 -> archive/show_x.frames"""
+    return os.path.splitext(recording_key)[0] + FRAME_INDEX_SIDECAR_SUFFIX
+
+def publish_frame_index(recording_file: str, recording_key: str) -> bool:
+    """Upload the recording's frame index next to it, so clips can be cut from the archive."""
+    index_file = recording_file + FRAME_INDEX_SIDECAR_SUFFIX
+    if not os.path.exists(index_file):
+        return False
+    return upload_to_s3(index_file, frame_index_key_for(recording_key))
+
+def fetch_range(s3_key: str, first: int, last: int) -> bytes:
+    response = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key, Range=f"bytes={first}-{last}")
+    return response['Body'].read()
 
-def record_stream() -> Optional[str]:
-    """Record the MP3 stream."""
+def extract_clip(s3_key: str, start: float, end: float, output_file: str) -> Optional[str]:
+    """
+    Cut `start` to `end` seconds out of an archived recording without
+    downloading all of it: the frame index maps the times to a byte range,
+    which is fetched with ranged GETs (MULTIPART_PART_SIZE each, in
+    parallel), then trimmed to whole frames. Nothing is re-encoded.
+    """
     try:
-        if not os.path.exists(OUTPUT_DIR):
-            os.makedirs(OUTPUT_DIR)
-
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_file = os.path.join(OUTPUT_DIR, f"show_{timestamp}.mp3")
-
-        command = [
-            "ffmpeg",
-            "-i", STREAM_URL,
-            "-t", str(RECORDING_DURATION),
-            "-acodec", "libmp3lame",
-            "-ab", "128k",
-            output_file,
+        index_data = s3_client.get_object(Bucket=BUCKET_NAME, Key=frame_index_key_for(s3_key))['Body'].read()
+        index = FrameIndex.from_bytes(index_data)
+        end = min(end, index.duration)
+        if not index.points or end <= start:
+            log_error(f"Clip {start:.1f}-{end:.1f}s is outside {s3_key} ({index.duration:.1f}s)")
+            return None
+        first_byte, last_byte, sample = index.byte_range(start, end)
+        ranges = [
+            (offset, min(offset + MULTIPART_PART_SIZE, last_byte + 1) - 1)
+            for offset in range(first_byte, last_byte + 1, MULTIPART_PART_SIZE)
         ]
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+            data = b"".join(pool.map(lambda byte_range: fetch_range(s3_key, *byte_range), ranges))
 
-        log_info(f"Recording started: {output_file}")
-        result = subprocess.run(command, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            log_error(f"Recording failed: {result.stderr}")
+        parse, header_size = FRAME_SCANNERS[index.extension]
+        start_sample, end_sample = start * index.sample_rate, end * index.sample_rate
+        frames, pos = [], 0
+        while pos + header_size <= len(data) and sample < end_sample:
+            header = parse(data, pos)
+            if header is None:
+                found = find_frame(data, pos + 1, len(data), parse, header_size)
+                if found is None:
+                    break
+                pos = found
+                continue
+            length, samples = header[0], header[1]
+            if sample + samples > start_sample:
+                frames.append(data[pos:pos + length])
+            sample += samples
+            pos += length
+        if not frames:
+            log_error(f"No frames found for clip {start:.1f}-{end:.1f}s of {s3_key}")
             return None
-            
-        log_info(f"Recording finished: {output_file}")
+        with open(output_file, 'wb') as f:
+            f.writelines(frames)
+        log_info(
+            f"Clipped {start:.1f}-{end:.1f}s of {s3_key} to {output_file} "
+            f"({len(data) / 1024 ** 2:.1f} MB fetched in {len(ranges)} range(s))"
+        )
         return output_file
     except Exception as e:
-        log_error(f"Error during recording: {e}")
+        log_error(f"Error clipping {s3_key}: {e}")
         return None
 
-# Add executable check for ffmpeg
-def check_ffmpeg():
-    """Check if ffmpeg is installed and accessible."""
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], 
-                              capture_output=True, 
-                              text=True)
-        if result.returncode != 0:
-            raise Exception("FFmpeg check failed")
-        return True
-    except Exception as e:
-        log_error(f"FFmpeg not found or not accessible: {e}")
+def parse_clock_time(value: str) -> float:
+    """Seconds from '90', '1:30' or '1:01:30.5'."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def level_db(value: float) -> float:
+    """Convert a linear amplitude to dBFS."""
+    return 20 * math.log10(max(value, 1e-6))
+
+class DeadAirDetector:
+    """
+    Windowed RMS and peak levels over decoded PCM, fed in chunks. Runs of
+    silent windows, or of steady noise whose level barely moves between
+    windows, of at least DEAD_AIR_MIN_SECONDS are kept as dead air. Heavily
+    compressed music holds its level too, so a steady window above
+    DEAD_AIR_QUIET_DB must also have the flat spectrum of hiss.
+    """
+
+    def __init__(self, sample_rate: int = ANALYSIS_SAMPLE_RATE, window: float = ANALYSIS_WINDOW):
+        self.sample_rate = sample_rate
+        self.window = window
+        self.window_samples = int(sample_rate * window)
+        self.samples = 0
+        self.windows = 0
+        self.sum_squares = 0.0
+        self.peak = 0.0
+        self.previous_db = None
+        self.run_start = None
+        self.run_silent = True
+        self.dead_air: List[dict] = []
+
+    def feed(self, samples) -> None:
+        """Analyse float samples; chunks should be whole windows except the last."""
+        self.samples += len(samples)
+        count = len(samples) // self.window_samples
+        if not count:
+            return
+        frames = samples[:count * self.window_samples].reshape(count, self.window_samples)
+        mean_squares = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / self.window_samples
+        levels = 10 * np.log10(np.maximum(mean_squares, 1e-12))
+        self.sum_squares += float(mean_squares.sum())
+        self.peak = max(self.peak, float(np.abs(frames).max()))
+
+        previous = np.concatenate(([levels[0] if self.previous_db is None else self.previous_db], levels[:-1]))
+        silent = levels < SILENCE_THRESHOLD_DB
+        steady = ~silent & (np.abs(levels - previous) < DEAD_AIR_FLATNESS_DB)
+        # Only the (normally few) loud steady windows are transformed
+        loud = np.flatnonzero(steady & (levels >= DEAD_AIR_QUIET_DB))
+        if len(loud):
+            steady[loud] = self.spectral_flatness(frames[loud]) >= DEAD_AIR_NOISE_SPECTRAL_FLATNESS
+        dead = silent | steady
+        self.previous_db = float(levels[-1])
+
+        # Only run boundaries are visited in Python
+        changes = np.flatnonzero(np.diff(dead.astype(np.int8))) + 1
+        bounds = [0, *changes.tolist(), count]
+        for start, end in zip(bounds, bounds[1:]):
+            if dead[start]:
+                if self.run_start is None:
+                    # A steady window matches the one before it, which belongs to the run too
+                    self.run_start = max(self.windows + start - (0 if silent[start] else 1), 0)
+                    self.run_silent = True
+                self.run_silent = self.run_silent and bool(silent[start:end].all())
+            else:
+                self.end_run(self.windows + start)
+        self.windows += count
+
+    def spectral_flatness(self, frames):
+        """
+        Geometric over arithmetic mean of each window's power spectrum
+        between 100 Hz and 4 kHz (below any MP3 lowpass): near 0 for
+        tones and music, about 0.56 for white noise.
+        """
+        low, high = (int(hz * self.window_samples / self.sample_rate) for hz in (100, 4000))
+        power = np.abs(np.fft.rfft(frames, axis=1)[:, low:high]) ** 2 + 1e-20
+        return np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+
+    def end_run(self, window_index: int) -> None:
+        if self.run_start is None:
+            return
+        start, end = self.run_start * self.window, window_index * self.window
+        if end - start >= DEAD_AIR_MIN_SECONDS:
+            self.dead_air.append({
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "duration": round(end - start, 3),
+                "kind": "silence" if self.run_silent else "steady noise",
+            })
+        self.run_start = None
+
+    def result(self) -> "AudioAnalysis":
+        self.end_run(self.windows)
+        return AudioAnalysis(
+            duration=round(self.samples / self.sample_rate, 3),
+            rms_db=round(level_db(math.sqrt(self.sum_squares / max(self.windows, 1))), 2),
+            peak_db=round(level_db(self.peak), 2),
+            dead_air=self.dead_air
+        )
+
+class WaveformBuilder:
+    """
+    Min/max peaks of every analysis window, collected from the same PCM
+    chunks as the dead air detector and reduced to WAVEFORM_LEVELS
+    resolutions at the end. A two hour show keeps 14,400 pairs in memory.
+    """
+
+    def __init__(self, sample_rate: int = ANALYSIS_SAMPLE_RATE, window: float = ANALYSIS_WINDOW):
+        self.sample_rate = sample_rate
+        self.window_samples = int(sample_rate * window)
+        self.minimums = []
+        self.maximums = []
+
+    def feed(self, samples) -> None:
+        count = len(samples) // self.window_samples
+        if count:
+            frames = samples[:count * self.window_samples].reshape(count, self.window_samples)
+            self.minimums.append(frames.min(axis=1))
+            self.maximums.append(frames.max(axis=1))
+
+    def levels(self) -> List[tuple]:
+        """(samples per point, int8 min/max pairs interleaved) for each resolution."""
+        if not self.minimums:
+            return []
+        minimums = np.concatenate(self.minimums)
+        maximums = np.concatenate(self.maximums)
+        levels = []
+        for points in WAVEFORM_LEVELS:
+            group = max(math.ceil(len(minimums) / points), 1)
+            starts = np.arange(0, len(minimums), group)
+            pairs = np.empty(len(starts) * 2, dtype=np.int8)
+            pairs[0::2] = np.round(np.clip(np.minimum.reduceat(minimums, starts), -1, 1) * 127)
+            pairs[1::2] = np.round(np.clip(np.maximum.reduceat(maximums, starts), -1, 1) * 127)
+            levels.append((group * self.window_samples, pairs))
+        return levels
+
+WAVEFORM_SIDECAR_SUFFIX = ".peaks"
+WAVEFORM_MAGIC = b"SSWF"
+
+def save_waveform(file_path: str, builder: WaveformBuilder) -> Optional[str]:
+    """
+    Write the waveform sidecar, a little-endian binary file: the magic
+    "SSWF", version (u8), level count (u8), two reserved bytes and the PCM
+    sample rate (u32); then per level the samples per point (u32), the
+    point count (u32) and that many (min, max) int8 pairs, coarsest first.
+    """
+    levels = builder.levels()
+    if not levels:
+        return None
+    path = file_path + WAVEFORM_SIDECAR_SUFFIX
+    with open(path, 'wb') as f:
+        f.write(WAVEFORM_MAGIC + struct.pack("<BBHI", 1, len(levels), 0, builder.sample_rate))
+        for samples_per_point, pairs in levels:
+            f.write(struct.pack("<II", samples_per_point, len(pairs) // 2))
+            f.write(pairs.tobytes())
+    return path
+
+def waveform_key_for(recording_key: str) -> str:
+    """Bucket key of a recording's waveform, next to it: archive/show_x.mp3 -> archive/show_x.peaks"""
+    return os.path.splitext(recording_key)[0] + WAVEFORM_SIDECAR_SUFFIX
+
+def publish_waveform(recording_file: str, recording_key: str, latest_key: Optional[str] = None) -> bool:
+    """Upload the recording's waveform next to it, and next to 'latest' too when given."""
+    waveform_file = recording_file + WAVEFORM_SIDECAR_SUFFIX
+    if not os.path.exists(waveform_file):
         return False
+    if not upload_to_s3(waveform_file, waveform_key_for(recording_key)):
+        return False
+    if latest_key:
+        return copy_s3_object(waveform_key_for(recording_key), waveform_key_for(latest_key))
+    return True
 
-def main():
-    """Main function that handles recording and uploading."""
-    # Test Discord notifications on startup
-    test_discord_notification()
-    
-    # Add FFmpeg check
-    if not check_ffmpeg():
-        log_error("FFmpeg is required but not found. Please install FFmpeg.")
-        return
-        
-    log_info("Starting new recording session...")
-    
-    # Step 1: Record the stream
-    recording_file = record_stream()
-    if not recording_file:
-        log_error("Recording failed, exiting.")
-        return
+ANALYSIS_SIDECAR_SUFFIX = ".analysis.json"
 
-    # Step 2: Verify recording
-    if not verify_recording(recording_file):
-        log_error("Recording verification failed, exiting.")
-        cleanup_local_file(recording_file)
-        return
+@dataclass
+class AudioAnalysis:
+    """Levels, EBU R128 loudness and dead air found in a recording."""
+    duration: float
+    rms_db: float
+    peak_db: float
+    dead_air: List[dict]  # start, end, duration (seconds into the recording) and kind
+    loudness_lufs: Optional[float] = None  # Integrated loudness
+    loudness_range_lu: Optional[float] = None
+    true_peak_dbtp: Optional[float] = None
 
-    # Step 3: Upload to S3
-    recording_key = f"archive/{os.path.basename(recording_file)}"
-    if upload_to_s3(recording_file, recording_key):
-        # Step 4: Update the "latest" recording
-        if upload_latest(recording_file):
-            log_success(f"Successfully recorded and uploaded {recording_key}")
-            # Step 5: Cleanup local file after successful upload
-            cleanup_local_file(recording_file)
-
-def get_utc_time_from_sydney(schedule_time):
-    current_date = datetime.datetime.now(SYDNEY_TZ).date()
-    sydney_time = datetime.datetime.strptime(schedule_time, '%H:%M')
-    sydney_time = datetime.datetime.combine(current_date, sydney_time.time())
-    sydney_time = SYDNEY_TZ.localize(sydney_time)
-    utc_time = sydney_time.astimezone(pytz.UTC)
-    return utc_time.strftime('%H:%M')
+    @property
+    def dead_air_seconds(self) -> float:
+        return sum(run["duration"] for run in self.dead_air)
 
-if __name__ == "__main__":
-    print_banner()
-    
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    @property
+    def replaygain_gain(self) -> Optional[float]:
+        """dB to play the recording at LOUDNESS_REFERENCE_LUFS."""
+        return None if self.loudness_lufs is None else LOUDNESS_REFERENCE_LUFS - self.loudness_lufs
+
+    @property
+    def replaygain_peak(self) -> Optional[float]:
+        """True peak as a linear sample value, as ReplayGain tags store it."""
+        return None if self.true_peak_dbtp is None else 10 ** (self.true_peak_dbtp / 20)
+
+    def summary(self) -> str:
+        longest = max((run["duration"] for run in self.dead_air), default=0)
+        loudness = ""
+        if self.loudness_lufs is not None:
+            loudness = f"{self.loudness_lufs:.1f} LUFS, LRA {self.loudness_range_lu:.1f} LU, true peak {self.true_peak_dbtp:.1f} dBTP, "
+        return (
+            f"RMS {self.rms_db:.1f} dBFS, peak {self.peak_db:.1f} dBFS, {loudness}"
+            f"{self.dead_air_seconds:.0f}s dead air in {len(self.dead_air)} run(s), longest {longest:.0f}s"
+        )
+
+    def metadata(self) -> Dict[str, str]:
+        metadata = {"duration": f"{self.duration:.1f}", "dead-air-seconds": f"{self.dead_air_seconds:.0f}"}
+        if self.loudness_lufs is not None:
+            metadata.update({
+                "loudness-lufs": f"{self.loudness_lufs:.1f}",
+                "loudness-range-lu": f"{self.loudness_range_lu:.1f}",
+                "true-peak-dbtp": f"{self.true_peak_dbtp:.1f}",
+                "replaygain-track-gain": f"{self.replaygain_gain:+.2f} dB",
+                "replaygain-track-peak": f"{self.replaygain_peak:.6f}",
+            })
+        return metadata
+
+def build_analysis_command(file_path: str) -> list:
+    """
+    ffmpeg command decoding a recording to mono float PCM on stdout. The
+    ebur128 filter measures loudness on the way, at the source's channels
+    and rate, and logs its summary when the decode ends.
+    """
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "level+info",
+        "-i", file_path,
+        "-vn", "-af", "ebur128=peak=true:framelog=quiet",
+        "-ac", "1", "-ar", str(ANALYSIS_SAMPLE_RATE),
+        "-f", "f32le", "pipe:1",
+    ]
+
+# Lines of the summary ebur128 logs when it closes
+EBUR128_INTEGRATED_RE = re.compile(r"^I:\s+(-?[\d.]+|-inf) LUFS", re.MULTILINE)
+EBUR128_RANGE_RE = re.compile(r"^LRA:\s+([\d.]+) LU", re.MULTILINE)
+EBUR128_TRUE_PEAK_RE = re.compile(r"^Peak:\s+(-?[\d.]+|-inf) dBFS", re.MULTILINE)
+LOUDNESS_FLOOR_LUFS = -70.0  # ebur128's absolute gate; anything at or below it measured nothing
+
+def parse_loudness_summary(stderr: str) -> dict:
+    """AudioAnalysis loudness fields from ebur128's summary, empty if it measured nothing."""
+    integrated = EBUR128_INTEGRATED_RE.findall(stderr)
+    loudness_range = EBUR128_RANGE_RE.findall(stderr)
+    true_peak = EBUR128_TRUE_PEAK_RE.findall(stderr)
+    if not (integrated and loudness_range and true_peak) or integrated[-1] == "-inf":
+        return {}
+    if float(integrated[-1]) <= LOUDNESS_FLOOR_LUFS or true_peak[-1] == "-inf":
+        return {}
+    return {
+        "loudness_lufs": float(integrated[-1]),
+        "loudness_range_lu": float(loudness_range[-1]),
+        "true_peak_dbtp": float(true_peak[-1]),
+    }
+
+def analyze_recording(file_path: str) -> Optional[AudioAnalysis]:
+    """
+    Decode the recording in ANALYSIS_CHUNK_WINDOWS chunks and measure its
+    levels and dead air, writing its waveform sidecar from the same pass,
+    in which ffmpeg also measures its loudness.
+    Memory stays at one chunk however long the show.
+    """
+    if not load_numpy():
+        log_error("numpy is not installed, skipping audio analysis")
+        return None
+    detector = DeadAirDetector()
+    waveform = WaveformBuilder()
+    chunk_bytes = detector.window_samples * ANALYSIS_CHUNK_WINDOWS * 4
 
-    # Convert SCHEDULE_TIME to UTC
-    utc_schedule_time = get_utc_time_from_sydney(SCHEDULE_TIME)
+    def read_pcm(process):
+        for chunk in iter(lambda: process.stdout.read(chunk_bytes), b""):
+            samples = np.frombuffer(chunk[:len(chunk) // 4 * 4], dtype=np.float32)
+            detector.feed(samples)
+            waveform.feed(samples)
 
-    # Schedule using UTC time
-    schedule.every().wednesday.at(utc_schedule_time).do(main)
+    start_time = time.monotonic()
+    result = run_ffmpeg(build_analysis_command(file_path), stdout_handler=read_pcm)
+    if result.returncode != 0:
+        log_error(f"Audio analysis failed for {file_path}: {result.stderr[-500:]}")
+        return None
+    analysis = dataclasses.replace(detector.result(), **parse_loudness_summary(result.stderr))
+    save_waveform(file_path, waveform)
+    elapsed = max(time.monotonic() - start_time, 1e-6)
+    log_info(
+        f"Analysed {file_path}: {analysis.summary()} "
+        f"({analysis.duration / elapsed:.0f}x real time)"
+    )
+    return analysis
 
-    log_info(f"Scheduler set for every Wednesday at {SCHEDULE_TIME} Sydney time (UTC: {utc_schedule_time})")
+def save_analysis(file_path: str, analysis: AudioAnalysis) -> None:
+    with open(file_path + ANALYSIS_SIDECAR_SUFFIX, 'w') as f:
+        json.dump(asdict(analysis), f)
 
+def load_analysis(file_path: str) -> Optional[AudioAnalysis]:
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check schedule every minute
-    except Exception as e:
-        log_error(f"Scheduler error: {e}")
-        sys.exit(1)
+        with open(file_path + ANALYSIS_SIDECAR_SUFFIX) as f:
+            return AudioAnalysis(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+def check_dead_air(file_path: str) -> bool:
+    """
+    Analyse the recording and apply DEAD_AIR_ACTION when its dead air
+    exceeds DEAD_AIR_MAX_SECONDS: 'fail' rejects it, 'tag' reports it and
+    keeps the amount in the object metadata. Returns whether to publish.
+    MP3 recordings get a ReplayGain tag from the loudness measured too.
+    """
+    analysis = analyze_recording(file_path)
+    if analysis is None:
+        return True
+    save_analysis(file_path, analysis)
+    if REPLAYGAIN_TAGS and file_path.endswith(".mp3") and analysis.loudness_lufs is not None:
+        write_replaygain_tag(file_path, analysis)
+    if DEAD_AIR_ACTION == "off" or analysis.dead_air_seconds <= DEAD_AIR_MAX_SECONDS:
+        return True
+    if DEAD_AIR_ACTION == "fail":
+        log_error(f"Recording rejected for dead air ({analysis.summary()}): {file_path}")
+        return False
+    log_error(f"Recording has dead air ({analysis.summary()}): {file_path}")
+    return True
+
+DIGEST_SIDECAR_SUFFIX = ".digests.json"
+
+@dataclass
+class RecordingDigests:
+    """Checksums of a finished recording, as saved next to it."""
+    size: int
+    sha256: str
+    md5: str
+    part_size: int
+    part_md5s: List[str]  # Hex MD5 of each part_size slice, last one possibly short
+
+    def expected_etag(self, multipart: bool) -> str:
+        """The ETag S3 returns for this content: the MD5, or for multipart the MD5 of part MD5s."""
+        if not multipart:
+            return f'"{self.md5}"'
+        joined = b"".join(bytes.fromhex(part) for part in self.part_md5s)
+        return f'"{hashlib.md5(joined).hexdigest()}-{len(self.part_md5s)}"'
+
+    def metadata(self) -> Dict[str, str]:
+        """Object metadata for finding duplicate recordings later."""
+        return {"sha256": self.sha256, "md5": self.md5}
+
+class CaptureDigest:
+    """
+    SHA-256, MD5 and per-part MD5s of a recording, updated as its bytes are
+    written so nothing has to read the file again to hash it. Parts follow
+    the multipart upload's part size, so their MD5s give the upload's ETag.
+    """
+
+    def __init__(self, part_size: Optional[int] = None):
+        self.part_size = part_size or MULTIPART_PART_SIZE
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.part_md5s: List[str] = []
+        self.part = hashlib.md5()
+        self.part_bytes = 0
+
+    def update(self, data: bytes) -> None:
+        self.sha256.update(data)
+        self.md5.update(data)
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            take = min(self.part_size - self.part_bytes, len(view))
+            self.part.update(view[:take])
+            self.part_bytes += take
+            view = view[take:]
+            if self.part_bytes == self.part_size:
+                self.end_part()
+
+    def end_part(self) -> Optional[str]:
+        """Close the current part early (the last one) and return its hex MD5."""
+        if not self.part_bytes:
+            return None
+        self.part_md5s.append(self.part.hexdigest())
+        self.part = hashlib.md5()
+        self.part_bytes = 0
+        return self.part_md5s[-1]
+
+    def result(self) -> RecordingDigests:
+        """The checksums so far, leaving the digest open to more bytes."""
+        return RecordingDigests(
+            size=self.size,
+            sha256=self.sha256.hexdigest(),
+            md5=self.md5.hexdigest(),
+            part_size=self.part_size,
+            part_md5s=self.part_md5s + ([self.part.hexdigest()] if self.part_bytes else [])
+        )
+
+def save_digests(file_path: str, digests: RecordingDigests) -> None:
+    """Write a recording's checksums to its sidecar file."""
+    with open(file_path + DIGEST_SIDECAR_SUFFIX, 'w') as f:
+        json.dump(asdict(digests), f)
+
+# Digests of recordings captured by this process, kept open so bytes
+# appended later (the ReplayGain tag) are hashed without re-reading the file
+open_digests: Dict[str, CaptureDigest] = {}
+open_digests_lock = threading.Lock()
+
+def save_capture_digests(file_path: str, digest: CaptureDigest) -> None:
+    """Write a finished capture's checksums and keep its digest open."""
+    save_digests(file_path, digest.result())
+    with open_digests_lock:
+        open_digests[file_path] = digest
+
+def load_digests(file_path: str) -> Optional[RecordingDigests]:
+    """Checksums saved for a recording, if it was captured with them and hasn't changed since."""
+    try:
+        with open(file_path + DIGEST_SIDECAR_SUFFIX) as f:
+            digests = RecordingDigests(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    return digests if digests.size == os.path.getsize(file_path) else None
+
+def rehash_recording(file_path: str) -> Optional[RecordingDigests]:
+    """
+    Recompute the checksums of a recording changed after capture, keeping
+    its sidecar's part size. Only recordings that have a sidecar are hashed.
+    """
+    try:
+        with open(file_path + DIGEST_SIDECAR_SUFFIX) as f:
+            part_size = json.load(f)["part_size"]
+    except (OSError, ValueError, KeyError):
+        return None
+    digest = CaptureDigest(part_size)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digests = digest.result()
+    save_digests(file_path, digests)
+    return digests
+
+APE_TAG_FLAGS_HAS_HEADER = 0x80000000
+APE_TAG_FLAGS_IS_HEADER = 0x20000000
+
+def build_replaygain_tag(analysis: AudioAnalysis) -> bytes:
+    """
+    An APEv2 tag (header, items, footer) with the ReplayGain 2.0 track gain
+    and peak, as mp3gain and foobar2000 write them on MP3 files.
+    """
+    items = {
+        "REPLAYGAIN_TRACK_GAIN": f"{analysis.replaygain_gain:+.2f} dB",
+        "REPLAYGAIN_TRACK_PEAK": f"{analysis.replaygain_peak:.6f}",
+        "REPLAYGAIN_REFERENCE_LOUDNESS": f"{LOUDNESS_REFERENCE_LUFS:.2f} LUFS",
+    }
+    body = b"".join(
+        struct.pack("<II", len(value.encode()), 0) + key.encode() + b"\0" + value.encode()
+        for key, value in items.items()
+    )
+
+    def frame(flags: int) -> bytes:
+        # The size counts the items and footer, not the header
+        return b"APETAGEX" + struct.pack("<IIII", 2000, len(body) + 32, len(items), flags) + bytes(8)
+
+    return frame(APE_TAG_FLAGS_HAS_HEADER | APE_TAG_FLAGS_IS_HEADER) + body + frame(APE_TAG_FLAGS_HAS_HEADER)
+
+def write_replaygain_tag(file_path: str, analysis: AudioAnalysis) -> bool:
+    """
+    Append the ReplayGain tag to a recording, replacing one written before,
+    and bring its checksums up to date: by feeding the tag to the digest
+    kept open since capture, or, for a file retagged or captured by another
+    process, by hashing it again. The frame index is unaffected: it ends at
+    the last audio frame.
+    """
+    try:
+        with open_digests_lock:
+            digest = open_digests.pop(file_path, None)
+        tag = build_replaygain_tag(analysis)
+        with open(file_path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end >= 32:
+                f.seek(end - 32)
+                footer = f.read(32)
+                if footer[:8] == b"APETAGEX":
+                    size, _, flags = struct.unpack_from("<III", footer, 12)
+                    end -= size + (32 if flags & APE_TAG_FLAGS_HAS_HEADER else 0)
+                    f.truncate(end)
+                    digest = None
+            f.seek(end)
+            f.write(tag)
+        if digest and digest.size == end:
+            digest.update(tag)
+            save_digests(file_path, digest.result())
+        else:
+            rehash_recording(file_path)
+        log_info(f"Tagged {file_path} with ReplayGain {analysis.replaygain_gain:+.2f} dB")
+        return True
+    except Exception as e:
+        log_error(f"Error writing ReplayGain tag to {file_path}: {e}")
+        return False
+
+def verify_uploaded_etag(s3_key: str, etag: str, expected: str) -> None:
+    """Raise if the bucket's copy doesn't match what was captured."""
+    if etag != expected:
+        raise ValueError(f"{s3_key} ETag {etag} does not match captured checksum {expected}")
+
+class Transfer:
+    """
+    One transfer's share of the bandwidth governor. Call it with each
+    chunk's size as it goes out (it is a boto3 transfer Callback); it
+    waits for tokens unless `wait` is False, as for live ingest parts
+    that must not fall behind the stream.
+    """
+    def __init__(self, governor: "BandwidthGovernor", wait: bool = True):
+        self.governor = governor
+        self.wait = wait
+        self.bytes = 0
+        self.throttled = 0.0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __call__(self, size: int) -> None:
+        delay = self.governor.acquire(size, self.wait)
+        with self.lock:
+            self.bytes += size
+            self.throttled += delay
+
+    def throughput(self) -> float:
+        """Bytes per second since the transfer started."""
+        return self.bytes / max(time.monotonic() - self.started, 1e-6)
+
+class ThrottledBody(io.BytesIO):
+    """
+    An in-memory request body that charges a Transfer as it is sent.
+    botocore also reads it to checksum and sign the request; like boto3's
+    own upload bodies it only counts reads between signal_transferring()
+    and signal_not_transferring(), which the client calls around sending.
+    """
+    def __init__(self, data: bytes, transfer: Transfer):
+        super().__init__(data)
+        self.transfer = transfer
+        self.transferring = False
+
+    def signal_transferring(self) -> None:
+        self.transferring = True
+
+    def signal_not_transferring(self) -> None:
+        self.transferring = False
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        chunk = super().read(size)
+        if chunk and self.transferring:
+            self.transfer(len(chunk))
+        return chunk
+
+class BandwidthGovernor:
+    """
+    Token bucket shared by every upload in the process. With no show
+    recording, transfers get `idle_rate` bytes/s; while recordings are
+    active they share `recording_rate`, divided by the number recording,
+    so archive uploads leave the uplink to live ingest. A rate of 0 is
+    unlimited. Tokens build up to BANDWIDTH_BURST_SECONDS of the rate.
+    """
+    def __init__(self, idle_rate: float = UPLOAD_BANDWIDTH_LIMIT, recording_rate: float = UPLOAD_BANDWIDTH_WHILE_RECORDING):
+        self.idle_rate = idle_rate
+        self.recording_rate = recording_rate
+        self.lock = threading.Lock()
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.active = 0
+
+    def rate(self) -> float:
+        if self.active and self.recording_rate:
+            limits = [self.recording_rate / self.active] + ([self.idle_rate] if self.idle_rate else [])
+            return min(limits)
+        return self.idle_rate
+
+    @contextmanager
+    def recording(self):
+        """Hold the recording rate for the duration of a capture."""
+        with self.lock:
+            self.active += 1
+            metrics.set("streamseed_upload_bandwidth_limit_bytes_per_second", self.rate())
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active -= 1
+                metrics.set("streamseed_upload_bandwidth_limit_bytes_per_second", self.rate())
+
+    def acquire(self, size: int, wait: bool = True) -> float:
+        """
+        Take `size` bytes of tokens, waiting until the bucket is out of
+        debt if `wait`. Returns the seconds spent waiting.
+        """
+        with self.lock:
+            rate = self.rate()
+            now = time.monotonic()
+            if not rate:
+                self.tokens, self.updated = 0.0, now
+                return 0.0
+            self.tokens = min(self.tokens + (now - self.updated) * rate, rate * BANDWIDTH_BURST_SECONDS) - size
+            self.updated = now
+            # Waiters queue up behind each other's debt, so the total stays at the rate
+            delay = -self.tokens / rate if wait and self.tokens < 0 else 0.0
+        if delay:
+            metrics.inc("streamseed_upload_throttle_seconds_total", delay)
+            time.sleep(delay)
+        return delay
+
+    def transfer(self, wait: bool = True) -> Transfer:
+        return Transfer(self, wait)
+
+bandwidth_governor = BandwidthGovernor()
+
+UPLOAD_STATE_SUFFIX = ".upload.json"
+
+def load_upload_state(local_file: str, s3_key: str, file_size: int) -> Optional[dict]:
+    """A saved multipart upload of this file to `s3_key` with the current part size, if any."""
+    try:
+        with open(local_file + UPLOAD_STATE_SUFFIX) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (state.get("key"), state.get("size"), state.get("part_size")) != (s3_key, file_size, MULTIPART_PART_SIZE):
+        return None
+    return state
+
+def save_upload_state(local_file: str, state: dict) -> None:
+    """Replace the upload state atomically, so a crash leaves the old or the new one."""
+    path = local_file + UPLOAD_STATE_SUFFIX
+    with open(path + ".tmp", 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def stored_parts(s3_key: str, upload_id: str) -> Optional[Dict[int, str]]:
+    """Part number -> ETag of the parts S3 holds for an upload, or None if the upload is gone."""
+    parts = {}
+    try:
+        for page in s3_client.get_paginator('list_parts').paginate(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                parts[part['PartNumber']] = part['ETag']
+    except Exception as e:
+        if s3_error_code(e) in ("NoSuchUpload", "404"):
+            return None
+        raise
+    return parts
+
+def upload_resumable(local_file: str, s3_key: str, file_size: int, extra_args: dict,
+                     digests: Optional[RecordingDigests] = None, transfer: Optional[Transfer] = None,
+                     context: Optional[dict] = None) -> str:
+    """
+    Multipart upload that saves its upload ID and each finished part's
+    ETag next to the file, so after a crash or restart it continues from
+    the parts S3 already holds rather than from byte zero. Parts go up
+    UPLOAD_CONCURRENCY at a time, each with its captured MD5 when the
+    digests were taken at this part size. The publish `context` is saved
+    alongside for resume_interrupted_uploads. Returns the object's ETag.
+    """
+    part_count = math.ceil(file_size / MULTIPART_PART_SIZE)
+    state = load_upload_state(local_file, s3_key, file_size)
+    if state:
+        stored = stored_parts(s3_key, state["upload_id"])
+        if stored is None:
+            log_info(f"Saved upload of {local_file} no longer exists, starting again")
+            state = None
+        else:
+            # Only parts S3 and the saved state agree on are skipped
+            state["parts"] = {number: etag for number, etag in state["parts"].items() if stored.get(int(number)) == etag}
+            log_info(f"Resuming upload of {local_file}: {len(state['parts'])} of {part_count} parts already stored")
+            if context is not None:
+                state["publish"] = context
+    if state is None:
+        upload = s3_client.create_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, **extra_args)
+        state = {"key": s3_key, "upload_id": upload['UploadId'], "size": file_size,
+                 "part_size": MULTIPART_PART_SIZE, "parts": {}, "publish": context or {}}
+        save_upload_state(local_file, state)
+
+    md5s = digests.part_md5s if digests and digests.part_size == MULTIPART_PART_SIZE else None
+    state_lock = threading.Lock()
+
+    def send(number: int) -> None:
+        with open(local_file, 'rb') as f:
+            f.seek((number - 1) * MULTIPART_PART_SIZE)
+            data = f.read(MULTIPART_PART_SIZE)
+        part = upload_part(s3_key, state["upload_id"], number, data, md5s[number - 1] if md5s else None, transfer)
+        with state_lock:
+            state["parts"][str(number)] = part['ETag']
+            save_upload_state(local_file, state)
+
+    missing = [number for number in range(1, part_count + 1) if str(number) not in state["parts"]]
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+        try:
+            list(pool.map(send, missing))
+        except Exception:
+            # Leave the upload open for the next attempt to resume
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    completed = s3_client.complete_multipart_upload(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        UploadId=state["upload_id"],
+        MultipartUpload={'Parts': [
+            {'PartNumber': number, 'ETag': state["parts"][str(number)]} for number in range(1, part_count + 1)
+        ]}
+    )
+    os.remove(local_file + UPLOAD_STATE_SUFFIX)
+    return completed['ETag']
+
+def local_upload_ids(root: Optional[str] = None) -> set:
+    """Upload IDs saved by interrupted resumable uploads under `root`."""
+    upload_ids = set()
+    for directory, _, files in os.walk(root or OUTPUT_DIR):
+        for name in files:
+            if name.endswith(UPLOAD_STATE_SUFFIX):
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        upload_ids.add(json.load(f)["upload_id"])
+                except (OSError, ValueError, KeyError):
+                    continue
+    return upload_ids
+
+def abort_orphaned_uploads(max_age: float = ORPHANED_UPLOAD_MAX_AGE) -> int:
+    """
+    Abort the bucket's multipart uploads started over `max_age` seconds ago
+    that no saved upload state will resume, so their parts stop taking up
+    storage. Returns how many were aborted.
+    """
+    keep = local_upload_ids()
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=max_age)
+    aborted = 0
+    for page in s3_client.get_paginator('list_multipart_uploads').paginate(Bucket=BUCKET_NAME):
+        for upload in page.get('Uploads', []):
+            if upload['UploadId'] in keep or upload['Initiated'] > cutoff:
+                continue
+            s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=upload['Key'], UploadId=upload['UploadId'])
+            log_info(f"Aborted orphaned multipart upload of {upload['Key']} started {upload['Initiated']:%Y-%m-%d %H:%M %Z}")
+            aborted += 1
+    return aborted
+
+def start_orphaned_upload_reaper(stop_event: threading.Event, interval: float = ORPHANED_UPLOAD_CHECK_INTERVAL) -> threading.Thread:
+    """Run abort_orphaned_uploads now and every `interval` seconds until `stop_event` is set."""
+    def run():
+        while not stop_event.is_set():
+            try:
+                abort_orphaned_uploads()
+            except Exception as e:
+                log_error(f"Error aborting orphaned multipart uploads: {e}")
+            stop_event.wait(interval)
+
+    thread = threading.Thread(target=run, name="upload-reaper", daemon=True)
+    thread.start()
+    return thread
+
+def recording_metadata(local_file: str) -> Dict[str, str]:
+    """Object metadata from a recording's checksum and analysis sidecars."""
+    digests = load_digests(local_file)
+    analysis = load_analysis(local_file)
+    return {**(digests.metadata() if digests else {}), **(analysis.metadata() if analysis else {})}
+
+@retry_decorator(max_retries=MAX_UPLOAD_RETRIES)
+def upload_to_s3(local_file: str, s3_key: str, context: Optional[dict] = None) -> bool:
+    """
+    Upload a file to Vultr Object Storage with retries, at the pace the
+    bandwidth governor allows.
+    Files above MULTIPART_PART_SIZE are sent as parallel multipart parts,
+    resuming an upload of the same file interrupted earlier. `context`
+    (see publish_context) is kept with the upload's saved state so the
+    steps after it can be replayed if it is cut off.
+    Checksums saved at capture time go into the object metadata and are
+    checked against the stored object's ETag.
+    """
+    try:
+        file_size = os.path.getsize(local_file)
+        digests = load_digests(local_file)
+        extra_args = {'ACL': 'public-read', 'ContentType': content_type_for(local_file)}
+        metadata = recording_metadata(local_file)
+        if metadata:
+            extra_args['Metadata'] = metadata
+        start_time = time.monotonic()
+        transfer = bandwidth_governor.transfer()
+        multipart = file_size >= MULTIPART_PART_SIZE
+        if multipart:
+            etag = upload_resumable(local_file, s3_key, file_size, extra_args, digests, transfer, context)
+        else:
+            s3_client.upload_file(
+                local_file,
+                BUCKET_NAME,
+                s3_key,
+                ExtraArgs=extra_args,
+                Config=transfer_config(),
+                Callback=transfer
+            )
+            etag = None
+        if digests and digests.part_size == transfer_config().multipart_chunksize:
+            etag = etag or s3_client.head_object(Bucket=BUCKET_NAME, Key=s3_key)['ETag']
+            verify_uploaded_etag(s3_key, etag, digests.expected_etag(multipart))
+        elapsed = max(time.monotonic() - start_time, 1e-6)
+        metrics.observe("streamseed_upload_duration_seconds", elapsed)
+        metrics.inc("streamseed_upload_bytes_total", file_size)
+        metrics.set("streamseed_upload_throughput_bytes_per_second", file_size / elapsed)
+        metrics.set("streamseed_upload_throttle_seconds", transfer.throttled)
+        size_mb = file_size / (1024 * 1024)
+        throttled = f", throttled {transfer.throttled:.1f}s" if transfer.throttled else ""
+        log_info(
+            f"Uploaded {local_file} to Vultr Object Storage as {s3_key} "
+            f"({size_mb:.1f} MB in {elapsed:.1f}s, {size_mb / elapsed:.2f} MB/s{throttled})"
+        )
+        return True
+    except Exception as e:
+        metrics.inc("streamseed_upload_failures_total")
+        log_error(f"Error uploading {local_file}: {e}")
+        return False
+
+def copy_s3_object(source_key: str, dest_key: str) -> bool:
+    """Copy an object within the bucket server-side, without re-uploading it."""
+    try:
+        s3_client.copy_object(
+            Bucket=BUCKET_NAME,
+            Key=dest_key,
+            CopySource={'Bucket': BUCKET_NAME, 'Key': source_key},
+            ACL='public-read'
+        )
+        log_info(f"Copied {source_key} to {dest_key}")
+        return True
+    except Exception as e:
+        log_error(f"Error copying {source_key} to {dest_key}: {e}")
+        return False
+
+def upload_latest(s3_key: str, latest_key: str = "latest.mp3") -> bool:
+    """Point 'latest.mp3' at an archived recording with a server-side copy."""
+    return copy_s3_object(s3_key, latest_key)
+
+# Files written next to a recording and removed with it
+SIDECAR_SUFFIXES = (
+    DIGEST_SIDECAR_SUFFIX, ANALYSIS_SIDECAR_SUFFIX, WAVEFORM_SIDECAR_SUFFIX,
+    FRAME_INDEX_SIDECAR_SUFFIX, UPLOAD_STATE_SUFFIX
+)
+
+RECORDING_NAME_RE = re.compile(r"(?:^|/)show_(\d{4}-\d\d-\d\d_\d\d-\d\d-\d\d)(\.\w+)$")
+archive_index_lock = threading.Lock()
+
+def is_recording_key(key: str) -> bool:
+    """Whether a bucket key is an archived recording, rather than a segment or sidecar."""
+    match = RECORDING_NAME_RE.search(key)
+    extensions = {extension for _, extension, _ in COPY_CONTAINERS.values()}
+    return bool(match) and match.group(2) in extensions and "/segments/" not in key
+
+def archive_entry(s3_key: str) -> dict:
+    """Describe an archived recording for the index, from its object metadata."""
+    head = s3_client.head_object(Bucket=BUCKET_NAME, Key=s3_key)
+    metadata = head.get('Metadata', {})
+    match = RECORDING_NAME_RE.search(s3_key)
+    date = datetime.datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M-%S") if match else None
+    duration = float(metadata["duration"]) if "duration" in metadata else None
+    size = head['ContentLength']
+    return {
+        "key": s3_key,
+        "date": date.isoformat() if date else None,
+        "duration": duration,
+        "size": size,
+        "bitrate_kbps": round(size * 8 / duration / 1000) if duration else None,
+        "sha256": metadata.get("sha256"),
+        "md5": metadata.get("md5"),
+        "dead_air_seconds": float(metadata["dead-air-seconds"]) if "dead-air-seconds" in metadata else None,
+    }
+
+def read_archive_index() -> tuple:
+    """The index and its ETag, or an empty index and None if there is none yet."""
+    try:
+        response = s3_client.get_object(Bucket=BUCKET_NAME, Key=ARCHIVE_INDEX_KEY)
+    except Exception as e:
+        if s3_error_code(e) in ("NoSuchKey", "404"):
+            return {"recordings": []}, None
+        raise
+    return json.loads(response['Body'].read()), response['ETag']
+
+def write_archive_index(index: dict, etag: Optional[str]) -> bool:
+    """
+    Store the index only if nobody changed it since it was read (If-Match),
+    or created it meanwhile (If-None-Match). Returns False on a conflict.
+    """
+    index["recordings"].sort(key=lambda entry: (entry.get("date") or "", entry["key"]), reverse=True)
+    index["updated"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    conditions = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=ARCHIVE_INDEX_KEY,
+            Body=json.dumps(index, separators=(",", ":")).encode(),
+            ACL='public-read',
+            ContentType='application/json',
+            CacheControl='no-cache',
+            **conditions
+        )
+        return True
+    except Exception as e:
+        if s3_error_code(e) in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return False
+        raise
+
+def update_archive_index(change) -> bool:
+    """
+    Apply `change` to the index's recordings list and write it back with a
+    conditional write, re-reading and re-applying it when another writer
+    got there first.
+    """
+    with archive_index_lock:  # Writers in this process take turns; others are caught by the conditions
+        for attempt in range(ARCHIVE_INDEX_RETRIES):
+            index, etag = read_archive_index()
+            index["recordings"] = change(index["recordings"])
+            if write_archive_index(index, etag):
+                return True
+            time.sleep(random.uniform(0.1, 0.5) * 2 ** attempt)
+    raise RuntimeError(f"{ARCHIVE_INDEX_KEY} kept changing, gave up after {ARCHIVE_INDEX_RETRIES} attempts")
+
+def index_recording(s3_key: str) -> bool:
+    """Add or refresh an archived recording in the bucket's index."""
+    try:
+        entry = archive_entry(s3_key)
+        update_archive_index(lambda recordings: [e for e in recordings if e["key"] != s3_key] + [entry])
+        log_info(f"Indexed {s3_key} in {ARCHIVE_INDEX_KEY}")
+        return True
+    except Exception as e:
+        log_error(f"Error indexing {s3_key}: {e}")
+        return False
+
+def rebuild_archive_index(prefix: str = "archive/") -> bool:
+    """Reconstruct the index from a listing of the recordings under `prefix`."""
+    try:
+        keys = []
+        for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+            keys += [item['Key'] for item in page.get('Contents', []) if is_recording_key(item['Key'])]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            entries = list(executor.map(archive_entry, keys))
+        # Keep entries outside the rebuilt prefix
+        update_archive_index(
+            lambda recordings: [e for e in recordings if not e["key"].startswith(prefix)] + entries
+        )
+        log_success(f"Rebuilt {ARCHIVE_INDEX_KEY} with {len(entries)} recording(s) under {prefix}")
+        return True
+    except Exception as e:
+        log_error(f"Error rebuilding {ARCHIVE_INDEX_KEY}: {e}")
+        return False
+
+def cleanup_local_file(file_path: str) -> None:
+    """Remove local file after successful upload."""
+    with open_digests_lock:
+        open_digests.pop(file_path, None)
+    try:
+        os.remove(file_path)
+        for suffix in SIDECAR_SUFFIXES:
+            if os.path.exists(file_path + suffix):
+                os.remove(file_path + suffix)
+        log_info(f"Cleaned up local file: {file_path}")
+    except Exception as e:
+        log_error(f"Error cleaning up {file_path}: {e}")
+
+@dataclass
+class SpoolEntry:
+    """A recording kept on disk until it reaches the bucket."""
+    local_file: str
+    s3_key: str
+    latest_key: Optional[str] = None  # set for full recordings, which also update latest and the index
+    show: str = ""
+    hls: bool = False
+    uploaded: bool = False  # already in the bucket; only the steps after the upload remain
+    spooled_at: float = field(default_factory=time.time)
+
+    def size(self) -> int:
+        """Bytes on disk for the recording and its sidecars."""
+        paths = [self.local_file] + [self.local_file + suffix for suffix in SIDECAR_SUFFIXES]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+def publish_spooled(entry: SpoolEntry) -> bool:
+    """Upload a spooled recording and finish the steps its session could not."""
+    context = {"latest_key": entry.latest_key, "show": entry.show, "hls": entry.hls}
+    if not entry.uploaded and not upload_to_s3(entry.local_file, entry.s3_key, context):
+        return False
+    if entry.latest_key:
+        if not upload_latest(entry.s3_key, entry.latest_key):
+            return False
+        publish_waveform(entry.local_file, entry.s3_key, entry.latest_key)
+        publish_frame_index(entry.local_file, entry.s3_key)
+        if entry.hls:
+            publish_hls(entry.local_file, entry.s3_key)
+        index_recording(entry.s3_key)
+    log_success(f"Uploaded spooled recording {entry.s3_key}")
+    cleanup_local_file(entry.local_file)
+    return True
+
+class UploadSpool:
+    """
+    Recordings whose upload failed, kept on disk until a background drainer
+    gets them into the bucket. Each change is appended to a journal and
+    fsynced before it takes effect, so pending uploads survive a crash.
+    Above `max_bytes` the 'evict-oldest' policy deletes the oldest spooled
+    recordings (never the one just added), while 'backpressure' holds new
+    shows back until the drainer has made room.
+    """
+
+    def __init__(
+        self,
+        journal_path: str = SPOOL_JOURNAL,
+        max_bytes: int = SPOOL_MAX_BYTES,
+        policy: str = SPOOL_POLICY,
+        concurrency: int = SPOOL_DRAIN_CONCURRENCY
+    ):
+        self.journal_path = journal_path
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.concurrency = concurrency
+        self.entries: Dict[str, SpoolEntry] = {}  # by local file, oldest first
+        self.sizes: Dict[str, int] = {}
+        self.in_flight = set()
+        self.waiting = 0  # shows held back for space
+        self.loaded = False
+        self.changed = threading.Condition()
+        self.drain_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+
+    def load(self) -> None:
+        """Replay the journal once, then rewrite it with only the pending uploads."""
+        with self.changed:
+            if self.loaded:
+                return
+            self.loaded = True
+            entries: Dict[str, SpoolEntry] = {}
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path) as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # A write torn by a crash
+                        if record.get("op") == "add":
+                            entry = SpoolEntry(**record["entry"])
+                            entries[entry.local_file] = entry
+                        else:
+                            entries.pop(record.get("file"), None)
+            for path, entry in entries.items():
+                if os.path.exists(path):
+                    self.entries[path] = entry
+                    self.sizes[path] = entry.size()
+                else:
+                    log_error(f"Spooled recording {path} no longer exists, dropping its upload")
+            self.compact()
+            self.report()
+            if self.entries:
+                log_info(f"Spool holds {len(self.entries)} pending upload(s), {self.usage() / 1024 ** 2:.1f} MB")
+
+    def compact(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        temp_path = self.journal_path + ".tmp"
+        with open(temp_path, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps({"op": "add", "entry": asdict(entry)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+
+    def append(self, record: dict) -> None:
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def usage(self) -> int:
+        with self.changed:
+            return sum(self.sizes.values())
+
+    def pending(self) -> List[SpoolEntry]:
+        self.load()
+        with self.changed:
+            return list(self.entries.values())
+
+    def report(self) -> None:
+        metrics.set("streamseed_spool_pending", len(self.entries))
+        metrics.set("streamseed_spool_bytes", self.usage())
+
+    def enqueue(
+        self,
+        local_file: str,
+        s3_key: str,
+        latest_key: Optional[str] = None,
+        show: str = "",
+        hls: bool = False,
+        uploaded: bool = False
+    ) -> SpoolEntry:
+        """Record a pending upload in the journal and wake the drainer."""
+        self.load()
+        entry = SpoolEntry(local_file, s3_key, latest_key, show, hls, uploaded)
+        with self.changed:
+            self.append({"op": "add", "entry": asdict(entry)})
+            self.entries.pop(local_file, None)
+            self.entries[local_file] = entry
+            self.sizes[local_file] = entry.size()
+            log_info(f"Spooled {local_file} for a later upload to {s3_key}")
+            if self.policy == "evict-oldest":
+                self.evict(keep=local_file)
+            self.report()
+        self.wake.set()
+        return entry
+
+    def remove(self, local_file: str, op: str) -> None:
+        with self.changed:
+            self.append({"op": op, "file": local_file})
+            self.entries.pop(local_file, None)
+            self.sizes.pop(local_file, None)
+            self.report()
+            self.changed.notify_all()
+
+    def evict(self, keep: str) -> None:
+        """Delete the oldest spooled recordings until the spool fits in max_bytes."""
+        with self.changed:
+            while self.max_bytes and self.usage() > self.max_bytes:
+                victims = [path for path in self.entries if path != keep and path not in self.in_flight]
+                if not victims:
+                    break
+                self.remove(victims[0], "evict")
+                cleanup_local_file(victims[0])
+                metrics.inc("streamseed_spool_evicted_total")
+                log_error(f"Spool is over {self.max_bytes} bytes, deleted {victims[0]} without uploading it")
+
+    def wait_for_space(self, needed: int, timeout: float = SPOOL_BACKPRESSURE_TIMEOUT) -> bool:
+        """
+        Under backpressure, wait until a recording of `needed` bytes fits,
+        draining meanwhile. False if the spool is still full after `timeout`.
+        """
+        if not self.max_bytes or self.policy != "backpressure":
+            return True
+        self.load()
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            self.waiting += 1
+            try:
+                while self.usage() + needed > self.max_bytes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.wake.set()
+                    self.changed.wait(remaining)
+                return True
+            finally:
+                self.waiting -= 1
+
+    def upload(self, entry: SpoolEntry) -> bool:
+        try:
+            if not os.path.exists(entry.local_file):
+                log_error(f"Spooled recording {entry.local_file} no longer exists, dropping its upload")
+                self.remove(entry.local_file, "drop")
+                return False
+            if publish_spooled(entry):
+                self.remove(entry.local_file, "done")
+                return True
+            return False
+        except Exception as e:
+            log_error(f"Error uploading spooled recording {entry.local_file}: {e}")
+            return False
+        finally:
+            with self.changed:
+                self.in_flight.discard(entry.local_file)
+
+    def drain(self) -> int:
+        """Retry every pending upload, `concurrency` at a time. Returns how many succeeded."""
+        self.load()
+        if not self.drain_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self.changed:
+                batch = [entry for path, entry in self.entries.items() if path not in self.in_flight]
+                self.in_flight.update(entry.local_file for entry in batch)
+            if not batch:
+                return 0
+            log_info(f"Retrying {len(batch)} spooled upload(s)")
+            with ThreadPoolExecutor(max_workers=max(self.concurrency, 1)) as pool:
+                return sum(pool.map(self.upload, batch))
+        finally:
+            self.drain_lock.release()
+
+    def nudge(self) -> None:
+        """Ask the drainer to look at the spool now, e.g. when a show ends."""
+        self.wake.set()
+
+    def start(self, idle=lambda: True) -> threading.Thread:
+        """
+        Drain in the background: at startup, whenever nudged and every
+        SPOOL_DRAIN_INTERVAL, but only while `idle()` says no show is
+        recording, unless a show is waiting for space.
+        """
+        self.load()
+
+        def run():
+            while not self.stop_event.is_set():
+                if self.entries and (idle() or self.waiting):
+                    self.drain()
+                self.wake.wait(SPOOL_DRAIN_INTERVAL)
+                self.wake.clear()
+
+        thread = threading.Thread(target=run, name="spool-drainer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.wake.set()
+
+upload_spool = UploadSpool()
+
+def estimated_recording_bytes(show: Show) -> int:
+    """Rough disk space a show's recording and renditions will take."""
+    return show.duration * SPOOL_ESTIMATE_BYTES_PER_SECOND * (1 + len(show.renditions))
+
+def rendition_key(recording_key: str, rendition: Rendition) -> str:
+    """archive/show_x.mp3 -> archive/show_x_48k.opus"""
+    return f"{os.path.splitext(recording_key)[0]}{rendition.suffix}{rendition.extension}"
+
+def publish_context(recording_file: str, recording_key: str, show: Show) -> dict:
+    """
+    What has to happen after a recording's upload (its latest copy, HLS
+    package and renditions), in a form that can be saved as JSON.
+    """
+    return {
+        "latest_key": latest_key_for(show, recording_key),
+        "show": show.job_name,
+        "hls": show.hls,
+        "renditions": [
+            [path, rendition_key(recording_key, rendition)] for rendition, path in rendition_files(recording_file, show)
+        ],
+    }
+
+def spool_publish(local_file: str, s3_key: str, context: dict) -> None:
+    """Keep a file for the drainer along with the renditions its publish context names."""
+    show = context.get("show", "")
+    upload_spool.enqueue(local_file, s3_key, context.get("latest_key"), show, context.get("hls", False))
+    for path, key in context.get("renditions", []):
+        if os.path.exists(path):
+            upload_spool.enqueue(path, key, show=show)
+
+def spool_recording(recording_file: str, recording_key: str, show: Show) -> None:
+    """Keep a recording that could not be uploaded, with its renditions, for the drainer."""
+    spool_publish(recording_file, recording_key, publish_context(recording_file, recording_key, show))
+
+def resume_interrupted_uploads(root: Optional[str] = None) -> int:
+    """
+    Spool recordings whose multipart upload was cut off by a crash or
+    restart, so the drainer finishes them from their saved parts and then
+    publishes them as their session would have. Returns how many were found.
+    """
+    spooled = {entry.local_file for entry in upload_spool.pending()}
+    found = 0
+    for directory, _, files in os.walk(root or OUTPUT_DIR):
+        for name in files:
+            if not name.endswith(UPLOAD_STATE_SUFFIX):
+                continue
+            local_file = os.path.join(directory, name[:-len(UPLOAD_STATE_SUFFIX)])
+            if local_file in spooled or not os.path.exists(local_file):
+                continue
+            try:
+                with open(local_file + UPLOAD_STATE_SUFFIX) as f:
+                    state = json.load(f)
+                s3_key = state["key"]
+            except (OSError, ValueError, KeyError):
+                continue
+            spool_publish(local_file, s3_key, state.get("publish", {}))
+            found += 1
+    return found
+
+def signal_handler(signum, frame):
+    """Handle shutdown signals gracefully."""
+    log_info("Shutdown signal received. Cleaning up...")
+    if not notification_dispatcher.flush():
+        logger.warning("Timed out sending pending Discord notifications")
+    sys.exit(0)
+
+@dataclass
+class RecordingPlan:
+    """How a show's stream is stored: re-encoded to MP3 or copied as-is."""
+    codec: str  # ffmpeg audio codec: 'libmp3lame' or 'copy'
+    muxer: str
+    extension: str
+    content_type: str
+    source_codec: Optional[str] = None
+
+    @property
+    def copy(self) -> bool:
+        return self.codec == "copy"
+
+# Containers that can hold each source codec without re-encoding
+COPY_CONTAINERS = {
+    "mp3": ("mp3", ".mp3", "audio/mpeg"),
+    "aac": ("adts", ".aac", "audio/aac"),
+    "opus": ("ogg", ".opus", "audio/ogg"),
+    "vorbis": ("ogg", ".ogg", "audio/ogg"),
+    "flac": ("flac", ".flac", "audio/flac"),
+}
+TRANSCODE_PLAN = RecordingPlan("libmp3lame", "mp3", ".mp3", "audio/mpeg")
+
+# Content types of files published alongside recordings
+SIDECAR_CONTENT_TYPES = {".ts": "video/mp2t", ".m3u8": "application/vnd.apple.mpegurl", ".json": "application/json"}
+
+def content_type_for(path: str) -> str:
+    """Content type for an audio file, based on its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    for _, ext, content_type in COPY_CONTAINERS.values():
+        if ext == extension:
+            return content_type
+    return SIDECAR_CONTENT_TYPES.get(extension, "application/octet-stream")
+
+def probe_stream_codec(stream_url: str) -> Optional[str]:
+    """Return the codec name of the stream's first audio track, using ffprobe."""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name",
+                "-of", "json",
+                stream_url,
+            ],
+            capture_output=True, text=True, timeout=FFPROBE_TIMEOUT
+        )
+        if result.returncode != 0:
+            log_error(f"ffprobe failed for {stream_url}: {result.stderr.strip()}")
+            return None
+        streams = json.loads(result.stdout).get("streams", [])
+        return streams[0]["codec_name"] if streams else None
+    except Exception as e:
+        log_error(f"Error probing {stream_url}: {e}")
+        return None
+
+def transcode_plan_for(show: Show) -> RecordingPlan:
+    """The MP3 re-encode, with a warning when the show asked for another format."""
+    if show.format not in ("any", "mp3"):
+        log_error(
+            f"{show.job_name} requires {show.format}, which re-encoding can't produce; "
+            f"archiving MP3 instead (copy mode with a {show.format} source is needed)"
+        )
+    return TRANSCODE_PLAN
+
+def plan_recording(show: Show) -> RecordingPlan:
+    """
+    Decide whether the show can be stored as-is. In 'copy' mode the source
+    codec is probed and only re-encoded when the show requires MP3 output
+    or the codec has no container to be copied into. Re-encoding always
+    produces MP3, so a show requiring another format is warned about.
+    """
+    if show.mode != "copy":
+        return transcode_plan_for(show)
+
+    source_codec = probe_stream_codec(show.url)
+    if source_codec not in COPY_CONTAINERS:
+        log_info(f"Cannot store codec '{source_codec}' as-is for {show.job_name}, re-encoding to MP3")
+        return transcode_plan_for(show)
+    if show.format not in ("any", source_codec):
+        log_info(f"{show.job_name} requires {show.format}, re-encoding {source_codec} source")
+        return transcode_plan_for(show)
+
+    muxer, extension, content_type = COPY_CONTAINERS[source_codec]
+    return RecordingPlan("copy", muxer, extension, content_type, source_codec)
+
+def build_input_args(stream_url: str) -> list:
+    """ffmpeg input options, reconnecting HTTP streams after network drops."""
+    args = []
+    if stream_url.startswith(("http://", "https://")):
+        args += [
+            "-reconnect", "1",
+            "-reconnect_streamed", "1",
+            "-reconnect_on_network_error", "1",
+            "-reconnect_delay_max", str(RECONNECT_DELAY_MAX),
+            "-rw_timeout", str(MIRROR_STALL_TIMEOUT * 1000000),  # Exit on a stall so the next mirror can take over
+        ]
+    return args + ["-i", stream_url]
+
+def pre_roll_trim(show: Show) -> float:
+    """
+    Seconds of audio to discard when ffmpeg is launched now, so the output
+    begins at the show's air time. Only warm starts, which connect early
+    and have a measured ingest latency, are trimmed.
+    """
+    if not show.warm_start or show.air_time is None:
+        return 0.0
+    return max(show.air_time - time.time() - show.ingest_latency, 0.0)
+
+# mp3 muxer options for output appended to an earlier MP3
+MP3_APPEND_ARGS = ["-id3v2_version", "0", "-write_xing", "0"]
+
+def build_record_command(
+    output: str,
+    show: Optional[Show] = None,
+    plan: RecordingPlan = TRANSCODE_PLAN,
+    duration: Optional[float] = None,
+    muxer_args: Optional[list] = None,
+    renditions: Optional[List[tuple]] = None,
+    append: bool = False
+) -> list:
+    """
+    Build the ffmpeg command line for recording the show's stream to `output`.
+    Each (Rendition, path) in `renditions` is an extra output encoded from
+    the same decoded audio, so the stream is fetched and decoded once.
+    With `append` the outputs continue an earlier run's, so MP3 outputs
+    leave out the ID3v2 and Xing headers that would land mid-file.
+    """
+    show = show or default_show()
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "level+info",  # Prefix lines with their level for the stderr parser
+    ]
+    trim = pre_roll_trim(show)
+    if show.warm_start:
+        # The endpoint was checked already; don't spend seconds probing it again
+        command += ["-probesize", "32768", "-analyzeduration", "500000"]
+    command += build_input_args(show.url)
+    # Output options apply to the output that follows them, so each one repeats these
+    output_limits = ["-ss", f"{trim:.3f}"] if trim > 0 else []
+    output_limits += ["-t", str(duration if duration is not None else show.duration)]
+    command += output_limits
+    if plan.copy:
+        command += ["-vn", "-acodec", "copy"]
+    else:
+        command += ["-acodec", "libmp3lame", "-ab", "128k"]
+    if muxer_args:
+        command += muxer_args
+    elif plan.copy or output.startswith("pipe:"):
+        # Copied audio, or no file extension to infer the container from
+        command += ["-f", plan.muxer]
+    if append and plan.muxer == "mp3" and not muxer_args:
+        command += MP3_APPEND_ARGS
+    command.append(output)
+    for rendition, path in renditions or []:
+        command += [
+            *output_limits,
+            "-vn", *rendition.filter_args, "-acodec", rendition.encoder, "-ab", rendition.bitrate,
+            "-f", rendition.muxer, *(MP3_APPEND_ARGS if append and rendition.muxer == "mp3" else []), path,
+        ]
+    return command
+
+FFMPEG_STDERR_TAIL = int(os.getenv("FFMPEG_STDERR_TAIL", 50))  # stderr lines kept for error reports
+FFMPEG_RECENT_WARNINGS = 10
+
+# ffmpeg's stats line has always counted sizes in 1024s, only the spelling
+# changed: "kB" up to 6.0, "KiB" from 6.1. So "kB" marks an older build,
+# not a decimal kilobyte.
+SIZE_UNITS = {"b": 1, "kb": 1024, "kib": 1024, "mb": 1024 ** 2, "mib": 1024 ** 2, "gb": 1024 ** 3, "gib": 1024 ** 3}
+PROGRESS_SIZE_RE = re.compile(r"size=\s*(\d+)\s*([kKmMgG]i?B|B)")
+PROGRESS_TIME_RE = re.compile(r"time=\s*(-?)(\d+):(\d+):([\d.]+)")
+PROGRESS_BITRATE_RE = re.compile(r"bitrate=\s*([\d.]+)kbits/s")
+PROGRESS_SPEED_RE = re.compile(r"speed=\s*([\d.]+)x")
+
+@dataclass
+class FFmpegProgress:
+    """Live progress of an ffmpeg run, parsed from its stderr as it arrives."""
+    elapsed_seconds: float = 0.0
+    bytes_written: int = 0
+    bitrate_kbps: Optional[float] = None
+    speed: Optional[float] = None
+    warnings: int = 0
+    errors: int = 0
+    updated_at: Optional[float] = None
+    # Wall-clock time of output position zero, sampled once ffmpeg keeps pace with the stream
+    start_samples: deque = field(default_factory=lambda: deque(maxlen=120))
+    recent_warnings: deque = field(default_factory=lambda: deque(maxlen=FFMPEG_RECENT_WARNINGS))
+    tail: deque = field(default_factory=lambda: deque(maxlen=FFMPEG_STDERR_TAIL))
+
+    def feed_line(self, line: str) -> None:
+        """Update progress from one line of ffmpeg output (logged with level+info)."""
+        line = line.strip()
+        if not line:
+            return
+        if "time=" in line and "size=" in line:
+            size = PROGRESS_SIZE_RE.search(line)
+            if size:
+                self.bytes_written = int(size.group(1)) * SIZE_UNITS[size.group(2).lower()]
+            elapsed = PROGRESS_TIME_RE.search(line)
+            if elapsed and not elapsed.group(1):
+                hours, minutes, seconds = elapsed.group(2, 3, 4)
+                self.elapsed_seconds = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            bitrate = PROGRESS_BITRATE_RE.search(line)
+            self.bitrate_kbps = float(bitrate.group(1)) if bitrate else self.bitrate_kbps
+            speed = PROGRESS_SPEED_RE.search(line)
+            self.speed = float(speed.group(1)) if speed else self.speed
+            self.updated_at = time.time()
+            if self.elapsed_seconds >= STEADY_STATE_AFTER:
+                self.start_samples.append(self.updated_at - self.elapsed_seconds)
+            return  # Progress lines would crowd everything else out of the tail
+
+        self.tail.append(line)
+        if "[warning]" in line:
+            self.warnings += 1
+            self.recent_warnings.append(line)
+        elif "[error]" in line or "[fatal]" in line:
+            self.errors += 1
+            self.recent_warnings.append(line)
+
+    def output_started_at(self) -> Optional[float]:
+        """Estimated air time of the first output sample, from live-edge progress."""
+        if not self.start_samples:
+            return None
+        return statistics.median(self.start_samples)
+
+    def snapshot(self) -> dict:
+        return {
+            "elapsed_seconds": self.elapsed_seconds,
+            "bytes_written": self.bytes_written,
+            "bitrate_kbps": self.bitrate_kbps,
+            "speed": self.speed,
+            "warnings": self.warnings,
+            "errors": self.errors,
+            "recent_warnings": list(self.recent_warnings),
+            "updated_at": self.updated_at,
+        }
+
+# Progress of every ffmpeg run in flight, keyed by recording name
+active_recordings: Dict[str, FFmpegProgress] = {}
+active_recordings_lock = threading.Lock()
+
+def progress_key_for(show: Show, output: str) -> str:
+    """active_recordings key of a run: stations airing at the same time write the same file names."""
+    return f"{show.job_name}:{output}"
+
+def recording_progress() -> Dict[str, dict]:
+    """Snapshot of live progress for every recording currently running."""
+    with active_recordings_lock:
+        return {name: progress.snapshot() for name, progress in active_recordings.items()}
+
+def collect_recording_metrics():
+    """Scrape-time metrics for the recordings in flight."""
+    progress = recording_progress()
+    yield "streamseed_recordings_in_progress", {}, len(progress)
+    for name, snapshot in progress.items():
+        yield "streamseed_recording_bytes", {"recording": name}, snapshot["bytes_written"]
+        yield "streamseed_recording_elapsed_seconds", {"recording": name}, snapshot["elapsed_seconds"]
+        if snapshot["speed"] is not None:
+            yield "streamseed_recording_speed", {"recording": name}, snapshot["speed"]
+
+metrics.add_collector(collect_recording_metrics)
+
+@dataclass
+class FFmpegResult:
+    """Outcome of an ffmpeg run."""
+    returncode: int
+    stderr: str  # Last FFMPEG_STDERR_TAIL non-progress lines
+    cpu_seconds: Optional[float] = None
+    progress: Optional[FFmpegProgress] = None
+    thread_cpu: Dict[str, float] = field(default_factory=dict)  # CPU seconds by ffmpeg thread name
+
+def read_ffmpeg_stderr(stream, progress: FFmpegProgress) -> None:
+    """Feed ffmpeg's stderr into `progress` line by line; stats lines end in \\r."""
+    pending = b""
+    for chunk in iter(lambda: stream.read1(4096), b""):
+        lines = re.split(rb"[\r\n]", pending + chunk)
+        pending = lines.pop()
+        for line in lines:
+            progress.feed_line(line.decode(errors='replace'))
+    progress.feed_line(pending.decode(errors='replace'))
+
+THREAD_CPU_INTERVAL = 1.0  # seconds between samples of ffmpeg's per-thread CPU time
+
+def sample_thread_cpu(pid: int, totals: Dict[str, float], stop: threading.Event) -> None:
+    """
+    Record the CPU seconds of each of the process's threads by name until
+    `stop` is set. ffmpeg names its encoder threads 'enc<output>:<stream>:<codec>'.
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    task_dir = f"/proc/{pid}/task"
+    while True:
+        try:
+            thread_ids = os.listdir(task_dir)
+        except OSError:
+            return
+        for thread_id in thread_ids:
+            try:
+                with open(f"{task_dir}/{thread_id}/stat") as f:
+                    stat = f.read()
+            except OSError:
+                continue  # The thread just exited
+            name = stat[stat.index("(") + 1:stat.rindex(")")]
+            fields = stat[stat.rindex(")") + 2:].split()
+            totals[name] = max(totals.get(name, 0.0), (int(fields[11]) + int(fields[12])) / ticks)
+        if stop.wait(THREAD_CPU_INTERVAL):
+            return
+
+def run_ffmpeg(
+    command: list,
+    stdout_handler=None,
+    progress_key: Optional[str] = None,
+    thread_cpu: bool = False
+) -> FFmpegResult:
+    """
+    Run ffmpeg to completion and measure the CPU time of that child alone,
+    which stays accurate while other recordings run concurrently.
+    stderr is parsed incrementally into an FFmpegProgress, published under
+    `progress_key` in active_recordings while the run is in flight.
+    `stdout_handler`, if given, is called with the process to consume its stdout.
+    With `thread_cpu`, CPU time is also sampled per thread (Linux only).
+    """
+    progress = FFmpegProgress()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE if stdout_handler else subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    stderr_reader = threading.Thread(
+        target=read_ffmpeg_stderr, args=(process.stderr, progress), daemon=True
+    )
+    stderr_reader.start()
+    thread_totals = {}
+    stop_sampling = threading.Event()
+    sampler = None
+    if thread_cpu and os.path.isdir(f"/proc/{process.pid}/task"):
+        sampler = threading.Thread(
+            target=sample_thread_cpu, args=(process.pid, thread_totals, stop_sampling), daemon=True
+        )
+        sampler.start()
+    if progress_key:
+        with active_recordings_lock:
+            active_recordings[progress_key] = progress
+
+    try:
+        try:
+            if stdout_handler:
+                stdout_handler(process)
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+
+        cpu_seconds = None
+        if hasattr(os, "wait4") and process.returncode is None:
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            cpu_seconds = usage.ru_utime + usage.ru_stime
+        returncode = process.wait()
+        stderr_reader.join()
+        if sampler:
+            stop_sampling.set()
+            sampler.join()
+        metrics.inc("streamseed_captured_bytes_total", progress.bytes_written)
+        metrics.inc("streamseed_recordings_total", result="success" if returncode == 0 else "failure")
+        return FFmpegResult(returncode, "\n".join(progress.tail), cpu_seconds, progress, dict(thread_totals))
+    finally:
+        if progress_key:
+            with active_recordings_lock:
+                active_recordings.pop(progress_key, None)
+
+# CPU seconds libmp3lame needs per second of audio; refined by each transcode run
+transcode_cpu_per_second = float(os.getenv("TRANSCODE_CPU_ESTIMATE", 0.03))
+
+def report_cpu_usage(show: Show, plan: RecordingPlan, result: FFmpegResult) -> str:
+    """Describe the run's CPU cost, and what copying saved over re-encoding."""
+    global transcode_cpu_per_second
+    if result.cpu_seconds is None:
+        return f"{plan.codec}"
+    if not plan.copy:
+        transcode_cpu_per_second = result.cpu_seconds / max(show.duration, 1)
+        return f"{plan.codec}, CPU {result.cpu_seconds:.1f}s"
+    saved = max(transcode_cpu_per_second * show.duration - result.cpu_seconds, 0.0)
+    return f"copy {plan.source_codec}, CPU {result.cpu_seconds:.1f}s, ~{saved:.1f}s saved vs re-encode"
+
+# ffmpeg 7 runs each encoder in its own thread named 'enc<output>:<stream>:<codec>';
+# earlier versions encode on shared threads, so per-output CPU can't be told apart
+ENCODER_THREAD_RE = re.compile(r"^enc\d+:")
+
+def encoder_cpu(result: FFmpegResult, output_index: int) -> Optional[float]:
+    """
+    CPU seconds spent by the encoder threads of one ffmpeg output, or None
+    when the run had no per-encoder threads (ffmpeg before 7, or not sampled).
+    """
+    if not any(ENCODER_THREAD_RE.match(name) for name in result.thread_cpu):
+        return None
+    prefix = f"enc{output_index}:"
+    return sum(seconds for name, seconds in result.thread_cpu.items() if name.startswith(prefix))
+
+def report_rendition_cpu(show: Show, results: List[FFmpegResult]) -> str:
+    """Describe each rendition's encode CPU cost; renditions are outputs 1 onwards."""
+    reports = []
+    for index, rendition in enumerate(show.renditions, start=1):
+        measured = [encoder_cpu(result, index) for result in results]
+        if None in measured:
+            reports.append(f"{rendition.name} CPU unknown (needs ffmpeg 7 or later)")
+            continue
+        seconds = sum(measured)
+        metrics.set("streamseed_rendition_encode_cpu_seconds", seconds, show=show.job_name, rendition=rendition.name)
+        reports.append(f"{rendition.name} CPU {seconds:.1f}s ({seconds / max(show.duration, 1) * 3600:.0f}s per hour)")
+    return ", ".join(reports)
+
+def rendition_files(recording_file: str, show: Show) -> List[tuple]:
+    """(Rendition, local path) of each of the show's renditions of a recording."""
+    base = os.path.splitext(recording_file)[0]
+    return [(rendition, f"{base}{rendition.suffix}{rendition.extension}") for rendition in show.renditions]
+
+def report_start_offset(show: Show, result: FFmpegResult) -> str:
+    """Describe how far the recording's first sample was from its air time."""
+    if show.air_time is None or result.progress is None:
+        return ""
+    started_at = result.progress.output_started_at()
+    if started_at is None:
+        return ""
+    offset = started_at - show.air_time
+    metrics.set("streamseed_recording_start_offset_seconds", offset, show=show.job_name)
+    return f", start offset {offset:+.2f}s"
+
+def recording_timestamp(show: Show) -> str:
+    """Timestamp used in recording names: the air time when known, else now."""
+    if show.air_time is not None:
+        return datetime.datetime.fromtimestamp(show.air_time).strftime("%Y-%m-%d_%H-%M-%S")
+    return datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+def failover_backoff(show: Show, failures: int) -> float:
+    """Seconds to wait before restarting: none while untried mirrors remain, then exponential."""
+    retries = failures - max(len(show.mirrors) - 1, 0)
+    return min(2 ** (retries - 1), RESTART_BACKOFF_MAX) if retries > 0 else 0
+
+def run_with_failover(show: Show, deadline: float, run) -> List[FFmpegResult]:
+    """
+    Call `run(show, duration)` to record, and while ffmpeg exits before
+    `deadline` and the show has other mirrors, fail over and call it again
+    for the remaining time. The first call gets duration None so the show's
+    own duration and pre-roll trim apply. Returns every run's result.
+    """
+    results = [run(show, None)]
+    failures = 0
+    while len(show.mirrors) > 1 and deadline - time.time() > 1:
+        if results[-1].progress and results[-1].progress.bytes_written:
+            failures = 0
+        failures += 1
+        show = fail_over(show)
+        time.sleep(failover_backoff(show, failures))
+        remaining = deadline - time.time()
+        if remaining <= 1:
+            break
+        results.append(run(show, round(remaining, 3)))
+    return results
+
+def record_stream(show: Optional[Show] = None) -> Optional[str]:
+    """Record the show's stream, re-encoding only when its plan requires it."""
+    show = show or default_show()
+    try:
+        if not os.path.exists(show.output_dir):
+            os.makedirs(show.output_dir)
+
+        plan = plan_recording(show)
+        timestamp = recording_timestamp(show)
+        output_file = os.path.join(show.output_dir, f"show_{timestamp}{plan.extension}")
+        deadline = (show.air_time if show.air_time is not None else time.time()) + show.duration
+        digest = CaptureDigest()
+        indexer = FrameIndexer.for_file(output_file)
+
+        # ffmpeg writes to a pipe so the audio is hashed and indexed on its way to disk.
+        # After a failover the next mirror's audio is appended; frames concatenate as-is.
+        with open(output_file, 'wb') as output:
+            def write_output(process):
+                for chunk in iter(lambda: process.stdout.read1(65536), b""):
+                    output.write(chunk)
+                    digest.update(chunk)
+                    if indexer:
+                        indexer.update(chunk)
+
+            def run(show: Show, duration: Optional[float]) -> FFmpegResult:
+                # Renditions from later runs are recorded aside, then appended
+                first_run = duration is None
+                renditions = rendition_files(output_file, show)
+                outputs = [(rendition, path if first_run else path + ".part") for rendition, path in renditions]
+                result = run_ffmpeg(
+                    build_record_command(
+                        "pipe:1", show, plan, duration=duration, renditions=outputs, append=not first_run
+                    ),
+                    stdout_handler=write_output,
+                    progress_key=progress_key_for(show, output_file),
+                    thread_cpu=bool(outputs)
+                )
+                for (_, path), (_, part) in zip(renditions, outputs):
+                    if part != path and os.path.exists(part):
+                        with open(part, 'rb') as source, open(path, 'ab') as target:
+                            shutil.copyfileobj(source, target, 1024 * 1024)
+                        os.remove(part)
+                return result
+
+            log_info(f"Recording started: {output_file}")
+            results = run_with_failover(show, deadline, run)
+        result = results[0]
+
+        if (result.returncode != 0 if len(results) == 1 else not digest.size):
+            log_error(f"Recording failed: {results[-1].stderr}")
+            os.remove(output_file)
+            discard_renditions(output_file, show)
+            return None
+        save_capture_digests(output_file, digest)
+        if indexer:
+            save_frame_index(output_file, indexer.result())
+
+        if show.renditions:
+            # Keep the recording's own cost comparable with runs without renditions
+            rendition_cpu = sum(encoder_cpu(result, index) or 0.0 for index in range(1, len(show.renditions) + 1))
+            if result.cpu_seconds is not None:
+                result = dataclasses.replace(result, cpu_seconds=max(result.cpu_seconds - rendition_cpu, 0.0))
+            log_info(f"Renditions of {output_file}: {report_rendition_cpu(show, results)}")
+        log_info(
+            f"Recording finished: {output_file} "
+            f"({report_cpu_usage(show, plan, result)}{report_start_offset(show, result)})"
+        )
+        return output_file
+    except Exception as e:
+        log_error(f"Error during recording: {e}")
+        return None
+
+def discard_renditions(recording_file: str, show: Show) -> None:
+    for _, path in rendition_files(recording_file, show):
+        if os.path.exists(path):
+            os.remove(path)
+
+def publish_renditions(recording_file: str, recording_key: str, show: Show) -> bool:
+    """
+    Upload each rendition next to the archived recording, spooling any
+    that fail: archive/show_x.mp3 -> archive/show_x_48k.opus
+    """
+    published = True
+    for rendition, path in rendition_files(recording_file, show):
+        key = rendition_key(recording_key, rendition)
+        if not os.path.exists(path):
+            log_error(f"Rendition {rendition.name} of {recording_file} is missing")
+            published = False
+        elif upload_to_s3(path, key, {"show": show.job_name}):
+            cleanup_local_file(path)
+        else:
+            upload_spool.enqueue(path, key, show=show.job_name)
+            published = False
+    return published
+
+HLS_PLAYLIST = "index.m3u8"
+
+def hls_prefix_for(recording_key: str) -> str:
+    """Where a recording's HLS package goes: archive/show_x.mp3 -> archive/hls/show_x/"""
+    directory, name = os.path.split(recording_key)
+    return f"{directory}/hls/{os.path.splitext(name)[0]}/" if directory else f"hls/{os.path.splitext(name)[0]}/"
+
+def package_hls(recording_file: str) -> Optional[str]:
+    """
+    Remux the recording, without re-encoding, into HLS_SEGMENT_DURATION
+    MPEG-TS segments and a VOD playlist. Returns the package directory.
+    """
+    hls_dir = os.path.splitext(recording_file)[0] + ".hls"
+    os.makedirs(hls_dir, exist_ok=True)
+    result = run_ffmpeg([
+        "ffmpeg", "-hide_banner", "-loglevel", "level+info",
+        "-i", recording_file,
+        "-vn", "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_DURATION),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(hls_dir, "segment_%05d.ts"),
+        os.path.join(hls_dir, HLS_PLAYLIST),
+    ])
+    if result.returncode != 0:
+        log_error(f"HLS packaging failed for {recording_file}: {result.stderr[-500:]}")
+        shutil.rmtree(hls_dir, ignore_errors=True)
+        return None
+    return hls_dir
+
+@retry_decorator(max_retries=MAX_UPLOAD_RETRIES)
+def upload_hls_file(local_file: str, s3_key: str, transfer: Optional[Transfer] = None) -> None:
+    s3_client.upload_file(
+        local_file,
+        BUCKET_NAME,
+        s3_key,
+        ExtraArgs={'ACL': 'public-read', 'ContentType': content_type_for(local_file)},
+        Config=transfer_config(),
+        Callback=transfer or bandwidth_governor.transfer()
+    )
+
+def publish_hls(recording_file: str, recording_key: str) -> bool:
+    """
+    Package the recording as HLS and upload it under hls_prefix_for(key).
+    Segments are uploaded by HLS_UPLOAD_CONCURRENCY threads; the playlist
+    goes last, and only once every segment is stored, so it never points
+    at a missing segment.
+    """
+    hls_dir = package_hls(recording_file)
+    if not hls_dir:
+        return False
+    prefix = hls_prefix_for(recording_key)
+    try:
+        segments = sorted(name for name in os.listdir(hls_dir) if name.endswith(".ts"))
+        start_time = time.monotonic()
+        transfer = bandwidth_governor.transfer()
+        with ThreadPoolExecutor(max_workers=HLS_UPLOAD_CONCURRENCY) as executor:
+            futures = [
+                executor.submit(upload_hls_file, os.path.join(hls_dir, name), prefix + name, transfer)
+                for name in segments
+            ]
+            errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            log_error(f"HLS upload of {recording_key} failed for {len(errors)} segment(s): {errors[0]}")
+            return False
+        upload_hls_file(os.path.join(hls_dir, HLS_PLAYLIST), prefix + HLS_PLAYLIST, transfer)
+        log_info(
+            f"Published HLS for {recording_key}: {prefix}{HLS_PLAYLIST} "
+            f"({len(segments)} segments in {time.monotonic() - start_time:.1f}s, "
+            f"{transfer.throughput() / (1024 * 1024):.2f} MB/s, throttled {transfer.throttled:.1f}s)"
+        )
+        return True
+    except Exception as e:
+        log_error(f"Error publishing HLS for {recording_key}: {e}")
+        return False
+    finally:
+        shutil.rmtree(hls_dir, ignore_errors=True)
+
+@retry_decorator(max_retries=MAX_UPLOAD_RETRIES)
+def upload_part(
+    s3_key: str,
+    upload_id: str,
+    part_number: int,
+    data: bytes,
+    md5: Optional[str] = None,
+    transfer: Optional[Transfer] = None
+) -> dict:
+    """
+    Upload a single multipart part and return its completion entry; `md5`
+    (hex) is checked by S3. The body is paced by `transfer`, or a new
+    bandwidth governor transfer, as it is sent.
+    """
+    from s3transfer.utils import signal_not_transferring, signal_transferring
+    # The same handlers boto3's transfer manager registers; unique IDs make this idempotent
+    s3_client.meta.events.register_first('request-created.s3', signal_not_transferring, unique_id='s3upload-not-transferring')
+    s3_client.meta.events.register_last('request-created.s3', signal_transferring, unique_id='s3upload-transferring')
+    extra_args = {'ContentMD5': base64.b64encode(bytes.fromhex(md5)).decode()} if md5 else {}
+    response = s3_client.upload_part(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=ThrottledBody(data, transfer or bandwidth_governor.transfer()),
+        **extra_args
+    )
+    return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+def record_stream_to_s3(s3_key: str, show: Optional[Show] = None, plan: RecordingPlan = TRANSCODE_PLAN) -> bool:
+    """
+    Record the stream and upload it to S3 while it is still being captured.
+    ffmpeg writes to a pipe which is cut into MULTIPART_PART_SIZE parts; each
+    part is handed to an uploader thread, so at most three parts are held in
+    memory (the one filling, one queued and one uploading) and the object
+    is complete as soon as ffmpeg exits. Parts are
+    hashed as they are read: each is sent with its Content-MD5, and the
+    whole-file checksums are checked against the final ETag and stored
+    in the object's metadata.
+    """
+    show = show or default_show()
+    upload_id = None
+    try:
+        upload = s3_client.create_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            ACL='public-read',
+            ContentType=plan.content_type
+        )
+        upload_id = upload['UploadId']
+
+        parts = []
+        upload_errors = []
+        part_queue = queue.Queue(maxsize=1)
+        pending = bytearray()  # Audio not yet handed to the uploader, carried across failovers
+        part_number = 0
+        digest = CaptureDigest()
+        indexer = FrameIndexer.for_file(s3_key)
+        # Live parts count against the governor but never wait on it, or ffmpeg would back up
+        transfer = bandwidth_governor.transfer(wait=False)
+
+        def uploader():
+            while True:
+                item = part_queue.get()
+                if item is None:
+                    return
+                if upload_errors:
+                    continue  # Drain the queue so the reader never blocks
+                part_number, data, md5 = item
+                try:
+                    parts.append(upload_part(s3_key, upload_id, part_number, data, md5, transfer))
+                except Exception as e:
+                    upload_errors.append(e)
+
+        def queue_part():
+            nonlocal part_number
+            part_number += 1
+            # Parts and digest parts are the same MULTIPART_PART_SIZE slices
+            md5 = digest.end_part() if digest.part_bytes else digest.part_md5s[-1]
+            part_queue.put((part_number, bytes(pending), md5))
+            pending.clear()
+
+        def read_parts(process):
+            while not upload_errors:
+                data = process.stdout.read(MULTIPART_PART_SIZE - len(pending))
+                if not data:
+                    break
+                pending.extend(data)
+                digest.update(data)
+                if indexer:
+                    indexer.update(data)
+                if len(pending) >= MULTIPART_PART_SIZE:
+                    queue_part()
+            if upload_errors:
+                process.kill()
+
+        def run(show: Show, duration: Optional[float]) -> FFmpegResult:
+            result = run_ffmpeg(
+                build_record_command("pipe:1", show, plan, duration=duration),
+                stdout_handler=read_parts,
+                progress_key=progress_key_for(show, s3_key)
+            )
+            if upload_errors:
+                raise upload_errors[0]
+            return result
+
+        uploader_thread = threading.Thread(target=uploader, daemon=True)
+        uploader_thread.start()
+
+        log_info(f"Streaming recording started: {s3_key}")
+        deadline = (show.air_time if show.air_time is not None else time.time()) + show.duration
+        try:
+            results = run_with_failover(show, deadline, run)
+            if pending:
+                queue_part()
+        finally:
+            part_queue.put(None)
+            uploader_thread.join()
+
+        result = results[0]
+        if upload_errors:
+            raise upload_errors[0]
+        if len(results) == 1 and result.returncode != 0:
+            log_error(f"Recording failed: {result.stderr}")
+            raise RuntimeError(f"ffmpeg exited with code {result.returncode}")
+        if not parts:
+            raise RuntimeError("ffmpeg produced no audio")
+
+        parts.sort(key=lambda part: part['PartNumber'])
+        completed = s3_client.complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        upload_id = None  # The object exists now; nothing left to abort
+        digests = digest.result()
+        verify_uploaded_etag(s3_key, completed['ETag'], digests.expected_etag(multipart=True))
+        metadata = digests.metadata()
+        duration = sum(run.progress.elapsed_seconds for run in results if run.progress)
+        if duration:
+            metadata["duration"] = f"{duration:.1f}"
+        # Metadata must be set when an upload starts; add the checksums with a server-side copy
+        s3_client.copy_object(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            CopySource={'Bucket': BUCKET_NAME, 'Key': s3_key},
+            ACL='public-read',
+            ContentType=plan.content_type,
+            Metadata=metadata,
+            MetadataDirective='REPLACE'
+        )
+        index = indexer.result() if indexer else None
+        if index and index.points:
+            s3_client.put_object(
+                Bucket=BUCKET_NAME,
+                Key=frame_index_key_for(s3_key),
+                Body=index.to_bytes(),
+                ACL='public-read',
+                ContentType='application/octet-stream'
+            )
+        log_info(
+            f"Streaming recording finished: {s3_key} ({len(parts)} parts, "
+            f"{report_cpu_usage(show, plan, result)}{report_start_offset(show, result)})"
+        )
+        return True
+    except Exception as e:
+        log_error(f"Error during streaming recording {s3_key}: {e}")
+        if upload_id:
+            try:
+                s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+            except Exception as abort_error:
+                log_error(f"Error aborting multipart upload for {s3_key}: {abort_error}")
+        return False
+
+@dataclass
+class Segment:
+    """One finished segment of a segmented recording."""
+    index: int
+    path: str
+    start: float  # wall-clock time the segment's audio began
+    duration: float
+    size: int
+    key: Optional[str] = None
+    uploaded: bool = False
+
+@dataclass
+class SegmentedCapture:
+    """Segments and gaps of a segmented recording."""
+    base_name: str
+    segment_dir: str
+    expected_duration: float
+    segments: List[Segment] = field(default_factory=list)
+    gaps: List[dict] = field(default_factory=list)
+
+    @property
+    def recorded_duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    @property
+    def lost_seconds(self) -> float:
+        return max(self.expected_duration - self.recorded_duration, 0.0)
+
+    def manifest(self) -> dict:
+        return {
+            "base_name": self.base_name,
+            "expected_duration": self.expected_duration,
+            "recorded_duration": round(self.recorded_duration, 3),
+            "lost_seconds": round(self.lost_seconds, 3),
+            "segments": [
+                {
+                    "index": segment.index,
+                    "key": segment.key,
+                    "start": round(segment.start, 3),
+                    "duration": round(segment.duration, 3),
+                    "size": segment.size,
+                }
+                for segment in self.segments
+            ],
+            "gaps": self.gaps,
+        }
+
+def read_segment_list(list_file: str) -> List[tuple]:
+    """Parse ffmpeg's CSV segment list into (filename, start, end) rows."""
+    if not os.path.exists(list_file):
+        return []
+    rows = []
+    with open(list_file) as f:
+        for line in f:
+            fields = line.strip().split(",")
+            if len(fields) == 3:
+                rows.append((fields[0], float(fields[1]), float(fields[2])))
+    return rows
+
+def record_segments(show: Show, plan: RecordingPlan, base_name: str) -> SegmentedCapture:
+    """
+    Record the show as SEGMENT_DURATION segments until its air time is over.
+    ffmpeg reconnects on network errors; if it still exits early it is
+    restarted for the remaining time and the gap is recorded. Each finished
+    segment is uploaded in the background while the next one records.
+    """
+    segment_dir = os.path.join(show.output_dir, f"{base_name}.segments")
+    os.makedirs(segment_dir, exist_ok=True)
+    capture = SegmentedCapture(base_name, segment_dir, show.duration)
+    deadline = (show.air_time if show.air_time is not None else time.time()) + show.duration
+    list_file = os.path.join(segment_dir, "segments.csv")
+    muxer_format = "mp3" if not plan.copy else plan.muxer
+    format_options = ["-segment_format_options", "id3v2_version=0:write_xing=0"] if muxer_format == "mp3" else []
+    futures = []
+    failures = 0
+    last_audio_end = None
+
+    def upload_segment(segment: Segment) -> None:
+        segment.uploaded = bool(upload_to_s3(segment.path, segment.key))
+
+    with ThreadPoolExecutor(max_workers=SEGMENT_UPLOAD_CONCURRENCY) as executor:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 1:
+                break
+
+            seen = len(read_segment_list(list_file))
+            command = build_record_command(
+                os.path.join(segment_dir, f"{base_name}_%05d{plan.extension}"),
+                show, plan,
+                duration=round(remaining, 3),
+                muxer_args=[
+                    "-f", "segment",
+                    "-segment_time", str(SEGMENT_DURATION),
+                    "-segment_format", muxer_format,
+                    *format_options,
+                    "-reset_timestamps", "1",
+                    "-segment_start_number", str(len(capture.segments)),
+                    "-segment_list", list_file,
+                    "-segment_list_type", "csv",
+                ]
+            )
+
+            # Upload segments as ffmpeg finishes them, while it keeps recording
+            stop_watching = threading.Event()
+            run_segments = []
+
+            def collect_finished():
+                for filename, start, end in read_segment_list(list_file)[seen + len(run_segments):]:
+                    path = os.path.join(segment_dir, filename)
+                    segment = Segment(
+                        index=len(capture.segments),
+                        path=path,
+                        start=start,  # Relative to the run until it ends
+                        duration=end - start,
+                        size=os.path.getsize(path) if os.path.exists(path) else 0,
+                        key=f"{show.key_prefix}segments/{base_name}/{filename}"
+                    )
+                    capture.segments.append(segment)
+                    run_segments.append(segment)
+                    futures.append(executor.submit(upload_segment, segment))
+
+            def watch_segments():
+                while not stop_watching.wait(1):
+                    collect_finished()
+
+            watcher = threading.Thread(target=watch_segments, daemon=True)
+            watcher.start()
+            log_info(f"Segmented recording running: {base_name} ({remaining:.0f}s remaining)")
+            result = run_ffmpeg(command, progress_key=progress_key_for(show, segment_dir))
+            stop_watching.set()
+            watcher.join()
+            collect_finished()
+            run_ended = time.time()
+
+            # Place this run's audio on the wall clock, ending when ffmpeg exited
+            run_duration = sum(segment.duration for segment in run_segments)
+            run_started = run_ended - run_duration
+            for segment in run_segments:
+                segment.start += run_started
+            if run_segments and last_audio_end is not None and run_started > last_audio_end:
+                capture.gaps.append({
+                    "start": round(last_audio_end, 3),
+                    "end": round(run_started, 3),
+                    "duration": round(run_started - last_audio_end, 3),
+                })
+            if run_segments:
+                last_audio_end = run_ended
+                failures = 0
+
+            if deadline - time.time() > 1:
+                failures += 1
+                show = fail_over(show)
+                backoff = failover_backoff(show, failures)
+                log_error(
+                    f"Recording of {base_name} stopped early (code {result.returncode}), "
+                    f"restarting in {backoff}s: {result.stderr[-500:]}"
+                )
+                time.sleep(backoff)
+
+        for future in futures:
+            future.result()
+
+    if last_audio_end is not None and deadline > last_audio_end + 1:
+        capture.gaps.append({
+            "start": round(last_audio_end, 3),
+            "end": round(deadline, 3),
+            "duration": round(deadline - last_audio_end, 3),
+        })
+    log_info(
+        f"Segmented recording finished: {base_name} ({len(capture.segments)} segments, "
+        f"{capture.recorded_duration:.0f}s recorded, {capture.lost_seconds:.0f}s lost "
+        f"in {len(capture.gaps)} gap(s))"
+    )
+    return capture
+
+def concatenate_segments(capture: SegmentedCapture, output_file: str) -> str:
+    """
+    Join the segments byte for byte into the full show (MP3 and ADTS
+    frames concatenate as-is), saving its checksums from the same pass.
+    """
+    digest = CaptureDigest()
+    with open(output_file, 'wb') as output:
+        for segment in capture.segments:
+            with open(segment.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    output.write(chunk)
+                    digest.update(chunk)
+    save_capture_digests(output_file, digest)
+    return output_file
+
+def stitch_segments_in_s3(
+    capture: SegmentedCapture,
+    s3_key: str,
+    content_type: str,
+    metadata: Optional[Dict[str, str]] = None,
+    trailer: bytes = b""
+) -> bool:
+    """
+    Assemble the full show from the uploaded segments with server-side part
+    copies, with the same `metadata` an upload of the joined file would
+    carry. A `trailer` written after the segments locally (the ReplayGain
+    tag) goes up with the last segment's bytes as the final part instead.
+    Only possible when every segment but the last meets the S3 minimum part
+    size; returns False so the caller can upload instead.
+    """
+    segments = capture.segments
+    if not segments or not all(segment.uploaded for segment in segments):
+        return False
+    if any(segment.size < S3_MIN_PART_SIZE for segment in segments[:-1]):
+        return False
+
+    upload_id = None
+    try:
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=BUCKET_NAME, Key=s3_key, ACL='public-read', ContentType=content_type,
+            **({'Metadata': metadata} if metadata else {})
+        )['UploadId']
+        parts = []
+        for part_number, segment in enumerate(segments, start=1):
+            if trailer and segment is segments[-1]:
+                with open(segment.path, 'rb') as f:
+                    parts.append(upload_part(s3_key, upload_id, part_number, f.read() + trailer))
+                continue
+            response = s3_client.upload_part_copy(
+                Bucket=BUCKET_NAME,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource={'Bucket': BUCKET_NAME, 'Key': segment.key}
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']})
+        s3_client.complete_multipart_upload(
+            Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        )
+        log_info(f"Stitched {len(parts)} segments into {s3_key}")
+        return True
+    except Exception as e:
+        log_error(f"Error stitching segments into {s3_key}: {e}")
+        if upload_id:
+            try:
+                s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+            except Exception as abort_error:
+                log_error(f"Error aborting multipart upload for {s3_key}: {abort_error}")
+        return False
+
+def delete_segment_objects(capture: SegmentedCapture) -> None:
+    """Remove uploaded segments once the full show exists in the bucket."""
+    keys = [{'Key': segment.key} for segment in capture.segments if segment.uploaded]
+    try:
+        for i in range(0, len(keys), 1000):  # DeleteObjects takes up to 1000 keys
+            s3_client.delete_objects(Bucket=BUCKET_NAME, Delete={'Objects': keys[i:i + 1000]})
+    except Exception as e:
+        log_error(f"Error deleting segments of {capture.base_name}: {e}")
+
+RADIO_GARDEN_LISTEN_URL = "https://radio.garden/api/ara/content/listen/{channel}/channel.mp3"
+STREAMTHEWORLD_API_URL = "https://playerservices.streamtheworld.com/api/livestream?version=1.9&mount={mount}&lang=en"
+RADIO_GARDEN_RE = re.compile(r"^(?:radiogarden:|https?://radio\.garden/listen/[^/]+/)([\w-]+)/?$")
+STREAMTHEWORLD_RE = re.compile(r"^(?:streamtheworld:|https?://[\w.-]+\.streamtheworld\.com(?::\d+)?/)(\w+)$")
+
+stream_cache: Dict[str, tuple] = {}  # Show url -> (expires at, candidate stream URLs)
+mirror_stalls: Dict[str, float] = {}  # Mirror URL -> when it last stalled
+stream_cache_lock = threading.Lock()
+
+@dataclass
+class MirrorHealth:
+    """How quickly a mirror answered when it was last ranked."""
+    url: str
+    connect_seconds: float
+    first_byte_seconds: float
+
+def xml_children(element, tag: str) -> list:
+    """Descendants of `element` named `tag`, ignoring XML namespaces."""
+    return [child for child in element.iter() if child.tag.rsplit("}", 1)[-1] == tag]
+
+def streamtheworld_mirrors(mount: str) -> List[str]:
+    """Ask streamtheworld's player services which edge servers carry `mount`."""
+    import requests
+    base_mount = mount[:-3] if mount.endswith("_SC") else mount
+    response = requests.get(STREAMTHEWORLD_API_URL.format(mount=base_mount), timeout=MIRROR_PROBE_TIMEOUT)
+    response.raise_for_status()
+    urls = []
+    for server in xml_children(ElementTree.fromstring(response.content), "server"):
+        hosts = xml_children(server, "ip")
+        ports = [port.text.strip() for port in xml_children(server, "port") if port.text]
+        if not hosts or not ports:
+            continue
+        host = hosts[0].text.strip()
+        if "443" in ports:
+            urls.append(f"https://{host}/{mount}")
+        elif ports[0] == "80":
+            urls.append(f"http://{host}/{mount}")
+        else:
+            urls.append(f"http://{host}:{ports[0]}/{mount}")
+    return urls
+
+def resolve_candidates(source: str) -> List[str]:
+    """
+    Candidate stream URLs for a show's url: a Radio Garden channel
+    (radiogarden:<id> or a radio.garden listen link), a streamtheworld
+    mount (streamtheworld:<mount> or any edge server URL), or a direct
+    URL. Resolved lists are cached for STREAM_CACHE_TTL seconds.
+    """
+    with stream_cache_lock:
+        cached = stream_cache.get(source)
+        if cached and cached[0] > time.time():
+            return list(cached[1])
+
+    candidates = []
+    try:
+        garden = RADIO_GARDEN_RE.match(source)
+        mount = STREAMTHEWORLD_RE.match(source)
+        if garden:
+            import requests
+            listen_url = RADIO_GARDEN_LISTEN_URL.format(channel=garden.group(1))
+            response = requests.get(listen_url, allow_redirects=False, timeout=MIRROR_PROBE_TIMEOUT)
+            location = response.headers.get("Location")
+            if location:
+                candidates += resolve_candidates(location)
+            candidates.append(listen_url)
+        elif mount:
+            if source.startswith(("http://", "https://")):
+                candidates.append(source)
+            candidates += streamtheworld_mirrors(mount.group(1))
+        else:
+            candidates.append(source)
+    except Exception as e:
+        log_error(f"Error resolving stream {source}: {e}")
+        # Fall back to whatever was found, or the url itself if it can be played directly
+        if source.startswith(("http://", "https://")):
+            candidates.append(source)
+        return list(dict.fromkeys(candidates))
+
+    candidates = list(dict.fromkeys(candidates))
+    with stream_cache_lock:
+        stream_cache[source] = (time.time() + STREAM_CACHE_TTL, candidates)
+    return list(candidates)
+
+def probe_mirror(url: str, timeout: float = MIRROR_PROBE_TIMEOUT) -> Optional[MirrorHealth]:
+    """Time the response headers and first audio bytes from a mirror; None if it fails or stalls."""
+    import requests
+    start_time = time.monotonic()
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            connect_seconds = time.monotonic() - start_time
+            response.raise_for_status()
+            if not next(response.iter_content(1024), b""):
+                return None
+            return MirrorHealth(url, connect_seconds, time.monotonic() - start_time)
+    except Exception:
+        return None
+
+def rank_mirrors(urls: List[str]) -> List[str]:
+    """
+    Order mirrors by first-byte time, then connect time. Mirrors that
+    stalled within STREAM_CACHE_TTL follow the healthy ones, and those that
+    don't answer at all are kept last as a final resort.
+    """
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        results = list(executor.map(probe_mirror, urls))
+    healthy = sorted(
+        (health for health in results if health),
+        key=lambda health: (health.first_byte_seconds, health.connect_seconds)
+    )
+    for health in healthy:
+        metrics.set("streamseed_mirror_first_byte_seconds", health.first_byte_seconds, mirror=health.url)
+
+    with stream_cache_lock:
+        stalled = {url for url, at in mirror_stalls.items() if time.time() - at < STREAM_CACHE_TTL}
+    answered = [health.url for health in healthy]
+    return (
+        [url for url in answered if url not in stalled]
+        + [url for url in answered if url in stalled]
+        + [url for url in urls if url not in answered]
+    )
+
+def resolve_stream(show: Show) -> Show:
+    """Point the show at its best mirror, keeping the ranked list for failover."""
+    candidates = resolve_candidates(show.url)
+    if len(candidates) <= 1:
+        return dataclasses.replace(show, url=candidates[0]) if candidates else show
+    ranked = rank_mirrors(candidates)
+    log_info(f"Resolved {show.url} for {show.job_name} to {len(ranked)} mirrors, using {ranked[0]}")
+    return dataclasses.replace(show, url=ranked[0], mirrors=tuple(ranked))
+
+def fail_over(show: Show) -> Show:
+    """Mark the show's current mirror as stalled and switch to the next one."""
+    if len(show.mirrors) < 2:
+        return show
+    with stream_cache_lock:
+        mirror_stalls[show.url] = time.time()
+    # A warm start may have swapped in the mirror's redirect target
+    index = show.mirrors.index(show.url) if show.url in show.mirrors else 0
+    next_url = show.mirrors[(index + 1) % len(show.mirrors)]
+    metrics.inc("streamseed_mirror_failovers_total", show=show.job_name)
+    log_error(f"Stream {show.url} stalled for {show.job_name}, failing over to {next_url}")
+    return dataclasses.replace(show, url=next_url)
+
+@dataclass
+class IngestCheck:
+    """Timings measured while checking a stream endpoint ahead of a warm start."""
+    url: str  # After redirects
+    dns_seconds: float
+    connect_seconds: float
+    first_byte_seconds: float
+    burst_seconds: float
+    bitrate_kbps: Optional[float] = None
+
+def prepare_ingest(stream_url: str, probe_seconds: float = WARM_START_PROBE_SECONDS) -> Optional[IngestCheck]:
+    """
+    Resolve and open the stream, follow its redirects and read a few seconds
+    of audio. Servers send a burst of buffered audio on connect; measuring it
+    against the stream bitrate tells how far behind the live edge the first
+    byte is.
+    """
+    import requests
+    try:
+        parsed = urlparse(stream_url)
+        start_time = time.monotonic()
+        socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        dns_seconds = time.monotonic() - start_time
+
+        with requests.get(stream_url, stream=True, timeout=(5, 10)) as response:
+            connect_seconds = time.monotonic() - start_time
+            response.raise_for_status()
+            chunks = response.iter_content(4096)
+            received = len(next(chunks))
+            first_byte_seconds = time.monotonic() - start_time
+            for chunk in chunks:
+                received += len(chunk)
+                if time.monotonic() - start_time - first_byte_seconds >= probe_seconds:
+                    break
+            elapsed = time.monotonic() - start_time - first_byte_seconds
+
+            bitrate_kbps = None
+            if response.headers.get("icy-br", "").split(",")[0].strip().isdigit():
+                bitrate_kbps = float(response.headers["icy-br"].split(",")[0])
+            burst_seconds = 0.0
+            if bitrate_kbps:
+                burst_seconds = max(received / (bitrate_kbps * 125) - elapsed, 0.0)
+
+            return IngestCheck(
+                url=response.url,
+                dns_seconds=dns_seconds,
+                connect_seconds=connect_seconds,
+                first_byte_seconds=first_byte_seconds,
+                burst_seconds=burst_seconds,
+                bitrate_kbps=bitrate_kbps
+            )
+    except Exception as e:
+        log_error(f"Warm start check failed for {stream_url}: {e}")
+        return None
+
+def warm_start_ingest(show: Show) -> Show:
+    """
+    Check the endpoint ahead of air, then wait until shortly before the air
+    time. Returns the show to record, pointed at the resolved URL with its
+    measured ingest latency so ffmpeg's pre-roll can be trimmed.
+    """
+    check = prepare_ingest(show.url)
+    if check:
+        log_info(
+            f"Stream ready for {show.job_name}: {check.url} (DNS {check.dns_seconds * 1000:.0f}ms, "
+            f"headers {check.connect_seconds * 1000:.0f}ms, first byte {check.first_byte_seconds * 1000:.0f}ms, "
+            f"burst {check.burst_seconds:.1f}s)"
+        )
+        show = dataclasses.replace(
+            show, url=check.url, ingest_latency=check.first_byte_seconds - check.burst_seconds
+        )
+
+    wait = show.air_time - WARM_START_CONNECT_LEAD - time.time()
+    if wait > 0:
+        time.sleep(wait)
+    return show
+
+# Add executable check for ffmpeg
+def check_ffmpeg():
+    """Check if ffmpeg is installed and accessible."""
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], 
+                              capture_output=True, 
+                              text=True)
+        if result.returncode != 0:
+            raise Exception("FFmpeg check failed")
+        return True
+    except Exception as e:
+        log_error(f"FFmpeg not found or not accessible: {e}")
+        return False
+
+def main(show: Optional[Show] = None) -> bool:
+    """Main function that handles recording and uploading."""
+    show = show or default_show()
+
+    # Add FFmpeg check
+    if not check_ffmpeg():
+        log_error("FFmpeg is required but not found. Please install FFmpeg.")
+        return False
+        
+    log_info(f"Starting new recording session for {show.job_name}...")
+    show = resolve_stream(show)
+
+    if show.warm_start and show.air_time is not None:
+        show = warm_start_ingest(show)
+
+    if CAPTURE_MODE == "stream":
+        return stream_session(show)
+    if not upload_spool.wait_for_space(estimated_recording_bytes(show)):
+        log_error(f"Upload spool is full, not recording {show.job_name}")
+        return False
+    if CAPTURE_MODE == "segmented":
+        return segmented_session(show)
+    
+    # Step 1: Record the stream
+    with capture_slot():
+        recording_file = record_stream(show)
+    if not recording_file:
+        log_error("Recording failed, exiting.")
+        return False
+
+    # Step 2: Verify recording
+    if not verify_recording(recording_file, show.duration) or not check_dead_air(recording_file):
+        log_error("Recording verification failed, exiting.")
+        cleanup_local_file(recording_file)
+        discard_renditions(recording_file, show)
+        return False
+
+    # Step 3: Upload to S3
+    recording_key = f"{show.key_prefix}{os.path.basename(recording_file)}"
+    latest_key = latest_key_for(show, recording_key)
+    if not upload_to_s3(recording_file, recording_key, publish_context(recording_file, recording_key, show)):
+        spool_recording(recording_file, recording_key, show)
+        return False
+    publish_renditions(recording_file, recording_key, show)
+
+    # Step 4: Update the "latest" recording
+    if not upload_latest(recording_key, latest_key):
+        # The archive is stored; the drainer only has to finish publishing it
+        upload_spool.enqueue(recording_file, recording_key, latest_key, show.job_name, show.hls, uploaded=True)
+        return False
+    publish_waveform(recording_file, recording_key, latest_key)
+    publish_frame_index(recording_file, recording_key)
+    if show.hls:
+        publish_hls(recording_file, recording_key)
+    index_recording(recording_key)
+    log_success(f"Successfully recorded and uploaded {recording_key}")
+    # Step 5: Cleanup local file after successful upload
+    cleanup_local_file(recording_file)
+    return True
+
+def latest_key_for(show: Show, recording_key: str) -> str:
+    """The show's latest key, with the extension of the archived recording."""
+    return os.path.splitext(show.latest_key)[0] + os.path.splitext(recording_key)[1]
+
+def stream_session(show: Show) -> bool:
+    """Record straight into the bucket, then point 'latest.mp3' at the archive."""
+    plan = plan_recording(show)
+    timestamp = recording_timestamp(show)
+    recording_key = f"{show.key_prefix}show_{timestamp}{plan.extension}"
+    with capture_slot():
+        recorded = record_stream_to_s3(recording_key, show, plan)
+    if not recorded:
+        log_error("Streaming recording failed, exiting.")
+        return False
+    if upload_latest(recording_key, latest_key_for(show, recording_key)):
+        index_recording(recording_key)
+        log_success(f"Successfully recorded and uploaded {recording_key}")
+        return True
+    return False
+
+def segmented_session(show: Show) -> bool:
+    """
+    Record in segments, then produce the full show: stitched server-side
+    from the uploaded segments when possible, otherwise uploaded from a
+    local concatenation. A manifest with segment and gap boundaries is
+    stored next to the archive.
+    """
+    plan = plan_recording(show)
+    timestamp = recording_timestamp(show)
+    base_name = f"show_{timestamp}"
+    recording_key = f"{show.key_prefix}{base_name}{plan.extension}"
+
+    with capture_slot():
+        capture = record_segments(show, plan, base_name)
+    if not capture.segments:
+        log_error("Recording failed, no segments were captured.")
+        return False
+
+    recording_file = concatenate_segments(
+        capture, os.path.join(show.output_dir, f"{base_name}{plan.extension}")
+    )
+    if not verify_recording(recording_file, show.duration):
+        log_error("Recording verification failed, exiting.")
+        cleanup_local_file(recording_file)
+        return False
+    if not check_dead_air(recording_file):
+        cleanup_local_file(recording_file)
+        return False
+    save_frame_index(recording_file, build_frame_index(recording_file))
+
+    # Anything check_dead_air appended to the joined file (a ReplayGain tag) belongs in the stitched one too
+    with open(recording_file, 'rb') as f:
+        f.seek(sum(segment.size for segment in capture.segments))
+        trailer = f.read()
+    stitched = stitch_segments_in_s3(
+        capture, recording_key, plan.content_type, recording_metadata(recording_file), trailer
+    )
+    if not stitched and not upload_to_s3(recording_file, recording_key,
+                                         publish_context(recording_file, recording_key, show)):
+        spool_recording(recording_file, recording_key, show)
+        shutil.rmtree(capture.segment_dir, ignore_errors=True)
+        return False
+
+    try:
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=f"{show.key_prefix}{base_name}.manifest.json",
+            Body=json.dumps(capture.manifest(), indent=2).encode(),
+            ACL='public-read',
+            ContentType='application/json'
+        )
+    except Exception as e:
+        log_error(f"Error uploading manifest for {recording_key}: {e}")
+    delete_segment_objects(capture)
+
+    if upload_latest(recording_key, latest_key_for(show, recording_key)):
+        publish_waveform(recording_file, recording_key, latest_key_for(show, recording_key))
+        publish_frame_index(recording_file, recording_key)
+        if show.hls:
+            publish_hls(recording_file, recording_key)
+        index_recording(recording_key)
+        log_success(
+            f"Successfully recorded and uploaded {recording_key} "
+            f"({capture.lost_seconds:.0f}s of air time lost)"
+        )
+        cleanup_local_file(recording_file)
+        shutil.rmtree(capture.segment_dir, ignore_errors=True)
+        return True
+    return False
+
+@dataclass
+class RecordingJob:
+    """Runtime state of one scheduled run of a show."""
+    job_id: int
+    show: Show
+    state: str = "waiting"  # waiting, recording, processing, done, failed
+    scheduled_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+# The job run by the current thread and its supervisor, for capture_slot
+current_job = threading.local()
+
+@contextmanager
+def capture_slot():
+    """
+    Hold a capture slot of the supervisor running this thread's job (if
+    any) and the bandwidth governor's recording rate while ffmpeg records.
+    """
+    supervisor = getattr(current_job, "supervisor", None)
+    with supervisor.capture_slot(current_job.job) if supervisor else nullcontext():
+        with bandwidth_governor.recording():
+            yield
+
+class RecordingSupervisor:
+    """
+    Runs every configured show in its own thread so scheduled shows never
+    queue behind each other, with at most `max_concurrent` ffmpeg children
+    recording at once. Only the capture takes a slot: verifying, analysing
+    and uploading earlier shows never hold back one that is due.
+    """
+
+    def __init__(self, shows: List[Show], max_concurrent: int = MAX_CONCURRENT_RECORDINGS):
+        self.shows = shows
+        self.max_concurrent = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.jobs: Dict[int, RecordingJob] = {}
+        self.lock = threading.Lock()
+        self.next_job_id = 1
+
+    def launch(self, show: Show, scheduled_at: Optional[float] = None) -> RecordingJob:
+        """Start a job for `show` in the background and return immediately."""
+        with self.lock:
+            job = RecordingJob(job_id=self.next_job_id, show=show)
+            if scheduled_at is not None:
+                job.scheduled_at = scheduled_at
+            self.jobs[job.job_id] = job
+            self.next_job_id += 1
+        threading.Thread(
+            target=self._run, args=(job,), name=f"job-{job.job_id}", daemon=True
+        ).start()
+        return job
+
+    @contextmanager
+    def capture_slot(self, job: RecordingJob):
+        """Wait for one of the `max_concurrent` slots and hold it while `job` records."""
+        with self.slots:
+            job.state = "recording"
+            job.started_at = time.time()
+            lag = job.started_at - job.scheduled_at
+            metrics.observe("streamseed_schedule_lag_seconds", lag)
+            metrics.set("streamseed_schedule_last_lag_seconds", lag, show=job.show.job_name)
+            try:
+                yield
+            finally:
+                job.state = "processing"
+
+    def _run(self, job: RecordingJob) -> None:
+        current_job.supervisor, current_job.job = self, job
+        try:
+            job.state = "done" if main(job.show) else "failed"
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            log_error(f"Job {job.show.job_name} crashed: {e}")
+        finally:
+            job.finished_at = time.time()
+            upload_spool.nudge()
+
+    def active_jobs(self) -> List[RecordingJob]:
+        with self.lock:
+            return [job for job in self.jobs.values() if job.state in ("waiting", "recording", "processing")]
+
+    def status(self) -> List[dict]:
+        """Snapshot of every job's state."""
+        with self.lock:
+            return [asdict(job) for job in self.jobs.values()]
+
+def localize_sydney(naive: datetime.datetime) -> datetime.datetime:
+    """
+    Attach the Sydney timezone to a local wall-clock time. Times repeated when
+    daylight saving ends use their first occurrence; times skipped when it
+    starts move forward past the gap.
+    """
+    import pytz
+    try:
+        return sydney_tz().localize(naive, is_dst=None)
+    except pytz.exceptions.AmbiguousTimeError:
+        return sydney_tz().localize(naive, is_dst=True)
+    except pytz.exceptions.NonExistentTimeError:
+        return sydney_tz().normalize(sydney_tz().localize(naive, is_dst=False))
+
+def next_start(show: Show, after: float) -> datetime.datetime:
+    """The show's first scheduled start strictly after the `after` timestamp."""
+    hour, minute = map(int, show.time.split(":"))
+    local_date = datetime.datetime.fromtimestamp(after, sydney_tz()).date()
+    for offset in range(8):
+        date = local_date + datetime.timedelta(days=offset)
+        if WEEKDAYS[date.weekday()] not in show.days:
+            continue
+        start = localize_sydney(datetime.datetime.combine(date, datetime.time(hour, minute)))
+        if start.timestamp() > after:
+            return start
+    raise ValueError(f"{show.job_name} has no scheduled days")
+
+class RecordingScheduler:
+    """
+    Sleeps until the next show is due instead of polling. Start times are
+    recomputed from Sydney local time on every cycle, so daylight saving
+    changes apply without a restart, and each show is launched
+    `start_early` seconds before air with its duration extended to match,
+    or `warm_start` seconds early to check the stream before connecting.
+    """
+
+    def __init__(self, supervisor: RecordingSupervisor, now: Optional[float] = None):
+        self.supervisor = supervisor
+        now = time.time() if now is None else now
+        # Each show's most recent start that has been handled. Starts within
+        # MISSED_START_GRACE before now count as unhandled, so a show that
+        # came due just before a crash or restart is still launched late.
+        self.cursors = [now - MISSED_START_GRACE] * len(supervisor.shows)
+        self.stop_event = threading.Event()
+
+    def poll(self, now: float) -> float:
+        """Launch every show that is due at `now` and return when to wake next."""
+        wake_at = now + SCHEDULER_MAX_SLEEP
+        for i, show in enumerate(self.supervisor.shows):
+            start = next_start(show, self.cursors[i])
+            launch_at = start.timestamp() - max(show.start_early, show.warm_start)
+            if launch_at <= now:
+                self.cursors[i] = start.timestamp()
+                if now - launch_at <= MISSED_START_GRACE:
+                    self.supervisor.launch(
+                        dataclasses.replace(
+                            show,
+                            duration=show.duration + show.start_early,
+                            air_time=start.timestamp() - show.start_early
+                        ),
+                        scheduled_at=launch_at
+                    )
+                else:
+                    log_error(f"Missed {show.job_name} scheduled for {start.strftime('%Y-%m-%d %H:%M %Z')}")
+                start = next_start(show, self.cursors[i])
+                launch_at = start.timestamp() - max(show.start_early, show.warm_start)
+            wake_at = min(wake_at, launch_at)
+        return wake_at
+
+    def upcoming(self) -> List[tuple]:
+        """(start, show) for each show's next run, soonest first."""
+        return sorted(
+            ((next_start(show, cursor), show) for show, cursor in zip(self.supervisor.shows, self.cursors)),
+            key=lambda item: item[0]
+        )
+
+    def run_forever(self) -> None:
+        for start, show in self.upcoming():
+            log_info(
+                f"Scheduled {show.job_name} on {', '.join(day.title() for day in show.days)} "
+                f"at {show.time} Sydney time, next {start.strftime('%Y-%m-%d %H:%M %Z')}"
+            )
+        while not self.stop_event.is_set():
+            wake_at = self.poll(time.time())
+            # Cap the sleep so clock changes or suspends are noticed
+            self.stop_event.wait(min(max(wake_at - time.time(), 0), SCHEDULER_MAX_SLEEP))
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+def run_service(args) -> bool:
+    """Record every scheduled show until stopped."""
+    print_banner()
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    # Test Discord notifications on startup
+    test_discord_notification()
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT, METRICS_ADDR)
+        log_info(f"Metrics available at http://{METRICS_ADDR}:{METRICS_PORT}/metrics")
+
+    supervisor = RecordingSupervisor(load_shows(), load_max_concurrent())
+    log_info(
+        f"Supervisor managing {len(supervisor.shows)} show(s), "
+        f"at most {supervisor.max_concurrent} recording at once"
+    )
+    resumed = resume_interrupted_uploads()
+    if resumed:
+        log_info(f"Resuming {resumed} interrupted upload(s)")
+    upload_spool.start(idle=lambda: not supervisor.active_jobs())
+    start_orphaned_upload_reaper(threading.Event())
+
+    try:
+        RecordingScheduler(supervisor).run_forever()
+        return True
+    except Exception as e:
+        log_error(f"Scheduler error: {e}")
+        return False
+
+def record_now(args) -> bool:
+    """Record one show immediately, then publish it as a scheduled run would."""
+    shows = load_shows()
+    if args.show:
+        shows = [show for show in shows if args.show in (show.job_name, show.name)]
+        if not shows:
+            log_error(f"No show named {args.show} in {STATIONS_CONFIG}")
+            return False
+    show = shows[0]
+    if args.duration:
+        show = dataclasses.replace(show, duration=args.duration)
+    return main(show)
+
+def verify_file(args) -> bool:
+    """Check a recording's frames and, with --analyze, its levels and dead air."""
+    return verify_recording(args.file, args.duration) and (not args.analyze or check_dead_air(args.file))
+
+def upload_recording(args) -> bool:
+    """Upload a recording, optionally pointing a latest key at it, and index it."""
+    key = args.key or f"archive/{os.path.basename(args.file)}"
+    if not upload_to_s3(args.file, key):
+        return False
+    if args.latest and not upload_latest(key, args.latest):
+        return False
+    if is_recording_key(key):
+        index_recording(key)
+    return True
+
+def clip_recording(args) -> bool:
+    """Cut a time range out of an archived recording with ranged GETs."""
+    output = args.output or f"clip_{os.path.basename(os.path.splitext(args.key)[0])}_{args.start.replace(':', '')}{os.path.splitext(args.key)[1]}"
+    return extract_clip(args.key, parse_clock_time(args.start), parse_clock_time(args.end), output) is not None
+
+def drain_spool(args) -> bool:
+    """Retry every spooled upload once. False if any are still pending."""
+    resume_interrupted_uploads()
+    upload_spool.drain()
+    return not upload_spool.pending()
+
+def abort_uploads(args) -> bool:
+    """Abort unfinished multipart uploads that nothing here will resume."""
+    log_info(f"Aborted {abort_orphaned_uploads(args.max_age)} orphaned multipart upload(s)")
+    return True
+
+# Subcommand -> handler; each imports only what its work needs
+COMMANDS = {
+    "run": run_service,
+    "record-now": record_now,
+    "verify": verify_file,
+    "upload": upload_recording,
+    "clip": clip_recording,
+    "drain": drain_spool,
+    "abort-uploads": abort_uploads,
+    "rebuild-index": lambda args: rebuild_archive_index(args.prefix),
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Record radio shows and archive them to object storage.")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("run", help="record every scheduled show (the default)")
+    record_parser = subcommands.add_parser("record-now", help="record a show now and publish it")
+    record_parser.add_argument("show", nargs="?", help="station/show or show name (default: the first configured show)")
+    record_parser.add_argument("--duration", type=int, help="seconds to record instead of the show's duration")
+    verify_parser = subcommands.add_parser("verify", help="check a recording's audio frames")
+    verify_parser.add_argument("file")
+    verify_parser.add_argument("--duration", type=float, help="expected duration in seconds")
+    verify_parser.add_argument("--analyze", action="store_true", help="also measure levels and dead air")
+    upload_parser = subcommands.add_parser("upload", help="upload a recording to the bucket")
+    upload_parser.add_argument("file")
+    upload_parser.add_argument("--key", help="object key (default: archive/<file name>)")
+    upload_parser.add_argument("--latest", help="also copy it to this key, e.g. latest.mp3")
+    clip_parser = subcommands.add_parser("clip", help="cut a time range out of an archived recording")
+    clip_parser.add_argument("key", help="the recording's object key, e.g. archive/show_2024-01-03_22-00-00.mp3")
+    clip_parser.add_argument("start", help="start time, in seconds or [h:]mm:ss")
+    clip_parser.add_argument("end", help="end time, in seconds or [h:]mm:ss")
+    clip_parser.add_argument("-o", "--output", help="file to write (default: clip_<name>_<start> in the current directory)")
+    subcommands.add_parser("drain", help="retry every spooled upload once, including interrupted ones")
+    abort_parser = subcommands.add_parser("abort-uploads", help="abort orphaned multipart uploads in the bucket")
+    abort_parser.add_argument("--max-age", type=float, default=ORPHANED_UPLOAD_MAX_AGE,
+                              help="only uploads started more than this many seconds ago")
+    rebuild_parser = subcommands.add_parser("rebuild-index", help=f"rebuild {ARCHIVE_INDEX_KEY} from a bucket listing")
+    rebuild_parser.add_argument("--prefix", default="archive/", help="key prefix holding the recordings")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    ok = COMMANDS[args.command or "run"](args)
+    notification_dispatcher.flush()
+    sys.exit(0 if ok else 1)
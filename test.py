@@ -5,21 +5,51 @@ import os
 import boto3
 import logging
 import datetime
+import io
+import sys
 import json
-from unittest.mock import patch, MagicMock, mock_open
+import dataclasses
+import hashlib
+import base64
+import struct
+import numpy as np
+import tempfile
+import urllib.request
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, MagicMock, mock_open, ANY
 from main import (
     verify_recording,
     upload_to_s3,
     cleanup_local_file,
     record_stream,
+    record_stream_to_s3,
     send_discord_notification,
     upload_latest,
     MIN_FILE_SIZE,
     retry_decorator,
     log_info,
     log_error,
-    log_success
+    log_success,
+    load_shows,
+    RecordingSupervisor,
+    Show,
+    FFmpegResult,
+    plan_recording,
+    build_record_command,
+    record_segments,
+    stitch_segments_in_s3,
+    TRANSCODE_PLAN,
+    NotificationDispatcher,
+    next_start,
+    RecordingScheduler,
+    prepare_ingest,
+    pre_roll_trim,
+    resolve_stream,
+    fail_over
 )
+import main
 
 class TestStreamSeed(unittest.TestCase):
     def setUp(self):
@@ -42,13 +72,40 @@ class TestStreamSeed(unittest.TestCase):
         if os.path.exists(self.test_dir):
             os.rmdir(self.test_dir)
 
+    def write_mp3_frames(self, path, frames, garbage=b"", tail=b""):
+        """Write MPEG-1 Layer III frames, 128 kbps at 44.1 kHz (417 bytes, 1152 samples each)"""
+        frame = b"\xff\xfb\x90\x00" + b"\x00" * 413
+        with open(path, 'wb') as f:
+            f.write(frame * (frames // 2) + garbage + frame * (frames - frames // 2) + tail)
+
+    @patch('main.log_info')
     @patch('main.log_error')
-    def test_verify_recording(self, mock_log_error):
+    def test_verify_recording(self, mock_log_error, mock_log_info):
         """Test recording verification"""
-        # Test valid file
-        self.assertTrue(verify_recording(self.test_file))
+        # Test valid file: 2600 frames is 67.9s of audio
+        valid_file = os.path.join(self.test_dir, "valid.mp3")
+        self.write_mp3_frames(valid_file, 2600)
+        self.assertTrue(verify_recording(valid_file, expected_duration=120))
         mock_log_error.assert_not_called()
-        
+        mock_log_info.assert_called_with(
+            f"Verified {valid_file}: 67.9s in 2600 frames, CBR 128 kbps, "
+            f"0 sync losses (0 bytes skipped), 0 bytes truncated at the end"
+        )
+
+        # Test a recording that stopped well short of its show
+        self.assertFalse(verify_recording(valid_file, expected_duration=7200))
+        mock_log_error.assert_called_with(f"Recording too short (68s of 7200s expected): {valid_file}")
+
+        # Test corruption mid-file and a cut-off last frame are reported
+        self.write_mp3_frames(valid_file, 2600, garbage=b"\xff\x00" * 50, tail=b"\xff\xfb\x90\x00" + b"\x00" * 100)
+        scan = main.scan_audio_frames(valid_file)
+        self.assertEqual((scan.frames, scan.sync_losses, scan.skipped_bytes, scan.truncated_bytes), (2600, 1, 100, 104))
+        os.remove(valid_file)
+
+        # Test a file of the right size that isn't audio
+        self.assertFalse(verify_recording(self.test_file))
+        mock_log_error.assert_called_with(f"Recording has no audio frames: {self.test_file}")
+
         # Test non-existent file
         self.assertFalse(verify_recording("nonexistent.mp3"))
         mock_log_error.assert_called_with("Recording file not found: nonexistent.mp3")
@@ -63,33 +120,55 @@ class TestStreamSeed(unittest.TestCase):
         
         os.remove(small_file)
 
-    @patch('boto3.session.Session.client')
+    @patch('main.s3_client')
     @patch('main.log_info')
     @patch('main.log_error')
-    def test_upload_to_s3(self, mock_log_error, mock_log_info, mock_s3_client):
+    def test_upload_to_s3(self, mock_log_error, mock_log_info, mock_client):
         """Test S3 upload functionality"""
-        mock_client = MagicMock()
-        mock_s3_client.return_value = mock_client
-
-        # Test successful upload
-        mock_client.put_object.return_value = {'ResponseMetadata': {'HTTPStatusCode': 200}}
-        
         # Mock the retry decorator to only try once
         with patch('main.retry_decorator', lambda *args, **kwargs: lambda func: func):
             # Test successful upload
             self.assertTrue(upload_to_s3(self.test_file, "test.mp3"))
-            mock_log_info.assert_called_with(f"Uploaded {self.test_file} to Vultr Object Storage as test.mp3")
+            mock_client.upload_file.assert_called_once_with(
+                self.test_file, ANY, "test.mp3",
+                ExtraArgs={'ACL': 'public-read', 'ContentType': 'audio/mpeg'}, Config=ANY, Callback=ANY
+            )
+            message = mock_log_info.call_args[0][0]
+            self.assertTrue(message.startswith(f"Uploaded {self.test_file} to Vultr Object Storage as test.mp3"))
+            self.assertIn("MB/s", message)
             
             # Reset mocks for next test
-            mock_client.put_object.reset_mock()
+            mock_client.upload_file.reset_mock()
             mock_log_error.reset_mock()
             mock_log_info.reset_mock()
             
             # Test failed upload
-            mock_client.put_object.side_effect = Exception("Upload failed")
+            mock_client.upload_file.side_effect = Exception("Upload failed")
             self.assertFalse(upload_to_s3(self.test_file, "test.mp3"))
             mock_log_error.assert_called_with(f"Error uploading {self.test_file}: Upload failed")
 
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_upload_reuses_capture_digests(self, mock_log_error, mock_log_info, mock_client):
+        """Test saved checksums become metadata and are checked against the ETag"""
+        digest = main.CaptureDigest()
+        with open(self.test_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(300000), b""):
+                digest.update(chunk)
+        digests = digest.result()
+        main.save_digests(self.test_file, digests)
+        try:
+            mock_client.head_object.return_value = {'ETag': f'"{digests.md5}"'}
+            self.assertTrue(upload_to_s3(self.test_file, "test.mp3"))
+            self.assertEqual(mock_client.upload_file.call_args.kwargs['ExtraArgs']['Metadata'], digests.metadata())
+
+            mock_client.head_object.return_value = {'ETag': '"corrupt"'}
+            self.assertFalse(upload_to_s3(self.test_file, "test.mp3"))
+            self.assertIn("does not match captured checksum", mock_log_error.call_args[0][0])
+        finally:
+            os.remove(self.test_file + main.DIGEST_SIDECAR_SUFFIX)
+
     @patch('main.log_info')
     @patch('main.log_error')
     def test_cleanup_local_file(self, mock_log_error, mock_log_info):
@@ -137,33 +216,1260 @@ class TestStreamSeed(unittest.TestCase):
             self.assertFalse(send_discord_notification("Test info", "info"))
             self.assertFalse(send_discord_notification("Test error", "error"))
 
-    @patch('subprocess.run')
+    def test_notification_dispatcher_batches(self):
+        """Test bursts are coalesced into multi-embed messages on one session"""
+        dispatcher = NotificationDispatcher(batch_window=5)
+        dispatcher.session = MagicMock()
+        dispatcher.session.post.return_value = MagicMock(status_code=204)
+
+        with patch('main.NOTIFICATION_LEVEL', 'all'), \
+             patch('main.DISCORD_WEBHOOK_URL', 'https://fake-webhook.url'):
+            for i in range(12):
+                dispatcher.submit(f"Message {i}", "info")
+            dispatcher.submit("Message 0", "info")  # Repeats are counted, not resent
+            self.assertTrue(dispatcher.flush(timeout=5))
+
+        payloads = [c.kwargs['json'] for c in dispatcher.session.post.call_args_list]
+        self.assertEqual([len(p['embeds']) for p in payloads], [10, 2])
+        self.assertTrue(payloads[0]['embeds'][0]['title'].endswith("(x2)"))
+
+    def test_notification_dispatcher_coalesces_bursts(self):
+        """Test messages trickling in within the batch window go out as one message"""
+        dispatcher = NotificationDispatcher(batch_window=1)
+        dispatcher.session = MagicMock()
+        dispatcher.session.post.return_value = MagicMock(status_code=204)
+
+        with patch('main.NOTIFICATION_LEVEL', 'all'), \
+             patch('main.DISCORD_WEBHOOK_URL', 'https://fake-webhook.url'):
+            for i in range(6):
+                dispatcher.submit(f"Message {i}", "info")
+                time.sleep(0.1)
+            time.sleep(1.5)
+            self.assertTrue(dispatcher.flush(timeout=5))
+
+        payloads = [c.kwargs['json'] for c in dispatcher.session.post.call_args_list]
+        self.assertEqual([len(p['embeds']) for p in payloads], [6])
+
+    def test_notification_dispatcher_priority(self):
+        """Test a full queue drops or merges lower-priority notifications first"""
+        dispatcher = NotificationDispatcher(max_queue=2, batch_window=5)
+        dispatcher._ensure_started = lambda: None  # Inspect the queue without sending
+
+        with patch('main.NOTIFICATION_LEVEL', 'all'), \
+             patch('main.DISCORD_WEBHOOK_URL', 'https://fake-webhook.url'):
+            dispatcher.submit("info 1", "info")
+            dispatcher.submit("info 2", "info")
+            dispatcher.submit("error 1", "error")  # Evicts the oldest info
+            dispatcher.submit("info 3", "info")  # Merged into the remaining info
+            dispatcher.submit("error 2", "error")  # Evicts the merged info
+
+        self.assertEqual([(n.level, n.message) for n in dispatcher.pending], [
+            ("error", "error 1"), ("error", "error 2")
+        ])
+        self.assertEqual(dispatcher.dropped, 2)
+
+    @patch('main.run_ffmpeg')
     @patch('main.log_info')
     @patch('main.log_error')
     def test_record_stream(self, mock_log_error, mock_log_info, mock_run):
         """Test stream recording"""
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        expected_output = os.path.join("recordings", f"show_{timestamp}.mp3")
+        expected_output = os.path.join(main.OUTPUT_DIR, f"show_{timestamp}.mp3")
+
+        def fake_run(command, stdout_handler=None, **kwargs):
+            stdout_handler(MagicMock(stdout=io.BytesIO(b'audio')))
+            return returned
 
-        # Test successful recording
-        mock_run.return_value = MagicMock(returncode=0)
+        # Test successful recording; checksums are taken from the piped audio
+        returned = FFmpegResult(returncode=0, stderr="", cpu_seconds=12.5)
+        mock_run.side_effect = fake_run
         result = record_stream()
         self.assertEqual(result, expected_output)
         mock_log_info.assert_any_call(f"Recording started: {expected_output}")
-        mock_log_info.assert_any_call(f"Recording finished: {expected_output}")
+        mock_log_info.assert_any_call(f"Recording finished: {expected_output} (libmp3lame, CPU 12.5s)")
+        self.assertIn("libmp3lame", mock_run.call_args[0][0])
+        self.assertEqual(mock_run.call_args[0][0][-1], "pipe:1")
+        # Progress is keyed by show and path; another station airing now writes the same file name
+        self.assertEqual(mock_run.call_args.kwargs['progress_key'], f"default/show:{expected_output}")
+        other = Show(station="other", name="show", url="https://example.com/live")
+        self.assertNotEqual(main.progress_key_for(other, expected_output), mock_run.call_args.kwargs['progress_key'])
+        digests = main.load_digests(result)
+        os.remove(result)
+        os.remove(result + main.DIGEST_SIDECAR_SUFFIX)
+        self.assertEqual(digests.sha256, "6ed8919ce20490a5e3ad8630a4fab69475297abd07db73918dd5f36fcfaeb11b")
+        self.assertEqual(digests.md5, "a5ca0b5894324f8bb54bb9fffad29d1e")
 
         # Test failed recording
-        mock_run.return_value = MagicMock(returncode=1, stderr="FFmpeg error")
+        returned = FFmpegResult(returncode=1, stderr="FFmpeg error")
         result = record_stream()
         self.assertIsNone(result)
         mock_log_error.assert_called_with("Recording failed: FFmpeg error")
 
+    def test_run_ffmpeg_progress(self):
+        """Test ffmpeg stderr is parsed incrementally with a bounded tail"""
+        script = (
+            "import sys, time\n"
+            "for i in range(80):\n"
+            "    sys.stderr.write(f'[info] line {i}\\n')\n"
+            "sys.stderr.write('[mp3 @ 0x1] [warning] Skipping 2 bytes\\n')\n"
+            "sys.stderr.write('[info] size=     512KiB time=00:00:32.65 bitrate= 128.4kbits/s speed=1.01x    \\r')\n"
+            "sys.stderr.flush()\n"
+            "time.sleep(0.5)\n"
+            "sys.stderr.write('[http @ 0x2] [error] Connection reset\\n')\n"
+        )
+        seen = {}
+
+        def poll():
+            # Progress is published while the process is still running
+            while "live" not in seen:
+                live = main.recording_progress().get("live")
+                if live and live["bytes_written"]:
+                    seen["live"] = live
+                threading.Event().wait(0.01)
+
+        watcher = threading.Thread(target=poll, daemon=True)
+        watcher.start()
+        result = main.run_ffmpeg([sys.executable, "-c", script], progress_key="live")
+        watcher.join(5)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(seen["live"]["bytes_written"], 512 * 1024)
+        self.assertAlmostEqual(seen["live"]["elapsed_seconds"], 32.65)
+        self.assertEqual(seen["live"]["speed"], 1.01)
+        self.assertEqual(result.progress.warnings, 1)
+        self.assertEqual(result.progress.errors, 1)
+        self.assertEqual(len(result.stderr.splitlines()), main.FFMPEG_STDERR_TAIL)
+        self.assertTrue(result.stderr.endswith("[error] Connection reset"))
+        self.assertNotIn("live", main.recording_progress())
+
+    @patch('main.probe_stream_codec')
+    @patch('main.log_info')
+    def test_plan_recording(self, mock_log_info, mock_probe):
+        """Test codec-copy planning only re-encodes when required"""
+        show = Show(station="s", name="n", url="https://example.com/stream", mode="copy")
+
+        mock_probe.return_value = "aac"
+        plan = plan_recording(show)
+        self.assertTrue(plan.copy)
+        self.assertEqual((plan.muxer, plan.extension), ("adts", ".aac"))
+        command = build_record_command("out.aac", show, plan)
+        self.assertIn("copy", command)
+        self.assertNotIn("libmp3lame", command)
+
+        # An MP3-only archive must re-encode AAC, but can copy an MP3 source
+        show.format = "mp3"
+        self.assertFalse(plan_recording(show).copy)
+        mock_probe.return_value = "mp3"
+        self.assertTrue(plan_recording(show).copy)
+
+        # Unknown codecs and transcode mode fall back to libmp3lame
+        mock_probe.return_value = None
+        self.assertFalse(plan_recording(show).copy)
+        show.mode = "transcode"
+        mock_probe.reset_mock()
+        self.assertFalse(plan_recording(show).copy)
+        mock_probe.assert_not_called()
+
+        # Re-encoding can't honour a non-MP3 format, so it says so; unknown formats are rejected
+        show.format = "aac"
+        with patch('main.log_error') as mock_log_error:
+            self.assertEqual(plan_recording(show).extension, ".mp3")
+        self.assertIn("requires aac", mock_log_error.call_args[0][0])
+        self.assertEqual(main.parse_format(" FLAC "), "flac")
+        with self.assertRaises(ValueError):
+            main.parse_format("wav")
+
+    @patch('main.MULTIPART_PART_SIZE', 4)
+    @patch('main.s3_client')
+    @patch('subprocess.Popen')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_record_stream_to_s3(self, mock_log_error, mock_log_info, mock_popen, mock_client):
+        """Test streaming a recording into a multipart upload"""
+        mock_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_client.upload_part.side_effect = lambda **kwargs: {'ETag': f"etag-{kwargs['PartNumber']}"}
+        part_md5s = [hashlib.md5(part).digest() for part in (b'0123', b'4567', b'89')]
+        mock_client.complete_multipart_upload.return_value = {
+            'ETag': f'"{hashlib.md5(b"".join(part_md5s)).hexdigest()}-3"'
+        }
+
+        # Test successful recording: 10 bytes become parts of 4, 4 and 2 bytes
+        mock_popen.return_value = MagicMock(stdout=io.BytesIO(b'0123456789'), stderr=io.BytesIO(b''))
+        mock_popen.return_value.wait.return_value = 0
+        self.assertTrue(record_stream_to_s3("archive/test.mp3"))
+        bodies = [c.kwargs['Body'].getvalue() for c in mock_client.upload_part.call_args_list]
+        self.assertEqual(bodies, [b'0123', b'4567', b'89'])
+        self.assertEqual(
+            [c.kwargs['ContentMD5'] for c in mock_client.upload_part.call_args_list],
+            [base64.b64encode(md5).decode() for md5 in part_md5s]
+        )
+        mock_client.complete_multipart_upload.assert_called_once_with(
+            Bucket=ANY, Key="archive/test.mp3", UploadId='upload-1',
+            MultipartUpload={'Parts': [
+                {'PartNumber': 1, 'ETag': 'etag-1'},
+                {'PartNumber': 2, 'ETag': 'etag-2'},
+                {'PartNumber': 3, 'ETag': 'etag-3'},
+            ]}
+        )
+        mock_client.abort_multipart_upload.assert_not_called()
+        self.assertEqual(mock_client.copy_object.call_args.kwargs['Metadata'], {
+            'sha256': hashlib.sha256(b'0123456789').hexdigest(),
+            'md5': hashlib.md5(b'0123456789').hexdigest(),
+        })
+
+        # Test failed recording aborts the multipart upload
+        mock_popen.return_value = MagicMock(stdout=io.BytesIO(b'0123'), stderr=io.BytesIO(b''))
+        mock_popen.return_value.wait.return_value = 1
+        self.assertFalse(record_stream_to_s3("archive/test.mp3"))
+        mock_client.abort_multipart_upload.assert_called_once_with(
+            Bucket=ANY, Key="archive/test.mp3", UploadId='upload-1'
+        )
+
+    @patch('time.sleep')
     @patch('main.upload_to_s3')
-    def test_upload_latest(self, mock_upload):
-        """Test upload_latest functionality"""
+    @patch('main.run_ffmpeg')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_record_segments(self, mock_log_error, mock_log_info, mock_run, mock_upload, mock_sleep):
+        """Test segmented capture restarts ffmpeg and records the gap"""
+        show = Show(station="s", name="n", url="https://example.com/stream",
+                    duration=2, output_dir=self.test_dir)
+        segment_dir = os.path.join(self.test_dir, "show_x.segments")
         mock_upload.return_value = True
-        upload_latest(self.test_file)
-        mock_upload.assert_called_once_with(self.test_file, "latest.mp3")
+
+        def fake_run(command, **kwargs):
+            # Each run writes one segment and appends it to ffmpeg's CSV list
+            index = int(command[command.index("-segment_start_number") + 1])
+            filename = f"show_x_{index:05d}.mp3"
+            with open(os.path.join(segment_dir, filename), 'wb') as f:
+                f.write(b'0' * 100)
+            with open(os.path.join(segment_dir, "segments.csv"), 'a') as f:
+                f.write(f"{filename},0.000000,0.500000\n")
+            if index == 0:
+                return FFmpegResult(returncode=1, stderr="Connection reset")
+            threading.Event().wait(float(command[command.index("-t") + 1]))
+            return FFmpegResult(returncode=0, stderr="")
+
+        mock_run.side_effect = fake_run
+        try:
+            capture = record_segments(show, TRANSCODE_PLAN, "show_x")
+        finally:
+            for name in os.listdir(segment_dir):
+                os.remove(os.path.join(segment_dir, name))
+            os.rmdir(segment_dir)
+
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertEqual([segment.key for segment in capture.segments], [
+            "archive/segments/show_x/show_x_00000.mp3",
+            "archive/segments/show_x/show_x_00001.mp3",
+        ])
+        self.assertTrue(all(segment.uploaded for segment in capture.segments))
+        self.assertEqual(capture.recorded_duration, 1.0)
+        self.assertEqual(capture.lost_seconds, 1.0)
+        self.assertGreaterEqual(len(capture.gaps), 1)
+        self.assertIn("gaps", capture.manifest())
+
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    def test_stitch_segments_in_s3(self, mock_log_info, mock_client):
+        """Test server-side stitching of uploaded segments"""
+        mock_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+        mock_client.upload_part_copy.return_value = {'CopyPartResult': {'ETag': 'etag'}}
+        capture = main.SegmentedCapture("show_x", self.test_dir, 1200)
+        capture.segments = [
+            main.Segment(0, "a.mp3", 0, 600, main.S3_MIN_PART_SIZE, "seg/a.mp3", True),
+            main.Segment(1, "b.mp3", 600, 600, 1000, "seg/b.mp3", True),
+        ]
+        self.assertTrue(stitch_segments_in_s3(capture, "archive/show_x.mp3", "audio/mpeg", {"sha256": "abc"}))
+        self.assertEqual(mock_client.upload_part_copy.call_count, 2)
+        mock_client.complete_multipart_upload.assert_called_once()
+        self.assertEqual(mock_client.create_multipart_upload.call_args.kwargs['Metadata'], {"sha256": "abc"})
+
+        # The joined file gets the checksums an upload would carry, taken while joining
+        for segment, content in zip(capture.segments, (b"first", b"second")):
+            segment.path = os.path.join(self.test_dir, segment.path)
+            with open(segment.path, 'wb') as f:
+                f.write(content)
+        joined = main.concatenate_segments(capture, os.path.join(self.test_dir, "show_x.mp3"))
+        self.assertEqual(main.recording_metadata(joined), {
+            "sha256": hashlib.sha256(b"firstsecond").hexdigest(), "md5": hashlib.md5(b"firstsecond").hexdigest()
+        })
+
+        # A ReplayGain tag appended to the joined file goes up with the last segment instead of its copy
+        mock_client.reset_mock()
+        mock_client.upload_part.return_value = {'ETag': 'tagged'}
+        tag = main.build_replaygain_tag(main.AudioAnalysis(1200, -20.0, -1.0, [], -20.0, 5.0, -1.0))
+        self.assertTrue(stitch_segments_in_s3(capture, "archive/show_x.mp3", "audio/mpeg", trailer=tag))
+        self.assertEqual(mock_client.upload_part_copy.call_count, 1)
+        self.assertEqual(mock_client.upload_part.call_args.kwargs['Body'].getvalue(), b"second" + tag)
+        self.assertEqual(mock_client.complete_multipart_upload.call_args.kwargs['MultipartUpload']['Parts'][-1],
+                         {'PartNumber': 2, 'ETag': 'tagged'})
+        for path in (joined, joined + main.DIGEST_SIDECAR_SUFFIX, *(segment.path for segment in capture.segments)):
+            os.remove(path)
+
+        # A short segment in the middle can't be a multipart part
+        capture.segments.reverse()
+        mock_client.reset_mock()
+        self.assertFalse(stitch_segments_in_s3(capture, "archive/show_x.mp3", "audio/mpeg"))
+        mock_client.create_multipart_upload.assert_not_called()
+
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    def test_upload_latest(self, mock_log_info, mock_client):
+        """Test upload_latest functionality"""
+        self.assertTrue(upload_latest("archive/test.mp3"))
+        mock_client.copy_object.assert_called_once_with(
+            Bucket=ANY, Key="latest.mp3",
+            CopySource={'Bucket': ANY, 'Key': "archive/test.mp3"},
+            ACL='public-read'
+        )
+        mock_client.put_object.assert_not_called()
+        mock_client.upload_file.assert_not_called()
+
+    def test_load_shows(self):
+        """Test loading stations and shows from the config file"""
+        config = {
+            "stations": [{
+                "name": "dnr",
+                "url": "https://example.com/dnr",
+                "shows": [
+                    {"name": "night", "day": "Wednesday", "time": "22:00", "duration": 60},
+                    {"name": "morning", "days": ["friday", "Saturday"], "time": "08:30",
+                     "url": "https://example.com/alt", "key_prefix": "shows/morning"}
+                ]
+            }]
+        }
+        with tempfile.NamedTemporaryFile('w', suffix=".json", delete=False) as f:
+            json.dump(config, f)
+        try:
+            night, morning = load_shows(f.name)
+        finally:
+            os.remove(f.name)
+
+        self.assertEqual(night.url, "https://example.com/dnr")
+        self.assertEqual(night.days, ("wednesday",))
+        self.assertEqual(night.duration, 60)
+        self.assertEqual(night.key_prefix, "archive/dnr/")
+        self.assertEqual(morning.url, "https://example.com/alt")
+        self.assertEqual(morning.days, ("friday", "saturday"))
+        self.assertEqual(morning.key_prefix, "shows/morning/")
+        self.assertNotEqual(night.output_dir, morning.output_dir)
+
+        # Without a config file the single default show is recorded
+        default, = load_shows("nonexistent.json")
+        self.assertEqual(default.key_prefix, "archive/")
+        self.assertEqual(default.latest_key, "latest.mp3")
+
+    def test_next_start_follows_daylight_saving(self):
+        """Test start times are recomputed in Sydney time across DST changes"""
+        show = Show(station="s", name="n", url="u", days=("wednesday",), time="22:00")
+        sydney = main.sydney_tz()
+
+        # Daylight saving starts on Sunday 4 October 2026
+        before = next_start(show, sydney.localize(datetime.datetime(2026, 9, 28)).timestamp())
+        after = next_start(show, before.timestamp())
+        utc = datetime.timezone.utc
+        self.assertEqual(before.astimezone(utc), datetime.datetime(2026, 9, 30, 12, 0, tzinfo=utc))
+        self.assertEqual(after.astimezone(utc), datetime.datetime(2026, 10, 7, 11, 0, tzinfo=utc))
+        self.assertEqual(after.strftime("%A %H:%M"), "Wednesday 22:00")
+
+        # A time skipped by the clock change moves past the gap
+        show = Show(station="s", name="n", url="u", days=("sunday",), time="02:30")
+        start = next_start(show, sydney.localize(datetime.datetime(2026, 10, 3)).timestamp())
+        self.assertEqual(start.strftime("%Y-%m-%d %H:%M"), "2026-10-04 03:30")
+
+    def test_scheduler_launches_early_and_precisely(self):
+        """Test the scheduler wakes exactly at the next start, minus the pre-roll"""
+        show = Show(station="s", name="n", url="u", days=("wednesday",), time="22:00",
+                    duration=3600, start_early=30)
+        supervisor = MagicMock(shows=[show])
+        start = main.sydney_tz().localize(datetime.datetime(2026, 10, 7, 22, 0)).timestamp()
+        scheduler = RecordingScheduler(supervisor, now=start - 3 * 86400)
+
+        # Far from air time, sleep no longer than the recompute interval
+        now = start - 3 * 86400
+        self.assertEqual(scheduler.poll(now), now + main.SCHEDULER_MAX_SLEEP)
+        # Close to air time, wake at the pre-roll
+        self.assertEqual(scheduler.poll(start - 100), start - 30)
+        supervisor.launch.assert_not_called()
+
+        next_wake = scheduler.poll(start - 30)
+        launched, = supervisor.launch.call_args_list
+        self.assertEqual(launched.args[0].duration, 3630)
+        self.assertEqual(launched.kwargs["scheduled_at"], start - 30)
+        self.assertGreater(next_wake, start)
+
+        # The same start is never launched twice
+        scheduler.poll(start - 29)
+        self.assertEqual(supervisor.launch.call_count, 1)
+
+    @patch('main.log_error')
+    def test_scheduler_launches_late_after_restart(self, mock_log_error):
+        """Test a restart shortly after a show came due still launches it, but not one long gone"""
+        show = Show(station="s", name="n", url="u", days=("wednesday",), time="22:00", duration=3600)
+        start = main.sydney_tz().localize(datetime.datetime(2026, 10, 7, 22, 0)).timestamp()
+
+        supervisor = MagicMock(shows=[show])
+        scheduler = RecordingScheduler(supervisor, now=start + 20)
+        scheduler.poll(start + 20)
+        launched, = supervisor.launch.call_args_list
+        self.assertEqual(launched.kwargs["scheduled_at"], start)
+        mock_log_error.assert_not_called()
+
+        supervisor = MagicMock(shows=[show])
+        scheduler = RecordingScheduler(supervisor, now=start + main.MISSED_START_GRACE + 60)
+        scheduler.poll(start + main.MISSED_START_GRACE + 60)
+        supervisor.launch.assert_not_called()
+
+    @patch('main.main')
+    def test_supervisor_runs_shows_concurrently(self, mock_main):
+        """Test the supervisor runs jobs in parallel up to its cap"""
+        release = threading.Event()
+        running = []
+        lock = threading.Lock()
+
+        def fake_main(show):
+            with main.capture_slot():
+                with lock:
+                    running.append(show.name)
+                release.wait(5)
+            return show.name != "bad"
+
+        mock_main.side_effect = fake_main
+        shows = [Show(station="s", name=name, url="u") for name in ("a", "b", "bad")]
+        supervisor = RecordingSupervisor(shows, max_concurrent=2)
+        jobs = [supervisor.launch(show) for show in shows]
+
+        # Launching never blocks, but only two jobs may record at once
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=5)
+        while len(running) < 2 and datetime.datetime.now() < deadline:
+            threading.Event().wait(0.01)
+        self.assertEqual(len(running), 2)
+        self.assertEqual([job.state for job in jobs].count("waiting"), 1)
+
+        release.set()
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=5)
+        while supervisor.active_jobs() and datetime.datetime.now() < deadline:
+            threading.Event().wait(0.01)
+        states = {job["show"]["name"]: job["state"] for job in supervisor.status()}
+        self.assertEqual(states, {"a": "done", "b": "done", "bad": "failed"})
+
+    @patch('main.main')
+    def test_supervisor_slots_cover_capture_only(self, mock_main):
+        """Test a show that is due starts recording while an earlier one is still uploading"""
+        uploading = threading.Event()
+        finish_upload = threading.Event()
+
+        def fake_main(show):
+            with main.capture_slot():
+                pass
+            if show.name == "early":
+                uploading.set()
+                finish_upload.wait(5)
+            return True
+
+        mock_main.side_effect = fake_main
+        shows = [Show(station="s", name=name, url="u") for name in ("early", "due")]
+        supervisor = RecordingSupervisor(shows, max_concurrent=1)
+        early = supervisor.launch(shows[0])
+        self.assertTrue(uploading.wait(5))
+        self.assertEqual(early.state, "processing")
+
+        # The slot was handed back when the capture ended, so the next show isn't held up
+        due = supervisor.launch(shows[1])
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=5)
+        while due.state != "done" and datetime.datetime.now() < deadline:
+            threading.Event().wait(0.01)
+        self.assertEqual((early.state, due.state), ("processing", "done"))
+        self.assertIn(early, supervisor.active_jobs())
+
+        finish_upload.set()
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=5)
+        while supervisor.active_jobs() and datetime.datetime.now() < deadline:
+            threading.Event().wait(0.01)
+        self.assertEqual(early.state, "done")
+
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    def test_metrics_endpoint(self, mock_log_info, mock_client):
+        """Test a local scrape of the Prometheus metrics endpoint"""
+        with patch('main.retry_decorator', lambda *args, **kwargs: lambda func: func):
+            upload_to_s3(self.test_file, "test.mp3")
+        main.metrics.inc("streamseed_retries_total", function='upload"part')
+        with main.active_recordings_lock:
+            main.active_recordings["show_x.mp3"] = main.FFmpegProgress(bytes_written=2048, speed=1.5)
+
+        server = main.start_metrics_server(0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                self.assertIn("text/plain", response.headers["Content-Type"])
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+            with main.active_recordings_lock:
+                main.active_recordings.pop("show_x.mp3")
+
+        self.assertIn("# TYPE streamseed_upload_duration_seconds summary", body)
+        self.assertIn("streamseed_upload_duration_seconds_count ", body)
+        self.assertIn("streamseed_upload_throughput_bytes_per_second ", body)
+        self.assertIn('streamseed_retries_total{function="upload\\"part"} 1', body)
+        self.assertIn("streamseed_recordings_in_progress 1", body)
+        self.assertIn('streamseed_recording_bytes{recording="show_x.mp3"} 2048', body)
+        self.assertIn('streamseed_recording_speed{recording="show_x.mp3"} 1.5', body)
+
+    def test_prepare_ingest(self):
+        """Test the warm start check against a local redirecting stream"""
+        class StreamHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/live":
+                    self.send_response(302)
+                    self.send_header("Location", "/mirror/live")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("icy-br", "128")
+                self.end_headers()
+                self.wfile.write(b"\xff" * 64000)  # 4s burst at 128kbps
+                for _ in range(5):
+                    time.sleep(0.1)
+                    self.wfile.write(b"\xff" * 1600)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            check = prepare_ingest(f"http://127.0.0.1:{server.server_address[1]}/live", probe_seconds=0.3)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertTrue(check.url.endswith("/mirror/live"))
+        self.assertEqual(check.bitrate_kbps, 128)
+        self.assertAlmostEqual(check.burst_seconds, 3.8, delta=0.5)
+        self.assertLessEqual(check.dns_seconds, check.first_byte_seconds)
+
+    def test_warm_start_trims_pre_roll(self):
+        """Test the pre-roll trim and the measured start offset"""
+        now = 1_700_000_000.0
+        show = Show(station="s", name="n", url="http://example.com/live", warm_start=60,
+                    air_time=now + 10, ingest_latency=1.5)
+        with patch('main.time.time', return_value=now):
+            self.assertAlmostEqual(pre_roll_trim(show), 8.5)
+            command = build_record_command("out.mp3", show=show)
+        self.assertIn("-probesize", command)
+        self.assertEqual(command[command.index("-ss") + 1], "8.500")
+        self.assertLess(command.index("-i"), command.index("-ss"))
+        self.assertEqual(pre_roll_trim(Show(station="s", name="n", url="u", air_time=now + 10)), 0)
+
+        progress = main.FFmpegProgress()
+        for i in range(20):
+            with patch('main.time.time', return_value=now + 10.2 + i):
+                progress.feed_line(f"size=  {i}kB time=00:00:{i:02d}.00 bitrate= 128.0kbits/s speed=1x")
+        self.assertEqual(progress.bytes_written, 19 * 1024)  # Builds before 6.1 spell KiB "kB"
+        result = FFmpegResult(0, "", progress=progress)
+        self.assertEqual(main.report_start_offset(show, result), ", start offset +0.20s")
+
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_resolve_stream_ranks_mirrors(self, mock_log_error, mock_log_info):
+        """Test streamtheworld resolution, caching and mirror ranking against local stand-ins"""
+        api_requests = []
+
+        class MirrorHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                port = self.server.server_address[1]
+                if self.path.startswith("/api"):
+                    api_requests.append(self.path)
+                    body = (
+                        '<live_stream_config xmlns="http://provisioning.streamtheworld.com/player/livestream-1.9">'
+                        '<mountpoints><mountpoint><servers>'
+                        f'<server><ip>127.0.0.1</ip><ports><port type="http">{slow.server_address[1]}</port></ports></server>'
+                        f'<server><ip>127.0.0.1</ip><ports><port type="http">{fast.server_address[1]}</port></ports></server>'
+                        '</servers></mountpoint></mountpoints></live_stream_config>'
+                    ).encode()
+                    self.send_response(200)
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.end_headers()
+                if port == slow.server_address[1]:
+                    time.sleep(0.5)  # Stalls before its first byte
+                self.wfile.write(b"\xff" * 4096)
+
+            def log_message(self, *args):
+                pass
+
+        fast = ThreadingHTTPServer(("127.0.0.1", 0), MirrorHandler)
+        slow = ThreadingHTTPServer(("127.0.0.1", 0), MirrorHandler)
+        for server in (fast, slow):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        api_url = f"http://127.0.0.1:{fast.server_address[1]}/api?mount={{mount}}"
+        fast_url = f"http://127.0.0.1:{fast.server_address[1]}/TESTFM_SC"
+        slow_url = f"http://127.0.0.1:{slow.server_address[1]}/TESTFM_SC"
+        show = Show(station="s", name="n", url="streamtheworld:TESTFM_SC")
+        try:
+            with patch('main.STREAMTHEWORLD_API_URL', api_url), \
+                    patch.dict(main.stream_cache, clear=True), patch.dict(main.mirror_stalls, clear=True):
+                resolved = resolve_stream(show)
+                self.assertEqual(resolved.url, fast_url)
+                self.assertEqual(resolved.mirrors, (fast_url, slow_url))
+                self.assertEqual(api_requests, ["/api?mount=TESTFM"])
+
+                # The cached list is reused, and a mirror that stalled ranks behind healthy ones
+                failed_over = fail_over(resolved)
+                self.assertEqual(failed_over.url, slow_url)
+                self.assertEqual(resolve_stream(show).mirrors, (slow_url, fast_url))
+                self.assertEqual(len(api_requests), 1)
+        finally:
+            for server in (fast, slow):
+                server.shutdown()
+                server.server_close()
+
+    @patch('time.sleep')
+    @patch('main.run_ffmpeg')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_record_stream_fails_over(self, mock_log_error, mock_log_info, mock_run, mock_sleep):
+        """Test a stalled mirror is replaced and the rest of the show appended"""
+        show = Show(station="s", name="n", url="http://a/live", duration=2, output_dir=self.test_dir,
+                    mirrors=("http://a/live", "http://b/live"))
+        urls = []
+        commands = []
+
+        def fake_run(command, stdout_handler=None, **kwargs):
+            urls.append(command[command.index("-i") + 1])
+            commands.append(command)
+            stdout_handler(MagicMock(stdout=io.BytesIO(b"a" if len(urls) == 1 else b"b")))
+            if len(urls) == 1:
+                return FFmpegResult(returncode=1, stderr="Connection timed out",
+                                    progress=main.FFmpegProgress(bytes_written=1))
+            threading.Event().wait(float(command[command.index("-t") + 1]))
+            return FFmpegResult(returncode=0, stderr="")
+
+        mock_run.side_effect = fake_run
+        with patch.dict(main.mirror_stalls, clear=True):
+            output_file = record_stream(show)
+        try:
+            self.assertEqual(urls, ["http://a/live", "http://b/live"])
+            # Only the first run starts the file with an ID3v2 header
+            self.assertNotIn("-id3v2_version", commands[0])
+            self.assertEqual(commands[1][-7:], ["-f", "mp3", "-id3v2_version", "0", "-write_xing", "0", "pipe:1"])
+            with open(output_file, 'rb') as f:
+                self.assertEqual(f.read(), b"ab")
+            self.assertEqual(main.load_digests(output_file).size, 2)
+            mock_sleep.assert_called_once_with(0)
+        finally:
+            os.remove(output_file)
+            os.remove(output_file + main.DIGEST_SIDECAR_SUFFIX)
+
+    def programme_audio(self, seconds, rng):
+        """Noise whose level jumps between half-second windows, like speech or music"""
+        windows = int(seconds * 2)
+        gains = 10 ** (rng.uniform(-26, -6, windows) / 20)
+        return (rng.standard_normal(windows * 11025) * np.repeat(gains, 11025)).astype(np.float32)
+
+    def compressed_programme_audio(self, seconds, rng):
+        """Chords under a beat, limited so hard that the level barely moves between windows"""
+        t = np.arange(11025) / 22050
+        chords = []
+        for _ in range(int(seconds * 2)):
+            roots = rng.choice([110, 131, 147, 165, 196, 220, 262], 3)
+            chords.append(sum(np.sin(2 * np.pi * root * h * t) / h for root in roots for h in range(1, 8)))
+        music = np.concatenate(chords)
+        kicks = np.tile(np.exp(-np.arange(11025) / 300), len(chords)) * rng.standard_normal(len(music)) * 3
+        music += kicks
+        return (np.tanh(8 * music / music.std()) * 0.7).astype(np.float32)
+
+    @patch('main.run_ffmpeg')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_dead_air_detection(self, mock_log_error, mock_log_info, mock_run):
+        """Test silence and steady hiss are found in streamed PCM chunks"""
+        rng = np.random.default_rng(1)
+        audio = np.concatenate([
+            self.programme_audio(60, rng),
+            np.zeros(40 * 22050, dtype=np.float32),  # Silence
+            self.programme_audio(20, rng),
+            (rng.standard_normal(45 * 22050) * 0.03).astype(np.float32),  # Dropped carrier hiss
+            self.programme_audio(10, rng),
+            np.zeros(10 * 22050, dtype=np.float32),  # Too short to report
+        ])
+
+        # The tail of ffmpeg's stderr holds the summary ebur128 logs as it closes
+        ebur128_summary = (
+            "[Parsed_ebur128_0 @ 0x1] [info] Summary:\n"
+            "Integrated loudness:\nI:         -23.4 LUFS\nThreshold: -33.6 LUFS\n"
+            "Loudness range:\nLRA:         6.2 LU\nThreshold: -43.6 LUFS\n"
+            "LRA low:   -27.0 LUFS\nLRA high:  -20.8 LUFS\n"
+            "True peak:\nPeak:       -1.3 dBFS"
+        )
+
+        def fake_run(command, stdout_handler=None, **kwargs):
+            stdout_handler(MagicMock(stdout=io.BytesIO(audio.tobytes())))
+            return FFmpegResult(returncode=0, stderr=ebur128_summary)
+
+        mock_run.side_effect = fake_run
+        with patch('main.ANALYSIS_CHUNK_WINDOWS', 7):  # Runs cross chunk boundaries
+            analysis = main.analyze_recording(self.test_file)
+
+        self.assertIn("ebur128=peak=true:framelog=quiet", mock_run.call_args[0][0])
+        self.assertEqual((analysis.loudness_lufs, analysis.loudness_range_lu, analysis.true_peak_dbtp), (-23.4, 6.2, -1.3))
+        self.assertEqual(main.parse_loudness_summary("I:         -70.0 LUFS\nLRA:   0.0 LU\nPeak:  -inf dBFS"), {})
+        self.assertEqual(analysis.duration, 185)
+        self.assertEqual(
+            [(run["start"], run["end"], run["kind"]) for run in analysis.dead_air],
+            [(60.0, 100.0, "silence"), (120.0, 165.0, "steady noise")]
+        )
+        self.assertLess(analysis.rms_db, analysis.peak_db)
+
+        # Limited programme holds its level as steadily as hiss, but isn't noise
+        detector = main.DeadAirDetector()
+        music = self.compressed_programme_audio(60, rng)
+        levels = [main.level_db(np.sqrt(np.mean(window ** 2))) for window in music.reshape(-1, 11025)]
+        self.assertLess(np.abs(np.diff(levels)).max(), main.DEAD_AIR_FLATNESS_DB)
+        detector.feed(music)
+        self.assertEqual(detector.result().dead_air, [])
+
+        # The same pass wrote the waveform: 370 windows reduced to each resolution
+        with open(self.test_file + ".peaks", 'rb') as f:
+            data = f.read()
+        os.remove(self.test_file + ".peaks")
+        self.assertEqual(data[:4], b"SSWF")
+        self.assertEqual(struct.unpack_from("<BBHI", data, 4), (1, 3, 0, 22050))
+        samples_per_point, points = struct.unpack_from("<II", data, 12)
+        self.assertEqual((samples_per_point, points), (2 * 11025, 185))
+        coarse = np.frombuffer(data, dtype=np.int8, count=points * 2, offset=20)
+        self.assertTrue(np.all(coarse[0::2] <= coarse[1::2]))
+        self.assertEqual(coarse[140:142].tolist(), [0, 0])  # 70s, in the silence
+        self.assertEqual(len(data), 12 + 3 * 8 + 2 * (185 + 370 + 370))
+
+        # Too much dead air tags the recording, or fails it when configured to
+        try:
+            with patch('main.DEAD_AIR_MAX_SECONDS', 60), patch('main.analyze_recording', return_value=analysis):
+                self.assertTrue(main.check_dead_air(self.test_file))
+                self.assertEqual(main.load_analysis(self.test_file).metadata(), {
+                    "duration": "185.0", "dead-air-seconds": "85",
+                    "loudness-lufs": "-23.4", "loudness-range-lu": "6.2", "true-peak-dbtp": "-1.3",
+                    "replaygain-track-gain": "+5.40 dB", "replaygain-track-peak": "0.860994",
+                })
+                with patch('main.DEAD_AIR_ACTION', "fail"):
+                    self.assertFalse(main.check_dead_air(self.test_file))
+        finally:
+            os.remove(self.test_file + ".analysis.json")
+
+    @patch('time.sleep')
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    @patch('main.log_success')
+    @patch('main.log_error')
+    def test_archive_index(self, mock_log_error, mock_log_success, mock_log_info, mock_client, mock_sleep):
+        """Test the index is updated with conditional writes and rebuilt from a listing"""
+        from botocore.exceptions import ClientError
+        bucket = {}  # key -> (body, etag)
+        heads = {
+            "archive/show_2024-01-03_22-00-00.mp3": {
+                'ContentLength': 115200000, 'Metadata': {'duration': '7200.0', 'sha256': 'aa', 'md5': 'bb'}
+            },
+            "archive/show_2024-01-10_22-00-00.mp3": {'ContentLength': 1000, 'Metadata': {}},
+        }
+        conflicts = [True]  # The first write loses to a concurrent writer
+
+        def get_object(Bucket, Key):
+            if Key not in bucket:
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            return {'Body': io.BytesIO(bucket[Key][0]), 'ETag': bucket[Key][1]}
+
+        def put_object(Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+            current = bucket.get(Key, (None, None))[1]
+            if conflicts and conflicts.pop() or (IfNoneMatch and current) or (IfMatch and IfMatch != current):
+                bucket[Key] = (json.dumps({"recordings": [{"key": "archive/other.mp3"}]}).encode(), '"other"')
+                raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject')
+            bucket[Key] = (Body, f'"{hashlib.md5(Body).hexdigest()}"')
+            return {}
+
+        mock_client.get_object.side_effect = get_object
+        mock_client.put_object.side_effect = put_object
+        mock_client.head_object.side_effect = lambda Bucket, Key: heads[Key]
+        mock_client.get_paginator.return_value.paginate.return_value = [{'Contents': [
+            {'Key': key} for key in [*heads, "archive/show_2024-01-10_22-00-00.peaks",
+                                     "archive/segments/show_x/show_x_00000.mp3", "archive/index.json"]
+        ]}]
+
+        self.assertTrue(main.index_recording("archive/show_2024-01-03_22-00-00.mp3"))
+        index = json.loads(bucket["archive/index.json"][0])
+        self.assertEqual([entry["key"] for entry in index["recordings"]], [
+            "archive/show_2024-01-03_22-00-00.mp3", "archive/other.mp3"  # The other writer's entry survives
+        ])
+        self.assertEqual(index["recordings"][0], {
+            "key": "archive/show_2024-01-03_22-00-00.mp3", "date": "2024-01-03T22:00:00",
+            "duration": 7200.0, "size": 115200000, "bitrate_kbps": 128,
+            "sha256": "aa", "md5": "bb", "dead_air_seconds": None,
+        })
+
+        self.assertTrue(main.rebuild_archive_index("archive/"))
+        index = json.loads(bucket["archive/index.json"][0])
+        self.assertEqual([entry["key"] for entry in index["recordings"]], [
+            "archive/show_2024-01-10_22-00-00.mp3", "archive/show_2024-01-03_22-00-00.mp3"
+        ])
+
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_replaygain_tag(self, mock_log_error, mock_log_info):
+        """Test the ReplayGain APEv2 tag is appended once, skipped by the frame scan and kept in the checksums"""
+        self.write_mp3_frames(self.test_file, 500)
+        with open(self.test_file, 'rb') as f:
+            audio = f.read()
+        digest = main.CaptureDigest(part_size=5 * 1024 * 1024)
+        digest.update(audio)
+        main.save_capture_digests(self.test_file, digest)
+        analysis = main.AudioAnalysis(13.1, -20.0, -3.0, [], loudness_lufs=-21.25, loudness_range_lu=5.0, true_peak_dbtp=-6.0)
+
+        # Only the tag bytes are hashed, into the digest kept open since capture
+        with patch('main.rehash_recording') as mock_rehash:
+            self.assertTrue(main.write_replaygain_tag(self.test_file, analysis))
+        mock_rehash.assert_not_called()
+        with open(self.test_file, 'rb') as f:
+            data = f.read()
+        digests = main.load_digests(self.test_file)
+        self.assertEqual((digests.sha256, digests.md5), (hashlib.sha256(data).hexdigest(), hashlib.md5(data).hexdigest()))
+        self.assertNotIn(self.test_file, main.open_digests)
+
+        # Replacing the tag needs a fresh pass
+        self.assertTrue(main.write_replaygain_tag(self.test_file, dataclasses.replace(analysis, loudness_lufs=-15.0)))
+        with open(self.test_file, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data[:len(audio)], audio)
+        tag = data[len(audio):]
+        self.assertEqual((tag[:8], tag[-32:-24]), (b"APETAGEX", b"APETAGEX"))
+        self.assertEqual(struct.unpack_from("<IIII", tag, len(tag) - 24), (2000, len(tag) - 32, 3, 0x80000000))
+        self.assertIn(b"REPLAYGAIN_TRACK_GAIN\x00-3.00 dB", tag)
+        self.assertIn(b"REPLAYGAIN_TRACK_PEAK\x000.501187", tag)
+        self.assertEqual(main.audio_data_bounds(data), (0, len(audio)))
+
+        digests = main.load_digests(self.test_file)
+        self.assertEqual((digests.size, digests.md5, digests.part_size), (len(data), hashlib.md5(data).hexdigest(), 5 * 1024 * 1024))
+        os.remove(self.test_file + main.DIGEST_SIDECAR_SUFFIX)
+
+    @patch('main.THREAD_CPU_INTERVAL', 0.05)
+    def test_renditions_share_one_ffmpeg(self):
+        """Test renditions are extra outputs of the same command, with encoder CPU measured per thread"""
+        show = Show(station="s", name="n", url="https://example.com/live", duration=60,
+                    renditions=main.parse_renditions("opus:48k,aac:64k"))
+        outputs = main.rendition_files("/tmp/show_x.mp3", show)
+        self.assertEqual([path for _, path in outputs], ["/tmp/show_x_48k.opus", "/tmp/show_x_64k.aac"])
+        command = build_record_command("pipe:1", show, TRANSCODE_PLAN, renditions=outputs)
+        self.assertEqual(command.count("-i"), 1)
+        self.assertEqual(command.count("-t"), 3)
+        self.assertEqual(command[command.index("pipe:1") + 1:], [
+            "-t", "60", "-vn", "-acodec", "libopus", "-ab", "48k", "-f", "opus", "/tmp/show_x_48k.opus",
+            "-t", "60", "-vn", "-acodec", "aac", "-ab", "64k", "-f", "adts", "/tmp/show_x_64k.aac",
+        ])
+        with self.assertRaises(ValueError):
+            main.parse_renditions("vorbis:96k")
+
+        # A loudness target normalises that output in the same pass
+        normalised = main.parse_renditions([{"codec": "opus", "bitrate": "48k", "loudnorm": -16}])
+        command = build_record_command("pipe:1", show, TRANSCODE_PLAN, renditions=[(normalised[0], "/tmp/show_x_48k.opus")])
+        self.assertEqual(command[command.index("pipe:1") + 4:command.index("pipe:1") + 6],
+                         ["-af", "loudnorm=I=-16:TP=-1.5:LRA=11,aresample=48000"])
+        with patch('main.RENDITION_LOUDNORM', -23.0):
+            self.assertEqual(main.parse_renditions("aac:64k")[0].loudnorm, -23.0)
+
+        # A stand-in process with a busy thread named like an ffmpeg encoder
+        script = (
+            "import ctypes, threading, time\n"
+            "def encode():\n"
+            "    ctypes.CDLL(None).prctl(15, b'enc1:0:libopus')\n"
+            "    end = time.process_time() + 0.4\n"
+            "    while time.process_time() < end: pass\n"
+            "    time.sleep(0.3)\n"
+            "thread = threading.Thread(target=encode)\n"
+            "thread.start()\n"
+            "thread.join()\n"
+        )
+        result = main.run_ffmpeg([sys.executable, "-c", script], thread_cpu=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertGreater(main.encoder_cpu(result, 1), 0.2)
+        self.assertEqual(main.encoder_cpu(result, 2), 0)
+        self.assertIn("opus 48k CPU", main.report_rendition_cpu(show, [result]))
+
+        # Without per-encoder threads (ffmpeg before 7) the cost is unknown, not zero
+        older = FFmpegResult(0, "", cpu_seconds=3.0, thread_cpu={"ffmpeg": 2.5, "mux0:mp3": 0.1})
+        self.assertIsNone(main.encoder_cpu(older, 1))
+        self.assertIn("opus 48k CPU unknown", main.report_rendition_cpu(show, [result, older]))
+
+    @patch('main.HLS_UPLOAD_CONCURRENCY', 2)
+    @patch('main.s3_client')
+    @patch('main.run_ffmpeg')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_publish_hls(self, mock_log_error, mock_log_info, mock_run, mock_client):
+        """Test HLS segments upload concurrently and the playlist is published last"""
+        def fake_package(command, **kwargs):
+            playlist = command[-1]
+            for index in range(6):
+                with open(os.path.join(os.path.dirname(playlist), f"segment_{index:05d}.ts"), 'wb') as f:
+                    f.write(b"ts")
+            with open(playlist, 'w') as f:
+                f.write("#EXTM3U\n")
+            return FFmpegResult(returncode=0, stderr="")
+
+        uploads = []
+        running = []
+        lock = threading.Lock()
+
+        def upload_file(local_file, bucket, key, **kwargs):
+            with lock:
+                running.append(key)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(key)
+                uploads.append((key, kwargs['ExtraArgs']['ContentType']))
+            if key.endswith("00003.ts") and fail_segment:
+                raise Exception("Upload failed")
+
+        mock_run.side_effect = fake_package
+        mock_client.upload_file.side_effect = upload_file
+        peak = []
+        fail_segment = False
+        self.assertTrue(main.publish_hls(self.test_file, "archive/show_x.mp3"))
+        self.assertEqual(len(uploads), 7)
+        self.assertEqual(uploads[-1], ("archive/hls/show_x/index.m3u8", "application/vnd.apple.mpegurl"))
+        self.assertEqual(uploads[0][1], "video/mp2t")
+        self.assertEqual(max(peak), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "test_recording.hls")))
+
+        # A segment that can't be stored keeps the playlist unpublished
+        uploads.clear()
+        fail_segment = True
+        with patch('main.retry_decorator', lambda *args, **kwargs: lambda func: func), \
+                patch('main.upload_hls_file', lambda path, key: upload_file(path, None, key, ExtraArgs={'ContentType': ''})):
+            self.assertFalse(main.publish_hls(self.test_file, "archive/show_x.mp3"))
+        self.assertNotIn("archive/hls/show_x/index.m3u8", [key for key, _ in uploads])
+
+    @patch('main.log_info')
+    @patch('main.log_success')
+    @patch('main.log_error')
+    def test_upload_spool(self, mock_log_error, mock_log_success, mock_log_info):
+        """Test failed uploads are journaled, evicted oldest first, held back under backpressure and drained"""
+        with tempfile.TemporaryDirectory() as spool_dir:
+            journal = os.path.join(spool_dir, "spool.journal")
+            files = []
+            for i in range(3):
+                files.append(os.path.join(spool_dir, f"show_{i}.mp3"))
+                with open(files[-1], 'wb') as f:
+                    f.write(b'0' * 1000)
+
+            spool = main.UploadSpool(journal, max_bytes=2500, policy="evict-oldest")
+            for i, path in enumerate(files):
+                spool.enqueue(path, f"archive/show_{i}.mp3", "latest.mp3" if i == 0 else None)
+            # The third recording pushed the spool over its cap, so the oldest went
+            self.assertEqual([entry.local_file for entry in spool.pending()], files[1:])
+            self.assertFalse(os.path.exists(files[0]))
+            self.assertEqual(spool.usage(), 2000)
+
+            # A restart replays the journal, ignoring a write torn by the crash
+            with open(journal, 'a') as f:
+                f.write('{"op": "done", "fi')
+            spool = main.UploadSpool(journal, max_bytes=2500, policy="backpressure", concurrency=2)
+            self.assertEqual([entry.s3_key for entry in spool.pending()], ["archive/show_1.mp3", "archive/show_2.mp3"])
+            self.assertFalse(spool.wait_for_space(1000, timeout=0.1))
+            self.assertTrue(spool.wait_for_space(500, timeout=0))
+
+            # The drainer retries everything, a bounded number at once
+            running, peak = [0], [0]
+            lock = threading.Lock()
+
+            def publish(entry):
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                time.sleep(0.05)
+                with lock:
+                    running[0] -= 1
+                if entry.s3_key == "archive/show_2.mp3":
+                    os.remove(entry.local_file)
+                    return True
+                return False
+
+            with patch('main.publish_spooled', side_effect=publish):
+                spool.start()
+                self.assertTrue(spool.wait_for_space(1000, timeout=5))
+                spool.stop()
+            self.assertEqual(peak[0], 2)
+            self.assertEqual([entry.s3_key for entry in main.UploadSpool(journal).pending()], ["archive/show_1.mp3"])
+
+            # main() spools a recording the bucket refused instead of forgetting it
+            with patch('main.upload_spool', spool), \
+                    patch('main.check_ffmpeg', return_value=True), \
+                    patch('main.estimated_recording_bytes', return_value=100), \
+                    patch('main.record_stream', return_value=files[2]), \
+                    patch('main.verify_recording', return_value=True), \
+                    patch('main.check_dead_air', return_value=True), \
+                    patch('main.upload_to_s3', return_value=False):
+                with open(files[2], 'wb') as f:
+                    f.write(b'0' * 100)
+                self.assertFalse(main.main(main.default_show()))
+            entry = spool.pending()[-1]
+            self.assertEqual((entry.local_file, entry.latest_key, entry.uploaded), (files[2], "latest.mp3", False))
+            self.assertTrue(os.path.exists(files[2]))
+
+            # When only 'latest' failed, the stored archive isn't uploaded again
+            with patch('main.upload_spool', spool), \
+                    patch('main.check_ffmpeg', return_value=True), \
+                    patch('main.estimated_recording_bytes', return_value=100), \
+                    patch('main.record_stream', return_value=files[2]), \
+                    patch('main.verify_recording', return_value=True), \
+                    patch('main.check_dead_air', return_value=True), \
+                    patch('main.upload_to_s3', return_value=True), \
+                    patch('main.upload_latest', return_value=False):
+                self.assertFalse(main.main(main.default_show()))
+            entry = spool.pending()[-1]
+            self.assertEqual((entry.local_file, entry.uploaded), (files[2], True))
+            self.assertTrue(main.UploadSpool(journal).pending()[-1].uploaded)
+            with patch('main.upload_to_s3') as mock_upload, \
+                    patch('main.upload_latest', return_value=True) as mock_latest, \
+                    patch('main.index_recording') as mock_index:
+                self.assertTrue(main.publish_spooled(entry))
+            mock_upload.assert_not_called()
+            mock_latest.assert_called_once_with(entry.s3_key, "latest.mp3")
+            mock_index.assert_called_once_with(entry.s3_key)
+            self.assertFalse(os.path.exists(files[2]))
+
+    @patch('main.s3_client')
+    @patch('main.time.sleep')
+    @patch('main.log_info')
+    @patch('main.log_success')
+    @patch('main.log_error')
+    def test_resumable_upload(self, mock_log_error, mock_log_success, mock_log_info, mock_sleep, mock_client):
+        """Test an interrupted multipart upload resumes from its saved parts and orphaned uploads are aborted"""
+        with tempfile.TemporaryDirectory() as upload_dir:
+            recording = os.path.join(upload_dir, "show_x.mp3")
+            with open(recording, 'wb') as f:
+                f.write(os.urandom(4500))
+            stored = {}
+
+            def upload_part(Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+                if PartNumber == 3 and fail_part_3:
+                    raise ConnectionError("connection reset")
+                stored[PartNumber] = f'"{hashlib.md5(Body.read()).hexdigest()}"'
+                return {'ETag': stored[PartNumber]}
+
+            uploads = [
+                {'Key': "archive/show_x.mp3", 'UploadId': 'upload-1',
+                 'Initiated': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)},
+                {'Key': "archive/show_y.mp3", 'UploadId': 'upload-old',
+                 'Initiated': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)},
+                {'Key': "archive/show_z.mp3", 'UploadId': 'upload-new',
+                 'Initiated': datetime.datetime.now(datetime.timezone.utc)},
+            ]
+            paginators = {
+                'list_parts': lambda **kwargs: [{'Parts': [
+                    {'PartNumber': number, 'ETag': etag} for number, etag in stored.items()
+                ]}],
+                'list_multipart_uploads': lambda **kwargs: [{'Uploads': uploads}],
+            }
+            mock_client.get_paginator.side_effect = lambda name: MagicMock(paginate=paginators[name])
+            mock_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+            mock_client.upload_part.side_effect = upload_part
+            mock_client.complete_multipart_upload.return_value = {'ETag': '"done-5"'}
+
+            with patch('main.MULTIPART_PART_SIZE', 1000), patch('main.UPLOAD_CONCURRENCY', 1), \
+                    patch('main.OUTPUT_DIR', upload_dir), patch('main.upload_spool', main.UploadSpool(os.path.join(upload_dir, "spool.journal"))):
+                fail_part_3 = True
+                self.assertFalse(upload_to_s3(recording, "archive/show_x.mp3"))
+                self.assertNotIn(3, stored)
+                resumed_parts = [n for n in range(1, 6) if n not in stored]
+                mock_client.abort_multipart_upload.assert_not_called()
+
+                # Only uploads nothing will resume, started long enough ago, are aborted
+                self.assertEqual(main.abort_orphaned_uploads(max_age=3600), 1)
+                mock_client.abort_multipart_upload.assert_called_once_with(
+                    Bucket=main.BUCKET_NAME, Key="archive/show_y.mp3", UploadId='upload-old'
+                )
+
+                # After a restart the interrupted upload is spooled and sends only the missing parts
+                self.assertEqual(main.resume_interrupted_uploads(), 1)
+                self.assertEqual([entry.s3_key for entry in main.upload_spool.pending()], ["archive/show_x.mp3"])
+                fail_part_3 = False
+                mock_client.upload_part.reset_mock()
+                self.assertTrue(upload_to_s3(recording, "archive/show_x.mp3"))
+
+            self.assertEqual([c.kwargs['PartNumber'] for c in mock_client.upload_part.call_args_list], resumed_parts)
+            mock_client.create_multipart_upload.assert_called_once()
+            mock_client.complete_multipart_upload.assert_called_once_with(
+                Bucket=main.BUCKET_NAME,
+                Key="archive/show_x.mp3",
+                UploadId='upload-1',
+                MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': stored[n]} for n in range(1, 6)]}
+            )
+            self.assertFalse(os.path.exists(recording + main.UPLOAD_STATE_SUFFIX))
+
+    @patch('main.s3_client')
+    @patch('main.time.sleep')
+    @patch('main.log_info')
+    @patch('main.log_success')
+    @patch('main.log_error')
+    def test_resumed_upload_publishes(self, mock_log_error, mock_log_success, mock_log_info, mock_sleep, mock_client):
+        """Test a recording whose upload was cut off by a restart is still indexed with its sidecars and renditions"""
+        from botocore.exceptions import ClientError
+        show = Show(station="s", name="n", url="https://example.com/live", duration=60,
+                    renditions=main.parse_renditions("opus:48k"))
+        with tempfile.TemporaryDirectory() as upload_dir:
+            recording = os.path.join(upload_dir, "show_2024-01-03_22-00-00.mp3")
+            recording_key = "archive/show_2024-01-03_22-00-00.mp3"
+            for path, size in [(recording, 4500), (recording + main.WAVEFORM_SIDECAR_SUFFIX, 10),
+                               (recording + main.FRAME_INDEX_SIDECAR_SUFFIX, 10),
+                               (os.path.join(upload_dir, "show_2024-01-03_22-00-00_48k.opus"), 100)]:
+                with open(path, 'wb') as f:
+                    f.write(os.urandom(size))
+            stored = {}
+
+            def upload_part(Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+                if PartNumber == 3 and interrupted:
+                    raise ConnectionError("connection reset")
+                stored[PartNumber] = f'"{hashlib.md5(Body.read()).hexdigest()}"'
+                return {'ETag': stored[PartNumber]}
+
+            def get_object(Bucket, Key):
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+
+            mock_client.get_paginator.return_value.paginate.side_effect = lambda **kwargs: [{'Parts': [
+                {'PartNumber': number, 'ETag': etag} for number, etag in stored.items()
+            ]}]
+            mock_client.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+            mock_client.upload_part.side_effect = upload_part
+            mock_client.complete_multipart_upload.return_value = {'ETag': '"done-5"'}
+            mock_client.head_object.return_value = {'ContentLength': 4500, 'Metadata': {'duration': '60.0'}}
+            mock_client.get_object.side_effect = get_object
+
+            with patch('main.MULTIPART_PART_SIZE', 1000), patch('main.UPLOAD_CONCURRENCY', 1), \
+                    patch('main.OUTPUT_DIR', upload_dir):
+                # The process dies mid-upload, before the session could spool anything
+                interrupted = True
+                context = main.publish_context(recording, recording_key, show)
+                self.assertFalse(upload_to_s3(recording, recording_key, context))
+                with open(recording + main.UPLOAD_STATE_SUFFIX) as f:
+                    self.assertEqual(json.load(f)["publish"]["latest_key"], "latest.mp3")
+
+                # The restarted process spools it with its publish steps and renditions
+                interrupted = False
+                with patch('main.upload_spool', main.UploadSpool(os.path.join(upload_dir, "spool.journal"))):
+                    self.assertEqual(main.resume_interrupted_uploads(), 1)
+                    pending = main.upload_spool.pending()
+                    self.assertEqual([(entry.s3_key, entry.latest_key, entry.show) for entry in pending], [
+                        (recording_key, "latest.mp3", show.job_name),
+                        ("archive/show_2024-01-03_22-00-00_48k.opus", None, show.job_name),
+                    ])
+                    for entry in pending:
+                        self.assertTrue(main.publish_spooled(entry))
+
+            uploaded = [c.args[2] for c in mock_client.upload_file.call_args_list]
+            self.assertEqual(uploaded, [
+                "archive/show_2024-01-03_22-00-00.peaks", "archive/show_2024-01-03_22-00-00.frames",
+                "archive/show_2024-01-03_22-00-00_48k.opus",
+            ])
+            copies = [c.kwargs['Key'] for c in mock_client.copy_object.call_args_list]
+            self.assertEqual(copies, ["latest.mp3", "latest.peaks"])
+            index = json.loads(mock_client.put_object.call_args.kwargs['Body'])
+            self.assertEqual([entry["key"] for entry in index["recordings"]], [recording_key])
+            self.assertEqual(os.listdir(upload_dir), ["spool.journal"])
+
+    @patch('main.time.sleep')
+    def test_bandwidth_governor(self, mock_sleep):
+        """Test uploads share a token bucket that tightens while shows record and live parts never wait"""
+        governor = main.BandwidthGovernor(idle_rate=100000, recording_rate=40000)
+        self.assertEqual(governor.rate(), 100000)
+        with governor.recording():
+            self.assertEqual(governor.rate(), 40000)
+            with governor.recording():
+                self.assertEqual(governor.rate(), 20000)
+        self.assertEqual(governor.rate(), 100000)
+        self.assertEqual(main.BandwidthGovernor(0, 0).acquire(10 ** 9), 0)
+
+        # Sleeps are skipped, so each read waits for the debt of every read before it
+        transfer = governor.transfer()
+        body = main.ThrottledBody(b'0' * 50000, transfer)
+        body.read()  # Reads while botocore signs the request aren't charged
+        body.seek(0)
+        body.signal_transferring()
+        self.assertEqual(len(body.read(25000)) + len(body.read()), 50000)
+        self.assertEqual(transfer.bytes, 50000)
+        self.assertAlmostEqual(transfer.throttled, 0.25 + 0.5, delta=0.01)
+        transfer(50000)
+        self.assertAlmostEqual(transfer.throttled, 0.75 + 1.0, delta=0.02)
+
+        # Live parts take tokens without waiting, so archive uploads yield to them
+        live = governor.transfer(wait=False)
+        live(100000)
+        self.assertEqual(live.throttled, 0)
+        self.assertAlmostEqual(governor.acquire(1000), 2.01, delta=0.02)
+        self.assertEqual(mock_sleep.call_count, 4)
+
+    def test_cli_starts_lazily(self):
+        """Test importing main and verifying a file load none of boto3, requests, numpy or pytz"""
+        import subprocess
+        probe = "import main, sys; print(sorted(m for m in ('boto3', 'requests', 'numpy', 'pytz') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+        self.write_mp3_frames(self.test_file, 3000)
+        command = [sys.executable, "main.py", "verify", self.test_file]
+        self.assertEqual(subprocess.run(command, capture_output=True).returncode, 0)
+        self.assertEqual(subprocess.run(command + ["--duration", "600"], capture_output=True).returncode, 1)
+
+    @patch('main.s3_client')
+    @patch('main.log_info')
+    @patch('main.log_error')
+    def test_frame_index_and_clip(self, mock_log_error, mock_log_info, mock_client):
+        """Test the frame index built while writing maps a clip to ranged GETs cut on frame boundaries"""
+        self.write_mp3_frames(self.test_file, 3000, garbage=b"\xff\x00junk")
+        with open(self.test_file, 'rb') as f:
+            data = b"ID3\x03\x00\x00\x00\x00\x00\x05hello" + f.read()
+        indexer = main.FrameIndexer.for_file(self.test_file)
+        for pos in range(0, len(data), 1000):
+            indexer.update(data[pos:pos + 1000])
+        index = indexer.result()
+        self.assertEqual(index.total_samples, 3000 * 1152)
+        self.assertEqual(index.audio_end, len(data))
+        self.assertEqual(index.points[0], (0, 15))
+        self.assertTrue(all(data[offset:offset + 2] == b"\xff\xfb" for _, offset in index.points))
+        self.assertAlmostEqual(len(index.points), index.duration, delta=2)
+        self.assertEqual(main.FrameIndex.from_bytes(index.to_bytes()), index)
+
+        bucket = {"archive/show_x.mp3": data, "archive/show_x.frames": index.to_bytes()}
+        ranges = []
+
+        def get_object(Bucket, Key, Range=None):
+            body = bucket[Key]
+            if Range:
+                first, last = map(int, Range[len("bytes="):].split("-"))
+                ranges.append((first, last))
+                body = body[first:last + 1]
+            return {'Body': io.BytesIO(body)}
+
+        mock_client.get_object.side_effect = get_object
+        frame_seconds = 1152 / 44100
+        expected_frames = [i for i in range(3000) if i * frame_seconds < 20 and (i + 1) * frame_seconds > 10]
+        with tempfile.TemporaryDirectory() as clip_dir, patch('main.MULTIPART_PART_SIZE', 65536):
+            clip_file = os.path.join(clip_dir, "clip.mp3")
+            self.assertEqual(main.extract_clip("archive/show_x.mp3", 10, 20, clip_file), clip_file)
+            with open(clip_file, 'rb') as f:
+                clip = f.read()
+        self.assertEqual(len(clip), len(expected_frames) * 417)
+        self.assertEqual(clip[:4], b"\xff\xfb\x90\x00")
+        fetched = sum(last - first + 1 for first, last in ranges)
+        self.assertGreater(len(ranges), 1)
+        self.assertLess(fetched, len(clip) + 2 * 44100 // 1152 * 417)  # At most an index interval either side
+        self.assertEqual(main.parse_clock_time("1:01:30.5"), 3690.5)
 
     def test_retry_decorator(self):
         """Test retry decorator functionality"""